@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+"""Benchmark how soon venvs turn up with best-first traversal.
+
+Builds a tree where media folders full of subdirectories sit next to a
+few Python projects, and scans it in listing order and best-first. For
+each mode it reports how many directories were listed and how long it
+took until the first venv, and until 90% of the venv bytes, had been
+found. The total walk is the same in both modes.
+
+Usage (with the package installed, e.g. ``pip install -e .``):
+    python benchmarks/bench_best_first.py [--albums N] [--projects N]
+"""
+
+import argparse
+import math
+import os
+import random
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+from bench_traversal import count_calls
+from venvkiller.finder import iter_venvs
+
+
+def build_tree(root, albums, projects, seed=0):
+    """Create media folders and projects; return the venv sizes in bytes."""
+    rng = random.Random(seed)
+    for a in range(albums):
+        for disc in range(3):
+            (root / "Music" / f"album{a:04d}" / f"disc{disc}").mkdir(parents=True)
+
+    sizes = {}
+    for p in range(projects):
+        project = root / "code" / f"group{p % 7}" / f"project{p}"
+        for sub in ("src", "tests", "docs"):
+            (project / sub).mkdir(parents=True)
+        (project / "pyproject.toml").touch()
+        venv = project / rng.choice([".venv", "venv", "env"])
+        venv.mkdir()
+        (venv / "pyvenv.cfg").write_text("home = /usr/bin\n")
+        # Pretend sizes, so a few large venvs carry most of the bytes
+        sizes[venv] = int(rng.paretovariate(1.2) * 50_000_000)
+    return sizes
+
+
+def run(label, root, sizes, best_first):
+    """Scan the tree and print when the first venv and 90% arrived."""
+    target = 0.9 * sum(sizes.values())
+    found_bytes = 0
+    first = ninety = None
+    with count_calls() as counts:
+        start = time.perf_counter()
+        for venv in iter_venvs(
+            str(root),
+            max_depth=6,
+            parallel=False,
+            known_stores=False,
+            best_first=best_first,
+        ):
+            mark = (counts["scandir"], time.perf_counter() - start)
+            first = first or mark
+            found_bytes += sizes[venv]
+            if ninety is None and found_bytes >= target:
+                ninety = mark
+        total = (counts["scandir"], time.perf_counter() - start)
+
+    def fmt(mark):
+        return f"{mark[0]:6d} dirs {mark[1] * 1000:7.1f} ms"
+
+    print(f"{label:<12} first: {fmt(first)}   90% bytes: {fmt(ninety)}")
+    print(f"{'':<12} total: {fmt(total)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--albums", type=int, default=2000)
+    parser.add_argument("--projects", type=int, default=40)
+    args = parser.parse_args()
+
+    root = Path(tempfile.mkdtemp(prefix="venvkiller-bench-")).resolve()
+    try:
+        sizes = build_tree(root, args.albums, args.projects)
+        print(
+            f"{args.albums} albums, {args.projects} projects "
+            f"({math.ceil(sum(sizes.values()) / 1e9)} GB of pretend venvs)\n"
+        )
+        run("listing", root, sizes, best_first=False)
+        run("best-first", root, sizes, best_first=True)
+    finally:
+        shutil.rmtree(root)
+
+
+if __name__ == "__main__":
+    os.environ.setdefault("PYTHONHASHSEED", "0")
+    main()
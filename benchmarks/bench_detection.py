@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+"""Microbenchmark the per-directory cost of venv detection.
+
+Creates many small non-venv directories (the common case during a scan)
+and visits each one the way the finder used to, with one ``is_dir()``
+plus an ``exists()`` probe per entry of the old ``VENV_IDENTIFIERS``
+followed by a listing, and the way it does now, deciding from a single
+``os.scandir`` listing.
+
+Usage (with the package installed, e.g. ``pip install -e .``):
+    python benchmarks/bench_detection.py [--dirs N] [--files N]
+"""
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+from bench_traversal import COUNTED_CALLS, count_calls, legacy_is_virtual_env
+from venvkiller.finder import _read_dir
+
+
+def legacy_visit(path):
+    """Probe every identifier, then list the directory."""
+    if legacy_is_virtual_env(path):
+        return True, []
+    with os.scandir(path) as it:
+        return False, [e.name for e in it if e.is_dir(follow_symlinks=False)]
+
+
+def run(label, visit, dirs):
+    """Visit every directory and print the per-directory cost."""
+    with count_calls() as counts:
+        start = time.perf_counter()
+        for directory in dirs:
+            visit(directory)
+        elapsed = time.perf_counter() - start
+    per_dir = elapsed / len(dirs) * 1e6
+    calls = sum(counts.values()) / len(dirs)
+    detail = ", ".join(f"{name}={counts[name]}" for name in COUNTED_CALLS)
+    label = f"{label:<8} {per_dir:7.2f} us/dir"
+    print(f"{label}  {calls:5.2f} calls/dir  ({detail})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dirs", type=int, default=2000)
+    parser.add_argument("--files", type=int, default=8)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    root = Path(tempfile.mkdtemp(prefix="venvkiller-bench-")).resolve()
+    try:
+        dirs = []
+        for d in range(args.dirs):
+            directory = root / f"dir{d}"
+            (directory / "sub").mkdir(parents=True)
+            for f in range(args.files):
+                (directory / f"file{f}.py").touch()
+            dirs.append(directory)
+
+        print(f"{args.dirs} directories with {args.files} files each\n")
+        for _ in range(args.repeat):
+            run("probes", legacy_visit, dirs)
+            run("listing", _read_dir, dirs)
+    finally:
+        shutil.rmtree(root)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+"""Benchmark the fd-relative walk against the path-based one on deep trees.
+
+Builds a deep, narrow tree like a monorepo's nested packages, with a venv
+at the bottom of some branches, and walks it sequentially with paths and
+with directory file descriptors (``fd_relative=True``). The path-based
+walk builds a ``Path`` for every directory and has the kernel resolve
+its whole absolute path on each call; the fd-relative walk opens each
+directory relative to its parent's descriptor.
+
+Usage (with the package installed, e.g. ``pip install -e .``):
+    python benchmarks/bench_fd_walk.py [--depth N] [--fanout N] [--runs N]
+"""
+
+import argparse
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+from venvkiller.finder import FD_WALK_SUPPORTED, find_venvs
+
+
+def build_tree(root, depth, fanout):
+    """Create ``fanout`` chains of ``depth`` nested dirs, each with a venv.
+
+    Every level also gets a couple of leaf directories, so the walk lists
+    a few directories per level rather than a bare chain.
+    """
+    for branch in range(fanout):
+        directory = root / f"pkg{branch}" / ("averagely_long_name" * 2)
+        for level in range(depth):
+            directory = directory / f"level{level}"
+            for leaf in ("src", "tests"):
+                (directory / leaf).mkdir(parents=True)
+        venv = directory / ".venv"
+        venv.mkdir()
+        (venv / "pyvenv.cfg").write_text("home = /usr/bin\n")
+
+
+def best_of(runs, fd_relative, root, depth):
+    """Walk the tree ``runs`` times and return the venvs and best time."""
+    best = float("inf")
+    for _ in range(runs):
+        start = time.perf_counter()
+        found = find_venvs(
+            str(root),
+            max_depth=depth + 4,
+            parallel=False,
+            known_stores=False,
+            fd_relative=fd_relative,
+        )
+        best = min(best, time.perf_counter() - start)
+    return found, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--depth", type=int, default=40)
+    parser.add_argument("--fanout", type=int, default=100)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+    if not FD_WALK_SUPPORTED:
+        parser.exit(1, "fd-relative walks are not supported here\n")
+
+    root = Path(tempfile.mkdtemp(prefix="venvkiller-bench-")).resolve()
+    try:
+        build_tree(root, args.depth, args.fanout)
+        paths, path_time = best_of(args.runs, False, root, args.depth)
+        fds, fd_time = best_of(args.runs, True, root, args.depth)
+        assert sorted(paths) == sorted(fds) and len(fds) == args.fanout
+
+        dirs = args.fanout * (3 * args.depth + 3)
+        print(f"{dirs} directories, {args.depth} levels deep (warm cache)\n")
+        print(f"{'paths':<14} {path_time * 1000:8.1f} ms")
+        print(
+            f"{'fd-relative':<14} {fd_time * 1000:8.1f} ms "
+            f"({path_time / fd_time:.2f}x)"
+        )
+    finally:
+        shutil.rmtree(root)
+
+
+if __name__ == "__main__":
+    main()
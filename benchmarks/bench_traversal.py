@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+"""Benchmark the directory traversal used by the venv finder.
+
+Builds a synthetic tree of project directories (many plain files, a few
+subdirectories and some venvs) and walks it with the original
+``Path.iterdir()`` implementation and with the current
+``find_venvs_in_dir``, reporting wall time and the number of filesystem
+calls each one issues.
+
+Usage (with the package installed, e.g. ``pip install -e .``):
+    python benchmarks/bench_traversal.py [--projects N] [--files N]
+"""
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+
+from venvkiller.finder import VENV_NAMES, find_venvs_in_dir
+
+# Filesystem calls that end up as stat/open/getdents syscalls
+COUNTED_CALLS = ("stat", "lstat", "scandir", "listdir")
+
+# Identifiers probed before detection became platform specific
+LEGACY_IDENTIFIERS = (
+    "pyvenv.cfg",
+    "bin/activate",
+    "Scripts/activate",
+    "bin/python",
+    "Scripts/python.exe",
+)
+
+
+def legacy_is_virtual_env(path):
+    """The probe-per-identifier venv check the finder used originally."""
+    if not path.is_dir():
+        return False
+    return any((path / name).exists() for name in LEGACY_IDENTIFIERS)
+
+
+def legacy_find_venvs_in_dir(directory, max_depth=5, exclude_dirs=frozenset()):
+    """The ``Path.iterdir()`` based walk the finder used originally."""
+    if directory.name in exclude_dirs:
+        return
+    if legacy_is_virtual_env(directory):
+        yield directory
+        return
+    if max_depth <= 0:
+        return
+    try:
+        for item in directory.iterdir():
+            if item.is_dir() and not item.is_symlink():
+                if item.name.startswith(".") and item.name not in VENV_NAMES:
+                    continue
+                yield from legacy_find_venvs_in_dir(item, max_depth - 1)
+    except (PermissionError, OSError):
+        pass
+
+
+@contextmanager
+def count_calls():
+    """Count calls to the ``os`` functions that hit the filesystem."""
+    counts = Counter()
+    originals = {name: getattr(os, name) for name in COUNTED_CALLS}
+
+    def wrap(name, func):
+        def counted(*args, **kwargs):
+            counts[name] += 1
+            return func(*args, **kwargs)
+
+        return counted
+
+    for name, func in originals.items():
+        setattr(os, name, wrap(name, func))
+    try:
+        yield counts
+    finally:
+        for name, func in originals.items():
+            setattr(os, name, func)
+
+
+def build_tree(root, projects, files, dirs):
+    """Create ``projects`` project folders, every fourth one with a venv."""
+    for p in range(projects):
+        project = root / f"project{p}"
+        for d in range(dirs):
+            sub = project / f"pkg{d}"
+            sub.mkdir(parents=True)
+            for f in range(files):
+                (sub / f"module{f}.py").touch()
+        for f in range(files):
+            (project / f"file{f}.txt").touch()
+        if p % 4 == 0:
+            venv = project / ".venv"
+            (venv / "bin").mkdir(parents=True)
+            (venv / "pyvenv.cfg").write_text("home = /usr/bin\n")
+            (venv / "bin" / "activate").touch()
+
+
+def run(label, walker, root):
+    """Walk ``root`` with ``walker`` and print timing and call counts."""
+    with count_calls() as counts:
+        start = time.perf_counter()
+        found = list(walker(root, 5, set()))
+        elapsed = time.perf_counter() - start
+    calls = ", ".join(f"{name}={counts[name]}" for name in COUNTED_CALLS)
+    print(
+        f"{label:<10} {elapsed * 1000:8.1f} ms  {len(found):4d} venvs  "
+        f"{sum(counts.values()):7d} calls ({calls})"
+    )
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--projects", type=int, default=200)
+    parser.add_argument("--files", type=int, default=50)
+    parser.add_argument("--dirs", type=int, default=4)
+    args = parser.parse_args()
+
+    root = Path(tempfile.mkdtemp(prefix="venvkiller-bench-")).resolve()
+    try:
+        build_tree(root, args.projects, args.files, args.dirs)
+        entries = args.projects * (args.dirs + 1) * (args.files + 1)
+        print(f"Synthetic tree: {entries} entries under {root}\n")
+        before = run("iterdir", legacy_find_venvs_in_dir, root)
+        after = run("scandir", find_venvs_in_dir, root)
+        assert sorted(before) == sorted(after), "walkers disagree"
+    finally:
+        shutil.rmtree(root)
+
+
+if __name__ == "__main__":
+    main()
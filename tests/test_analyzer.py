@@ -1,5 +1,6 @@
 """Tests for the analyzer module."""
 
+import os
 import time
 import tempfile
 import shutil
@@ -8,6 +9,7 @@ import unittest
 
 from venvkiller.analyzer import (
     get_size,
+    measure,
     format_size,
     format_time_ago,
     classify_venv_age,
@@ -52,6 +54,42 @@ class TestAnalyzer(unittest.TestCase):
         # Test size calculation (should be 6000 bytes total)
         size = get_size(test_dir)
         self.assertEqual(size, 6000)
+        self.assertEqual(get_size(test_dir, inode_order=True), 6000)
+
+    def test_measure(self):
+        """Test measuring apparent and allocated size in one pass."""
+        tree = self.temp_dir / "tree"
+        (tree / "a" / "b").mkdir(parents=True)
+        (tree / "a" / "b" / "small.py").write_text("x = 1\n")
+        (tree / "big.bin").write_bytes(b"B" * 10000)
+        # A sparse file: large, but with nothing written to it
+        with open(tree / "sparse.img", "wb") as f:
+            f.truncate(10**7)
+        outside = self.temp_dir / "outside"
+        outside.mkdir()
+        (outside / "data").write_bytes(b"D" * 50000)
+
+        usage = measure(tree)
+        self.assertEqual(usage.apparent, 6 + 10000 + 10**7)
+        self.assertEqual((usage.files, usage.dirs), (3, 3))
+        self.assertEqual(measure(tree, inode_order=True), usage)
+        if hasattr(os.stat(tree), "st_blocks"):
+            # Blocks of the files and directories; none for the hole
+            self.assertGreaterEqual(usage.allocated, 10000)
+            self.assertLess(usage.allocated, 10**6)
+
+        try:
+            os.symlink(outside, tree / "link")
+            os.link(tree / "big.bin", tree / "a" / "hardlink.bin")
+        except (OSError, NotImplementedError):
+            self.skipTest("links not supported")
+        linked = measure(tree)
+        # The symlink is a file of its own, not the directory behind it,
+        # and the second link to big.bin adds nothing
+        self.assertEqual(linked.files, usage.files + 1)
+        self.assertEqual(linked.dirs, usage.dirs)
+        self.assertLess(linked.apparent - usage.apparent, 1000)
+        self.assertEqual(measure(self.temp_dir / "missing"), (0, 0, 0, 0))
 
     def test_format_size(self):
         """Test formatting bytes to human-readable format."""
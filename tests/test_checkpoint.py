@@ -0,0 +1,117 @@
+"""Tests for the checkpoint module."""
+
+import os
+import tempfile
+import shutil
+from pathlib import Path
+import unittest
+from unittest import mock
+
+from venvkiller.checkpoint import ScanCheckpoint
+from venvkiller.finder import find_venvs, iter_venvs
+from venvkiller.index import ScanIndex
+
+
+class TestScanCheckpoint(unittest.TestCase):
+    """Test cases for resuming scans from a checkpoint."""
+
+    def setUp(self):
+        """Set up a temporary tree with a venv in every project."""
+        self.temp_dir = Path(tempfile.mkdtemp()).resolve()
+        self.tree = self.temp_dir / "tree"
+        self.venvs = set()
+        for i in range(4):
+            venv = self.tree / f"project{i}" / "venv"
+            venv.mkdir(parents=True)
+            (venv / "pyvenv.cfg").write_text("home = /usr/bin\n")
+            self.venvs.add(venv)
+        self.checkpoint_file = self.temp_dir / "checkpoint.json"
+
+    def tearDown(self):
+        """Clean up temporary directory after tests."""
+        shutil.rmtree(self.temp_dir)
+
+    def checkpoint(self):
+        """Create a checkpoint that is saved after every directory."""
+        return ScanCheckpoint(self.checkpoint_file, interval=0)
+
+    def test_resume_interrupted_scan(self):
+        """Test that a resumed scan skips what the first one finished."""
+        tree, checkpoint = str(self.tree), self.checkpoint()
+        scan = iter_venvs(tree, parallel=False, checkpoint=checkpoint)
+        first = next(scan)
+        scan.close()
+        self.assertTrue(self.checkpoint_file.exists())
+
+        with mock.patch("os.scandir", wraps=os.scandir) as scandir:
+            found = find_venvs(
+                str(self.tree),
+                parallel=False,
+                checkpoint=self.checkpoint(),
+                resume=True,
+            )
+        listed = {Path(c.args[0]) for c in scandir.call_args_list}
+
+        self.assertEqual(found[0], first)
+        self.assertEqual(set(found), self.venvs)
+        self.assertEqual(len(found), len(self.venvs))
+        self.assertNotIn(self.tree, listed)
+        self.assertNotIn(first.parent, listed)
+        # A completed scan leaves no checkpoint behind
+        self.assertFalse(self.checkpoint_file.exists())
+
+    def test_resume_keeps_index_records(self):
+        """Test that a resumed scan keeps the records of the finished part."""
+        index = ScanIndex(self.temp_dir / "index.sqlite")
+        tree = str(self.tree)
+        scan = iter_venvs(
+            tree, parallel=False, index=index, checkpoint=self.checkpoint()
+        )
+        first = next(scan)
+        scan.close()
+
+        resumed = dict(checkpoint=self.checkpoint(), resume=True)
+        found = find_venvs(tree, parallel=False, index=index, **resumed)
+        self.assertEqual(set(found), self.venvs)
+        self.assertEqual(set(index.venvs_under(self.tree)), self.venvs)
+        self.assertIn(first, index.venvs_under(first))
+
+    def test_resume_after_time_budget(self):
+        """Test that subtrees left out by a time budget are scanned later."""
+        for parallel in (True, False):
+            found = find_venvs(
+                str(self.tree),
+                parallel=parallel,
+                time_budget=0,
+                checkpoint=self.checkpoint(),
+            )
+            self.assertEqual(found, [])
+
+            found = find_venvs(
+                str(self.tree),
+                parallel=parallel,
+                checkpoint=self.checkpoint(),
+                resume=True,
+            )
+            self.assertEqual(set(found), self.venvs)
+
+    def test_checkpoint_of_other_scan_ignored(self):
+        """Test that a checkpoint is only resumed by the same scan."""
+        find_venvs(str(self.tree), time_budget=0, checkpoint=self.checkpoint())
+        self.checkpoint_file.write_text("{not json")
+        checkpoint = self.checkpoint()
+        found = find_venvs(str(self.tree), checkpoint=checkpoint, resume=True)
+        self.assertEqual(set(found), self.venvs)
+
+        find_venvs(str(self.tree), time_budget=0, checkpoint=self.checkpoint())
+        found = find_venvs(
+            str(self.tree),
+            max_depth=1,
+            checkpoint=self.checkpoint(),
+            resume=True,
+        )
+        self.assertEqual(found, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
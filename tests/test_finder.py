@@ -1,11 +1,34 @@
 """Tests for the finder module."""
 
+import inspect
+import os
+import sys
 import tempfile
 import shutil
 from pathlib import Path
+import itertools
+import threading
+import time
 import unittest
+from unittest import mock
 
-from venvkiller.finder import is_virtual_env, find_venvs, has_requirement_files
+from venvkiller import finder
+from venvkiller.finder import (
+    is_virtual_env,
+    find_venvs,
+    iter_venvs,
+    has_requirement_files,
+    ScanReport,
+    clear_requirement_cache,
+    known_venv_stores,
+    collapse_roots,
+    _build_context,
+    _walk,
+    _ConcurrencyLimit,
+    FD_WALK_SUPPORTED,
+)
+from venvkiller.index import ScanIndex
+from venvkiller.mounts import Mount, MountTable
 
 
 class TestFinder(unittest.TestCase):
@@ -40,6 +63,107 @@ class TestFinder(unittest.TestCase):
         regular_dir.mkdir()
         self.assertFalse(is_virtual_env(regular_dir))
 
+        # Files and missing paths are never venvs
+        self.assertFalse(is_virtual_env(venv_path / "pyvenv.cfg"))
+        self.assertFalse(is_virtual_env(self.temp_dir / "missing"))
+
+    def test_is_virtual_env_nested_identifiers(self):
+        """Test detection of venvs without pyvenv.cfg from their bin dir."""
+        scripts = "Scripts" if sys.platform == "win32" else "bin"
+
+        # A bin directory alone does not make a venv
+        tool_dir = self.temp_dir / "tools"
+        (tool_dir / scripts).mkdir(parents=True)
+        self.assertFalse(is_virtual_env(tool_dir))
+
+        # ...but one with an activate script does
+        (tool_dir / scripts / "activate").write_text("# activate")
+        self.assertTrue(is_virtual_env(tool_dir))
+
+    def test_env_types(self):
+        """Test that each kind of environment is found with its type."""
+        project = self.temp_dir / "project"
+        expected = {
+            project / ".venv": "venv",
+            project / "__pypackages__": "pdm",
+            project / ".pixi" / "envs" / "default": "pixi",
+            project / ".hatch" / "test": "hatch",
+            self.temp_dir / "miniforge" / "envs" / "data": "conda",
+        }
+        self.create_fake_venv(project / ".venv")
+        self.create_fake_venv(project / ".hatch" / "test")
+        (project / "__pypackages__" / "3.12" / "lib").mkdir(parents=True)
+        for env in (
+            project / ".pixi" / "envs" / "default",
+            self.temp_dir / "miniforge" / "envs" / "data",
+        ):
+            (env / "conda-meta").mkdir(parents=True)
+            (env / "conda-meta" / "history").write_text("")
+        # A conda env with a venv's bin/python is still a conda env
+        conda_bin = self.temp_dir / "miniforge" / "envs" / "data" / "bin"
+        conda_bin.mkdir()
+        (conda_bin / "python").write_text("")
+
+        self.assertEqual(finder.detect_env_type(project / ".venv"), "venv")
+        self.assertIsNone(finder.detect_env_type(project))
+        runs = [
+            {"parallel": True},
+            {"parallel": False},
+            {"index": ScanIndex(self.temp_dir / "index.db")},
+        ]
+        if FD_WALK_SUPPORTED:
+            runs.append({"fd_relative": True})
+        for kwargs in runs:
+            report = ScanReport()
+            found = find_venvs(
+                str(self.temp_dir),
+                5,
+                report=report,
+                known_stores=False,
+                **kwargs,
+            )
+            self.assertEqual(set(found), set(expected))
+            self.assertEqual(report.env_types, expected)
+
+    def test_register_detector(self):
+        """Test that a new environment type costs no extra listing."""
+        for i in range(5):
+            self.create_fake_venv(self.temp_dir / f"project{i}" / ".venv")
+        custom = self.temp_dir / "project0" / "tool-env"
+        custom.mkdir()
+        (custom / "tool-env.toml").write_text("")
+
+        def scan():
+            report = ScanReport()
+            with mock.patch("os.scandir", wraps=os.scandir) as scandir:
+                find_venvs(
+                    str(self.temp_dir),
+                    3,
+                    parallel=False,
+                    known_stores=False,
+                    report=report,
+                )
+            return report.env_types, scandir.call_count
+
+        env_types, listings = scan()
+        self.assertNotIn(custom, env_types)
+        with mock.patch.object(
+            finder, "ENV_DETECTORS", list(finder.ENV_DETECTORS)
+        ), mock.patch.object(finder, "_DETECTORS", finder._DETECTORS):
+            finder.register_detector(
+                finder.EnvDetector("tool", frozenset({"tool-env.toml"}))
+            )
+            with self.assertRaises(ValueError):
+                finder.register_detector(finder.EnvDetector("any"))
+            with self.assertRaises(ValueError):
+                finder.register_detector(
+                    finder.EnvDetector("x", frozenset({"x"})), before="y"
+                )
+            new_env_types, new_listings = scan()
+        self.assertEqual(new_env_types[custom], "tool")
+        self.assertEqual(len(new_env_types), len(env_types) + 1)
+        self.assertEqual(new_listings, listings)
+
     def test_find_venvs(self):
         """Test finding virtual environments in a directory."""
         # Create a few fake venvs
@@ -72,6 +196,513 @@ class TestFinder(unittest.TestCase):
         self.assertIn(venv3_resolved, found_venv_strs)
         self.assertEqual(len(found_venvs), 3)
 
+    def test_find_venvs_skips_files_and_symlinks(self):
+        """Test that plain files and symlinked directories are not walked."""
+        venv = self.temp_dir / "project" / "venv"
+        self.create_fake_venv(venv)
+        (self.temp_dir / "project" / "notes.txt").write_text("not a dir")
+
+        # A symlink to the project must not report the venv a second time
+        (self.temp_dir / "link").symlink_to(self.temp_dir / "project")
+
+        for parallel in (True, False):
+            found_venvs = find_venvs(
+                start_dir=str(self.temp_dir), max_depth=3, parallel=parallel
+            )
+            self.assertEqual(found_venvs, [venv])
+
+    def test_find_venvs_parallel_skewed_tree(self):
+        """Test that the shared work queue covers deep, lopsided trees."""
+        # Almost everything lives under a single first-level directory
+        expected = set()
+        for i in range(20):
+            venv = self.temp_dir / "big" / f"group{i % 4}" / f"p{i}" / "venv"
+            self.create_fake_venv(venv)
+            expected.add(venv)
+        small = self.temp_dir / "small" / "venv"
+        self.create_fake_venv(small)
+        expected.add(small)
+
+        for workers in (1, 4):
+            found_venvs = find_venvs(
+                start_dir=str(self.temp_dir), max_depth=4, max_workers=workers
+            )
+            self.assertEqual(len(found_venvs), len(expected))
+            self.assertEqual(set(found_venvs), expected)
+
+        sequential = find_venvs(
+            start_dir=str(self.temp_dir), max_depth=4, parallel=False
+        )
+        self.assertEqual(set(sequential), expected)
+
+    @unittest.skipUnless(FD_WALK_SUPPORTED, "needs openat and fdopendir")
+    def test_fd_relative_walk(self):
+        """Test that the fd-relative walk matches the path-based one."""
+        scripts = self.temp_dir / "a" / "b" / "c" / "tool" / "bin"
+        scripts.mkdir(parents=True)
+        (scripts / "activate").write_text("# activate")
+        self.create_fake_venv(self.temp_dir / "a" / ".venv")
+        self.create_fake_venv(self.temp_dir / "a" / ".hidden" / "venv")
+        self.create_fake_venv(self.temp_dir / "skip" / "venv")
+        self.create_fake_venv(self.temp_dir / "node_modules" / "venv")
+        (self.temp_dir / "link").symlink_to(self.temp_dir / "a")
+        options = dict(exclude_patterns=[str(self.temp_dir / "skip")])
+
+        expected = find_venvs(str(self.temp_dir), parallel=False, **options)
+        with mock.patch("os.scandir", wraps=os.scandir) as scandir:
+            found = find_venvs(str(self.temp_dir), fd_relative=True, **options)
+        self.assertEqual(found, expected)
+        self.assertEqual(len(found), 2)
+        # Every listing went through a directory file descriptor
+        self.assertTrue(scandir.call_args_list)
+        for call in scandir.call_args_list:
+            self.assertIsInstance(call.args[0], int)
+
+        # No descriptor is left open, even by a walk stopped halfway
+        if os.path.isdir("/proc/self/fd"):
+            fds = len(os.listdir("/proc/self/fd"))
+            scan = iter_venvs(str(self.temp_dir), fd_relative=True)
+            next(scan)
+            scan.close()
+            self.assertEqual(len(os.listdir("/proc/self/fd")), fds)
+
+    @unittest.skipUnless(FD_WALK_SUPPORTED, "needs openat and fdopendir")
+    def test_fd_relative_checkpoint(self):
+        """Test that every directory left out still advances the checkpoint."""
+        skip = self.temp_dir / "skip"
+        skip.mkdir()
+        context = _build_context(self.temp_dir, exclude_patterns=[str(skip)])
+        context.checkpoint = mock.Mock()
+        advance = context.checkpoint.advance
+
+        _, _, fd = context.visit_at(None, str(self.temp_dir), 1)
+        os.close(fd)
+        # Excluded, already visited, and gone before it could be opened
+        for path in (skip, self.temp_dir, self.temp_dir / "gone"):
+            advance.reset_mock()
+            visit = context.visit_at(None, str(path), 1)
+            self.assertEqual(visit, (False, [], None))
+            advance.assert_called_once()
+            self.assertEqual(advance.call_args.args[0], path)
+
+    def test_walk_order_and_depth(self):
+        """Test depth- and breadth-first walks, and trees deeper than the
+        recursion limit."""
+        expected = set()
+        for i in range(4):
+            for venv in ("venv", "lib/src/venv"):
+                expected.add(self.temp_dir / f"p{i}" / venv)
+                self.create_fake_venv(self.temp_dir / f"p{i}" / venv)
+        scan = dict(parallel=False, known_stores=False)
+        found = find_venvs(str(self.temp_dir), **scan)
+        self.assertEqual(set(found), expected)
+        # Depth-first finishes one project before the next
+        for first, second in zip(found[::2], found[1::2]):
+            self.assertEqual(first.parts[-3:][0], second.parts[-5:][0])
+        found = find_venvs(str(self.temp_dir), breadth_first=True, **scan)
+        self.assertEqual(set(found), expected)
+        depths = [len(venv.parts) for venv in found]
+        self.assertEqual(depths, sorted(depths))
+
+        # Far more levels than the stack may grow by while walking them
+        depth = 200
+        bottom = self.temp_dir.joinpath("deep", *["d"] * depth, "venv")
+        self.create_fake_venv(bottom)
+        modes = [{}, {"breadth_first": True}]
+        if FD_WALK_SUPPORTED:
+            modes.append({"fd_relative": True})
+        limit = sys.getrecursionlimit()
+        sys.setrecursionlimit(len(inspect.stack(0)) + 50)
+        try:
+            for mode in modes:
+                options = dict(scan, **mode)
+                found = find_venvs(str(self.temp_dir), depth + 2, **options)
+                self.assertEqual(set(found), expected | {bottom})
+        finally:
+            sys.setrecursionlimit(limit)
+
+    def test_inode_order(self):
+        """Test visiting subdirectories in inode order."""
+        for i in range(8):
+            self.create_fake_venv(self.temp_dir / f"p{i}" / "venv")
+        with os.scandir(self.temp_dir) as it:
+            inodes = {entry.path: entry.inode() for entry in it}
+        for options in ({}, {"index": ScanIndex(self.temp_dir / "idx")}):
+            found = find_venvs(
+                str(self.temp_dir),
+                parallel=False,
+                known_stores=False,
+                inode_order=True,
+                **options,
+            )
+            projects = [str(venv.parent) for venv in found]
+            self.assertEqual(projects, sorted(inodes, key=inodes.get))
+
+    def test_collapse_roots(self):
+        """Test that nested and repeated roots are dropped."""
+        a, ab, abc, ax = Path("/a"), Path("/a/b"), Path("/a/b/c"), Path("/ax")
+        self.assertEqual(collapse_roots([abc, ax, ab, ab, abc]), [ax, ab])
+        self.assertEqual(collapse_roots([ab, ax, a]), [ax, a])
+        self.assertEqual(collapse_roots([ax, Path("/")]), [Path("/")])
+
+    def test_multiple_roots(self):
+        """Test scanning several roots, some nested, in one walk."""
+        code = self.temp_dir / "code"
+        srv = self.temp_dir / "srv"
+        venvs = {
+            code / "app" / "venv",
+            code / "lib" / "work" / ".venv",
+            srv / "site" / "env",
+        }
+        for venv in venvs:
+            self.create_fake_venv(venv)
+        self.create_fake_venv(self.temp_dir / "elsewhere" / "venv")
+        roots = [str(code / "lib"), str(srv), str(code), str(code / "app")]
+        index = ScanIndex(self.temp_dir / "cache" / "index.sqlite")
+        # Move every mtime out of the index's racy window
+        for root, dirs, _ in os.walk(self.temp_dir):
+            for name in dirs + [""]:
+                os.utime(os.path.join(root, name), ns=(10**18, 10**18))
+
+        for options in (
+            {"parallel": True},
+            {"parallel": False},
+            {"index": index},
+            {"exclude_patterns": ["work"], "one_file_system": True},
+        ):
+            expected = venvs
+            if "exclude_patterns" in options:
+                expected = venvs - {code / "lib" / "work" / ".venv"}
+            with mock.patch.object(
+                finder,
+                "_find_venvs_parallel",
+                wraps=finder._find_venvs_parallel,
+            ) as pool:
+                found = find_venvs(roots, 4, known_stores=False, **options)
+            self.assertEqual(len(found), len(expected))
+            self.assertEqual(set(found), expected)
+            # All roots share one pool of workers
+            self.assertLessEqual(pool.call_count, 1)
+
+        # The index remembers every root
+        with mock.patch("os.scandir", wraps=os.scandir) as scandir:
+            found = find_venvs(roots, 4, known_stores=False, index=index)
+        self.assertEqual(set(found), venvs)
+        self.assertEqual(scandir.call_count, 0)
+
+    def test_iter_venvs(self):
+        """Test streaming venvs from a generator and a callback."""
+        expected = set()
+        for i in range(5):
+            venv = self.temp_dir / f"project{i}" / "venv"
+            self.create_fake_venv(venv)
+            expected.add(venv)
+
+        for parallel in (True, False):
+            found = iter_venvs(str(self.temp_dir), 3, parallel=parallel)
+            self.assertEqual(set(found), expected)
+
+        # Closing the generator early stops the scan
+        found = iter_venvs(str(self.temp_dir), max_depth=3)
+        self.assertIn(next(found), expected)
+        found.close()
+
+        seen = []
+        results = find_venvs(str(self.temp_dir), 3, on_found=seen.append)
+        self.assertEqual(seen, results)
+
+    def test_overlapping_roots_visited_once(self):
+        """Test that a shared visited set walks each directory once."""
+        self.create_fake_venv(self.temp_dir / "a" / "b" / "venv")
+        inner = self.temp_dir / "a"
+
+        for table in (None, MountTable([])):
+            visited = set()
+            outer_ctx = _build_context(self.temp_dir, visited=visited)
+            inner_ctx = _build_context(inner, visited=visited)
+            if table is not None:
+                # Without a mount table every directory is stat'ed instead
+                outer_ctx.mounts = inner_ctx.mounts = table
+
+            found = list(_walk(outer_ctx, self.temp_dir, 5))
+            self.assertEqual(found, [inner / "b" / "venv"])
+            # Keys from the listing match the ones from stat'ing the root
+            self.assertEqual(list(_walk(inner_ctx, inner, 5)), [])
+            self.assertEqual(len(visited), 4)
+
+    def test_known_venv_stores_first(self):
+        """Test that envs in central stores are found before the walk."""
+        poetry = self.temp_dir / ".cache" / "pypoetry" / "virtualenvs"
+        self.create_fake_venv(poetry / "app-x1y2-py3.11")
+        self.create_fake_venv(self.temp_dir / "work" / "proj" / ".venv")
+        self.create_fake_venv(self.temp_dir / "work" / "lib" / ".tox" / "py3")
+        # Deeper than max_depth, so only the store probe can find it
+        conda = self.temp_dir / "opt" / "tools" / "miniconda3" / "envs"
+        self.create_fake_venv(conda / "ml" / "lib" / "deep")
+        (conda / "ml" / "bin").mkdir()
+        (conda / "ml" / "bin" / "python").touch()
+
+        env = {"HOME": str(self.temp_dir), "CONDA_ENVS_PATH": str(conda)}
+        with mock.patch.dict(os.environ, env):
+            for var in ("WORKON_HOME", "PYENV_ROOT"):
+                os.environ.pop(var, None)
+            os.environ.pop("POETRY_VIRTUALENVS_PATH", None)
+            self.assertEqual(known_venv_stores(), [poetry, conda])
+
+            for parallel in (True, False):
+                found = find_venvs(str(self.temp_dir), 4, parallel=parallel)
+                self.assertEqual(
+                    set(found[:2]), {poetry / "app-x1y2-py3.11", conda / "ml"}
+                )
+                self.assertEqual(len(found), 4)
+                self.assertIn(self.temp_dir / "work/lib/.tox/py3", found)
+
+            found = find_venvs(str(self.temp_dir), 4, known_stores=False)
+            self.assertEqual(len(found), 3)
+            self.assertNotIn(conda / "ml", found)
+
+    def test_time_budget(self):
+        """Test that a scan out of time reports what it left unexplored."""
+        venvs = set()
+        for i in range(6):
+            venv = self.temp_dir / f"p{i}" / "src" / "venv"
+            self.create_fake_venv(venv)
+            venvs.add(venv)
+
+        report = ScanReport()
+        found = find_venvs(str(self.temp_dir), time_budget=0, report=report)
+        self.assertEqual(found, [])
+        self.assertEqual(report.unexplored, [self.temp_dir])
+        self.assertTrue(report.timed_out)
+        self.assertFalse(report.complete)
+
+        for parallel in (True, False):
+            # Every clock reading is one second later than the one before,
+            # so the budget runs out after a few directories
+            clock = mock.patch(
+                "venvkiller.finder.time.monotonic",
+                side_effect=itertools.count(),
+            )
+            report = ScanReport()
+            with clock:
+                found = find_venvs(
+                    str(self.temp_dir),
+                    parallel=parallel,
+                    time_budget=16,
+                    report=report,
+                )
+            self.assertTrue(found)
+            self.assertTrue(report.unexplored)
+            self.assertFalse(report.complete)
+            # Whatever wasn't found lies in one of the unexplored subtrees
+            for venv in venvs.difference(found):
+                self.assertTrue(
+                    any(d in (venv, *venv.parents) for d in report.unexplored)
+                )
+
+        report = ScanReport()
+        found = find_venvs(str(self.temp_dir), time_budget=60, report=report)
+        self.assertEqual(set(found), venvs)
+        self.assertEqual(report.unexplored, [])
+        self.assertTrue(report.complete)
+        self.assertFalse(report.timed_out)
+
+    def test_concurrency_limit(self):
+        """Test that the limit holds without waits and halves on lag."""
+        now = itertools.count()
+        limit = _ConcurrencyLimit(4, 6, window=1, clock=lambda: next(now))
+
+        def window(latency):
+            for _ in range(limit.MIN_SAMPLES):
+                limit.acquire()
+                limit.release(latency)
+
+        # Without listings waiting for a slot there is no need to grow
+        for _ in range(4):
+            window(0.01)
+        self.assertEqual(limit.limit, 4)
+        window(0.05)
+        self.assertEqual(limit.limit, 2)
+
+        fixed = _ConcurrencyLimit(2, 2, adaptive=False)
+        for latency in (0.01, 1.0):
+            fixed.acquire()
+            fixed.release(latency)
+        self.assertEqual(fixed.limit, 2)
+        self.assertAlmostEqual(fixed.total_latency / fixed.count, 0.505)
+
+    def test_concurrency_grows_with_backlog(self):
+        """Test that the worker pool grows while listings are slow."""
+        for i in range(20):
+            for j in range(20):
+                (self.temp_dir / f"d{i}" / f"e{j}").mkdir(parents=True)
+
+        read_dir = finder._read_dir
+
+        def slow_read_dir(*args, **kwargs):
+            # Latency of a network filesystem, which more listings in
+            # flight don't make worse
+            time.sleep(0.02)
+            return read_dir(*args, **kwargs)
+
+        report = ScanReport()
+        options = dict(known_stores=False, report=report)
+        with mock.patch.object(finder, "_read_dir", slow_read_dir):
+            with mock.patch("os.cpu_count", return_value=1):
+                find_venvs(str(self.temp_dir), **options)
+        self.assertEqual(report.dirs_scanned, 421)
+        self.assertGreater(report.concurrency, 5)
+
+    def test_scan_statistics(self):
+        """Test that a scan reports its concurrency and listing latency."""
+        for i in range(5):
+            self.create_fake_venv(self.temp_dir / f"p{i}" / "venv")
+
+        for parallel, max_workers in ((True, None), (True, 3), (False, None)):
+            report = ScanReport()
+            found = find_venvs(
+                str(self.temp_dir),
+                parallel=parallel,
+                max_workers=max_workers,
+                known_stores=False,
+                report=report,
+            )
+            self.assertEqual(len(found), 5)
+            self.assertEqual(report.dirs_scanned, 11)
+            self.assertGreater(report.latency, 0)
+            self.assertGreaterEqual(report.concurrency, 1)
+            if max_workers:
+                self.assertEqual(report.concurrency, max_workers)
+            if not parallel:
+                self.assertEqual(report.concurrency, 1)
+
+    def test_hung_listings(self):
+        """Test that hung listings are abandoned and their mount given up."""
+        local_venv = self.temp_dir / "local" / "venv"
+        self.create_fake_venv(local_venv)
+        nfs = self.temp_dir / "nfs"
+        stale = [nfs / f"d{i}" for i in range(4)]
+        for directory in stale:
+            directory.mkdir(parents=True)
+        table = MountTable(
+            [
+                Mount("/", "ext4", "/dev/sda1", "rw"),
+                Mount(str(nfs), "nfs4", "server:/export", "rw"),
+            ]
+        )
+
+        read_dir = finder._read_dir
+        unblock = threading.Event()
+        self.addCleanup(unblock.set)
+
+        def hanging_read_dir(directory, *args):
+            if directory.parent == nfs:
+                unblock.wait()
+            return read_dir(directory, *args)
+
+        report = ScanReport()
+        started = time.monotonic()
+        with mock.patch("venvkiller.finder.MountTable", return_value=table):
+            with mock.patch.object(finder, "_read_dir", hanging_read_dir):
+                found = find_venvs(
+                    str(self.temp_dir),
+                    max_workers=1,
+                    known_stores=False,
+                    listing_timeout=0.2,
+                    report=report,
+                )
+        self.assertLess(time.monotonic() - started, 5)
+
+        self.assertEqual(found, [local_venv])
+        self.assertFalse(report.complete)
+        # After two hung listings the other directories on the mount are
+        # skipped without being listed
+        self.assertEqual(len(report.hung), 2)
+        self.assertEqual(set(report.unexplored), set(stale))
+
+    def test_hung_stores_and_start_dirs(self):
+        """Test that a stale store or start directory can't hang the scan."""
+        home = self.temp_dir / "home"
+        venv = home / "work" / ".venv"
+        self.create_fake_venv(venv)
+        store = home / ".virtualenvs"
+        self.create_fake_venv(store / "app")
+        dead = self.temp_dir / "dead"
+        dead.mkdir()
+
+        scandir = os.scandir
+        resolve = Path.resolve
+        unblock = threading.Event()
+        self.addCleanup(unblock.set)
+
+        def hanging_scandir(path=".", *args):
+            if str(path) == str(store):
+                unblock.wait()
+            return scandir(path, *args)
+
+        def hanging_resolve(path, *args, **kwargs):
+            if path == dead:
+                unblock.wait()
+            return resolve(path, *args, **kwargs)
+
+        report = ScanReport()
+        roots = [str(home), str(dead)]
+        options = dict(listing_timeout=0.2)
+        started = time.monotonic()
+        with mock.patch.dict(os.environ, {"HOME": str(home)}):
+            for var in ("WORKON_HOME", "POETRY_VIRTUALENVS_PATH"):
+                os.environ.pop(var, None)
+            for var in ("PYENV_ROOT", "CONDA_ENVS_PATH"):
+                os.environ.pop(var, None)
+            with mock.patch.object(os, "scandir", hanging_scandir):
+                with mock.patch.object(Path, "resolve", hanging_resolve):
+                    found = find_venvs(roots, report=report, **options)
+        self.assertLess(time.monotonic() - started, 5)
+
+        self.assertEqual(found, [venv])
+        self.assertFalse(report.complete)
+        self.assertEqual(report.hung, [dead, store])
+
+    def test_best_first(self):
+        """Test that likely venv locations are expanded first."""
+        for i in range(20):
+            album = self.temp_dir / "a_media" / f"album{i}"
+            (album / "disc").mkdir(parents=True)
+        project = self.temp_dir / "z_project"
+        self.create_fake_venv(project / ".venv")
+        (project / "pyproject.toml").touch()
+
+        for parallel in (True, False):
+            scan = iter_venvs(
+                str(self.temp_dir),
+                parallel=parallel,
+                max_workers=1,
+                best_first=True,
+            )
+            with mock.patch("os.scandir", wraps=os.scandir) as scandir:
+                self.assertEqual(next(scan), project / ".venv")
+            scan.close()
+            # The root, both of its subdirectories and then the venv
+            listed = [Path(c.args[0]) for c in scandir.call_args_list]
+            self.assertIn(project / ".venv", listed[:4])
+
+    def test_best_first_prior_venvs(self):
+        """Test that directories with venvs in earlier scans come first."""
+        old = self.temp_dir / "deep" / "a" / "b" / "env"
+        self.create_fake_venv(old)
+        index = ScanIndex(self.temp_dir / "index.sqlite")
+        find_venvs(str(self.temp_dir), index=index)
+        self.create_fake_venv(self.temp_dir / "shallow" / ".venv")
+
+        for scan_index, first in ((None, "shallow/.venv"), (index, old)):
+            found = find_venvs(
+                str(self.temp_dir),
+                parallel=False,
+                index=scan_index,
+                best_first=True,
+            )
+            self.assertEqual(found[0], self.temp_dir / first)
+
     def test_has_requirement_files(self):
         """Test detecting requirements files in a directory."""
         project_dir = self.temp_dir / "project_with_reqs"
@@ -93,6 +724,28 @@ class TestFinder(unittest.TestCase):
         self.assertFalse(has_reqs)
         self.assertEqual(len(found_files), 0)
 
+    def test_has_requirement_files_single_listing(self):
+        """Test that requirement files are found from cached listings."""
+        project_dir = self.temp_dir / "project"
+        (project_dir / "requirements").mkdir(parents=True)
+        for name in ("Pipfile", "requirements/dev.txt", "requirements/x"):
+            (project_dir / name).touch()
+        (project_dir / "pyproject.toml").mkdir()  # Not a file
+
+        clear_requirement_cache()
+        with mock.patch("os.scandir", wraps=os.scandir) as scandir:
+            for _ in range(3):
+                has_reqs, found_files = has_requirement_files(project_dir)
+                self.assertTrue(has_reqs)
+                expected = ["requirements/dev.txt", "Pipfile"]
+                self.assertEqual(found_files, expected)
+        self.assertEqual(scandir.call_count, 2)
+
+        (project_dir / "poetry.lock").touch()
+        self.assertNotIn("poetry.lock", has_requirement_files(project_dir)[1])
+        clear_requirement_cache()
+        self.assertIn("poetry.lock", has_requirement_files(project_dir)[1])
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,166 @@
+"""Tests for the index module."""
+
+import os
+import tempfile
+import shutil
+import time
+from pathlib import Path
+import unittest
+from unittest import mock
+
+from venvkiller.finder import ScanReport, find_venvs
+from venvkiller.index import (
+    EMPTY_SCANS_BEFORE_SKIP,
+    EMPTY_SUBTREE_REVALIDATE_INTERVAL,
+    MIN_EMPTY_SUBTREE_DIRS,
+    ScanIndex,
+)
+
+
+class TestScanIndex(unittest.TestCase):
+    """Test cases for the scan index."""
+
+    def setUp(self):
+        """Set up a temporary directory for tests."""
+        self.temp_dir = Path(tempfile.mkdtemp()).resolve()
+        self.tree = self.temp_dir / "tree"
+        self.index = ScanIndex(self.temp_dir / "cache" / "index.sqlite")
+
+    def tearDown(self):
+        """Clean up temporary directory after tests."""
+        shutil.rmtree(self.temp_dir)
+
+    def create_fake_venv(self, path: Path):
+        """Create a fake virtual environment for testing."""
+        path.mkdir(parents=True, exist_ok=True)
+        with open(path / "pyvenv.cfg", "w") as f:
+            f.write("home = /usr/bin\nversion = 3.9.0\n")
+
+    def age_tree(self):
+        """Move every directory mtime out of the racy window."""
+        for root, dirs, _ in os.walk(self.tree):
+            for name in dirs + [""]:
+                os.utime(os.path.join(root, name), ns=(10**18, 10**18))
+
+    def scan(self, **kwargs):
+        """Scan the test tree using the index."""
+        return set(find_venvs(str(self.tree), 4, index=self.index, **kwargs))
+
+    def test_rescan_reuses_unchanged_directories(self):
+        """Test that directories with unchanged mtimes are not listed."""
+        venv1 = self.tree / "project1" / "venv"
+        venv2 = self.tree / "project2" / "src" / ".venv"
+        self.create_fake_venv(venv1)
+        self.create_fake_venv(venv2)
+        self.age_tree()
+
+        self.assertEqual(self.scan(), {venv1, venv2})
+
+        for parallel in (True, False):
+            with mock.patch("os.scandir", wraps=os.scandir) as scandir:
+                self.assertEqual(self.scan(parallel=parallel), {venv1, venv2})
+            self.assertEqual(scandir.call_count, 0)
+
+        # Adding a venv changes its parent's mtime, so it is found
+        venv3 = self.tree / "project1" / "env"
+        self.create_fake_venv(venv3)
+        self.assertEqual(self.scan(), {venv1, venv2, venv3})
+
+    def test_removed_venvs_are_pruned(self):
+        """Test that the index forgets directories that went away."""
+        venv1 = self.tree / "project1" / "venv"
+        venv2 = self.tree / "project2" / "venv"
+        self.create_fake_venv(venv1)
+        self.create_fake_venv(venv2)
+
+        self.scan()
+        indexed = set(self.index.venvs_under(self.tree))
+        self.assertEqual(indexed, {venv1, venv2})
+
+        shutil.rmtree(venv2.parent)
+        self.assertEqual(self.scan(), {venv1})
+        self.assertEqual(self.index.venvs_under(self.tree), [venv1])
+        self.assertEqual(self.index.venvs_under(venv2.parent), [])
+
+    def test_venv_free_subtrees_are_skipped(self):
+        """Test that subtrees empty scan after scan are skipped for a while."""
+        venv = self.tree / "project" / "venv"
+        self.create_fake_venv(venv)
+        pictures = self.tree / "Pictures"
+        for i in range(MIN_EMPTY_SUBTREE_DIRS):
+            (pictures / f"album{i // 10}" / f"day{i % 10}").mkdir(parents=True)
+        # Too small to be worth remembering
+        (self.tree / "docs" / "api").mkdir(parents=True)
+
+        for _ in range(EMPTY_SCANS_BEFORE_SKIP):
+            report = ScanReport()
+            self.assertEqual(self.scan(report=report), {venv})
+            self.assertEqual(report.skipped, [])
+
+        report = ScanReport()
+        with mock.patch("os.stat", wraps=os.stat) as stat:
+            self.assertEqual(self.scan(report=report), {venv})
+        self.assertEqual(report.skipped, [pictures])
+        self.assertTrue(report.complete)
+        for call in stat.call_args_list:
+            path = Path(call.args[0])
+            self.assertNotIn(pictures, (path, *path.parents))
+
+        # A venv appearing there goes unnoticed until the subtree is due
+        # to be checked again
+        hidden = pictures / "album0" / "day0" / "venv"
+        self.create_fake_venv(hidden)
+        self.assertEqual(self.scan(), {venv})
+        later = time.time() + EMPTY_SUBTREE_REVALIDATE_INTERVAL
+        with mock.patch("venvkiller.index.time.time", return_value=later):
+            self.assertEqual(self.scan(), {venv, hidden})
+        self.assertEqual(self.scan(), {venv, hidden})
+
+        # Without skipping, every scan walks the whole tree
+        shutil.rmtree(hidden)
+        for _ in range(EMPTY_SCANS_BEFORE_SKIP + 1):
+            report = ScanReport()
+            index = ScanIndex(self.index.path, skip_empty=False)
+            found = find_venvs(str(self.tree), 4, index=index, report=report)
+            self.assertEqual(found, [venv])
+            self.assertEqual(report.skipped, [])
+
+    def create_big_subtree(self, top: Path):
+        """Create a subtree big enough to be remembered as venv-free."""
+        for i in range(MIN_EMPTY_SUBTREE_DIRS):
+            (top / f"group{i // 10}" / f"dir{i % 10}").mkdir(parents=True)
+
+    def test_exclusions_do_not_make_subtrees_empty(self):
+        """Test that subtrees a scan excluded are not learned to be empty."""
+        work = self.tree / "work"
+        self.create_big_subtree(work)
+        venv = work / "group0" / "venv"
+        self.create_fake_venv(venv)
+
+        for _ in range(EMPTY_SCANS_BEFORE_SKIP):
+            self.assertEqual(self.scan(exclude_patterns=["venv"]), set())
+        report = ScanReport()
+        self.assertEqual(self.scan(report=report), {venv})
+        self.assertEqual(report.skipped, [])
+
+    def test_depth_limit_does_not_make_subtrees_empty(self):
+        """Test that subtrees below the depth limit are not learned empty."""
+        work = self.tree / "work"
+        self.create_big_subtree(work)
+        venv = work / "group0" / "dir0" / "venv"
+        self.create_fake_venv(venv)
+        tree = str(self.tree)
+
+        self.assertEqual(find_venvs(tree, 5, index=self.index), [venv])
+        for _ in range(EMPTY_SCANS_BEFORE_SKIP):
+            self.assertEqual(find_venvs(tree, 2, index=self.index), [])
+            # The records below the depth limit are kept too
+            self.assertEqual(self.index.venvs_under(self.tree), [venv])
+        report = ScanReport()
+        found = find_venvs(tree, 5, index=self.index, report=report)
+        self.assertEqual(found, [venv])
+        self.assertEqual(report.skipped, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,142 @@
+"""Tests for the locate module."""
+
+import os
+import struct
+import tempfile
+import shutil
+from pathlib import Path
+import unittest
+
+from venvkiller.finder import ScanReport, find_venvs
+from venvkiller.locate import PathListError, read_path_list
+
+
+def write_mlocate_db(path, root, directories):
+    """Write an mlocate database of ``{directory: [(name, is_dir)]}``."""
+    conf = b"prune_bind_mounts\0\0" + b"0\0\0"
+    data = bytearray(b"\0mlocate")
+    data += struct.pack(">IBBxx", len(conf), 0, 0)
+    data += os.fsencode(root) + b"\0" + conf
+    for directory, entries in directories.items():
+        data += struct.pack(">QIxxxx", 1700000000, 0)
+        data += os.fsencode(directory) + b"\0"
+        for name, is_dir in entries:
+            data += bytes([int(is_dir)]) + os.fsencode(name) + b"\0"
+        data += b"\2"
+    Path(path).write_bytes(bytes(data))
+
+
+class TestPathList(unittest.TestCase):
+    """Test cases for discovery from prebuilt file lists."""
+
+    def setUp(self):
+        """Set up a temporary tree with venvs and a listing of it."""
+        self.temp_dir = Path(tempfile.mkdtemp()).resolve()
+        self.tree = self.temp_dir / "tree"
+        self.venv = self.tree / "project" / ".venv"
+        self.venv.mkdir(parents=True)
+        (self.venv / "pyvenv.cfg").write_text("home = /usr/bin\n")
+        self.conda = self.tree / "envs" / "ml"
+        (self.conda / "bin").mkdir(parents=True)
+        (self.conda / "bin" / "python").touch()
+        (self.conda / "bin" / "activate").touch()
+        excluded = self.tree / "node_modules" / "venv"
+        excluded.mkdir(parents=True)
+        (excluded / "pyvenv.cfg").write_text("home = /usr/bin\n")
+
+        self.files = [
+            self.tree / "project" / "pyproject.toml",
+            self.venv / "pyvenv.cfg",
+            self.conda / "bin" / "python",
+            self.conda / "bin" / "activate",
+            excluded / "pyvenv.cfg",
+            # Deleted since the list was made
+            self.tree / "gone" / "venv" / "pyvenv.cfg",
+            self.temp_dir / "elsewhere" / "venv" / "pyvenv.cfg",
+        ]
+
+    def tearDown(self):
+        """Clean up temporary directory after tests."""
+        shutil.rmtree(self.temp_dir)
+
+    def scan(self, path_list):
+        """Find the venvs in the test tree listed in ``path_list``."""
+        report = ScanReport()
+        path_list = str(path_list)
+        found = find_venvs(str(self.tree), path_list=path_list, report=report)
+        self.assertTrue(report.complete)
+        return set(found)
+
+    def test_nul_and_newline_lists(self):
+        """Test lists written by ``find -print0`` and plain ``locate``."""
+        for separator in ("\0", "\n"):
+            listing = self.temp_dir / "files.txt"
+            listing.write_text(separator.join(map(str, self.files)))
+            self.assertEqual(self.scan(listing), {self.venv, self.conda})
+
+    def test_time_budget(self):
+        """Test that a list scan out of time reports the tree unexplored."""
+        listing = self.temp_dir / "files.txt"
+        listing.write_text("\0".join(map(str, self.files)))
+        report = ScanReport()
+        path_list = str(listing)
+        found = find_venvs(
+            str(self.tree), path_list=path_list, time_budget=0, report=report
+        )
+        self.assertEqual(found, [])
+        self.assertTrue(report.timed_out)
+        self.assertFalse(report.complete)
+        self.assertEqual(report.unexplored, [self.tree])
+
+    def test_mlocate_db(self):
+        """Test reading an mlocate database."""
+        directories = {}
+        for path in self.files:
+            for parent in reversed(path.parents):
+                directories.setdefault(str(parent), [])
+            directories[str(path.parent)].append((path.name, False))
+        db = self.temp_dir / "mlocate.db"
+        write_mlocate_db(db, "/", directories)
+
+        self.assertEqual(self.scan(db), {self.venv, self.conda})
+        listed = set(read_path_list(str(db), within=str(self.venv)))
+        self.assertEqual(listed, {str(self.venv / "pyvenv.cfg")})
+
+    def test_mlocate_db_directory_markers(self):
+        """Test finding envs marked by a directory in an mlocate database."""
+        conda = self.tree / "miniforge" / "envs" / "data"
+        (conda / "conda-meta").mkdir(parents=True)
+        (conda / "conda-meta" / "history").touch()
+        pdm = self.tree / "app" / "__pypackages__"
+        (pdm / "3.12" / "lib").mkdir(parents=True)
+
+        # Every directory with its files and subdirectories, as updatedb
+        # records them
+        directories = {}
+        for parent in reversed(self.tree.parents):
+            directories[str(parent)] = []
+        for directory, dirs, files in os.walk(self.tree):
+            entries = [(name, True) for name in dirs]
+            entries += [(name, False) for name in files]
+            directories[directory] = sorted(entries)
+        db = self.temp_dir / "mlocate.db"
+        write_mlocate_db(db, "/", directories)
+
+        found = self.scan(db)
+        self.assertEqual(found, {self.venv, self.conda, conda, pdm})
+
+    def test_unreadable_databases(self):
+        """Test that plocate and truncated databases raise clear errors."""
+        db = self.temp_dir / "plocate.db"
+        db.write_bytes(b"\0plocate" + bytes(64))
+        with self.assertRaisesRegex(PathListError, "plocate -0"):
+            self.scan(db)
+
+        write_mlocate_db(db, "/", {str(self.venv): [("pyvenv.cfg", False)]})
+        db.write_bytes(db.read_bytes()[:-5])
+        with self.assertRaises(PathListError):
+            self.scan(db)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,162 @@
+"""Tests for the mounts module."""
+
+import os
+import tempfile
+import shutil
+from pathlib import Path
+import unittest
+from unittest import mock
+
+from venvkiller.finder import _ScanContext, _walk, find_venvs
+from venvkiller.mounts import Mount, MountTable, read_mountinfo
+
+MOUNTINFO = """\
+22 1 8:1 / / rw,relatime shared:1 - ext4 /dev/sda1 rw
+23 22 0:22 / /proc rw,nosuid shared:12 - proc proc rw
+24 22 0:23 / /sys rw,nosuid shared:2 master:1 - sysfs sysfs rw
+40 22 0:40 / /srv/my\\040share rw - nfs4 server:/export rw,vers=4.2
+41 22 0:41 / /var/lib/docker/overlay2/abc/merged rw - overlay overlay \
+rw,lowerdir=/var/lib/docker/overlay2/l/A:/var/lib/docker/overlay2/l/B,\
+upperdir=/var/lib/docker/overlay2/abc/diff,workdir=/var/lib/docker/overlay2/abc/work
+"""
+
+
+class TestMounts(unittest.TestCase):
+    """Test cases for mount table handling."""
+
+    def setUp(self):
+        """Set up a temporary directory for tests."""
+        self.temp_dir = Path(tempfile.mkdtemp()).resolve()
+
+    def tearDown(self):
+        """Clean up temporary directory after tests."""
+        shutil.rmtree(self.temp_dir)
+
+    def create_fake_venv(self, path: Path):
+        """Create a fake virtual environment for testing."""
+        path.mkdir(parents=True, exist_ok=True)
+        with open(path / "pyvenv.cfg", "w") as f:
+            f.write("home = /usr/bin\nversion = 3.9.0\n")
+
+    def test_read_mountinfo(self):
+        """Test parsing mountinfo lines, escapes and optional fields."""
+        mountinfo = self.temp_dir / "mountinfo"
+        mountinfo.write_text(MOUNTINFO)
+        mounts = read_mountinfo(str(mountinfo))
+
+        self.assertEqual(len(mounts), 5)
+        self.assertEqual(mounts[1], Mount("/proc", "proc", "proc", "rw"))
+        self.assertEqual(mounts[2].fstype, "sysfs")
+        self.assertEqual(mounts[3].mount_point, "/srv/my share")
+        self.assertEqual(read_mountinfo(str(self.temp_dir / "missing")), [])
+
+    def test_mount_table_skips(self):
+        """Test that pseudo filesystems and overlay layers are skipped."""
+        mountinfo = self.temp_dir / "mountinfo"
+        mountinfo.write_text(MOUNTINFO)
+        table = MountTable(read_mountinfo(str(mountinfo)))
+
+        self.assertTrue(table.available)
+        self.assertTrue(table.is_skipped("/proc"))
+        self.assertTrue(table.is_skipped("/sys"))
+        self.assertTrue(table.is_skipped("/var/lib/docker/overlay2/abc/diff"))
+        self.assertFalse(table.is_skipped("/"))
+        self.assertFalse(table.is_skipped("/srv/my share"))
+        self.assertTrue(table.is_mount_point("/srv/my share"))
+
+    def test_overlay_layer_symlinks(self):
+        """Test that layers named by symlinks are skipped where they are."""
+        overlay2 = self.temp_dir / "overlay2"
+        layer = overlay2 / "abc" / "diff"
+        self.create_fake_venv(layer / "opt" / "venv")
+        (overlay2 / "l").mkdir()
+        (overlay2 / "l" / "A").symlink_to(Path("..", "abc", "diff"))
+        options = f"rw,lowerdir={overlay2 / 'l' / 'A'}"
+        merged = self.temp_dir / "merged"
+        table = MountTable([Mount(str(merged), "overlay", "overlay", options)])
+
+        self.assertTrue(table.is_skipped(str(layer)))
+        with mock.patch("venvkiller.finder.MountTable", return_value=table):
+            self.assertEqual(find_venvs(str(self.temp_dir), max_depth=5), [])
+
+    def test_autofs_mounts_are_scanned(self):
+        """Test that homes on an autofs mount point are not skipped."""
+        home = self.temp_dir / "home"
+        self.create_fake_venv(home / "alice" / "venv")
+        table = MountTable([Mount(str(home), "autofs", "auto.home", "rw")])
+
+        self.assertFalse(table.is_skipped(str(home)))
+        with mock.patch("venvkiller.finder.MountTable", return_value=table):
+            found = find_venvs(str(home), max_depth=3)
+        self.assertEqual(found, [home / "alice" / "venv"])
+
+    def test_scan_skips_pseudo_filesystems(self):
+        """Test that the finder never enters a pseudo filesystem."""
+        self.create_fake_venv(self.temp_dir / "proc" / "venv")
+        self.create_fake_venv(self.temp_dir / "home" / "venv")
+        proc = Mount(str(self.temp_dir / "proc"), "proc", "proc", "rw")
+        table = MountTable([proc])
+
+        with mock.patch("venvkiller.finder.MountTable", return_value=table):
+            found = find_venvs(str(self.temp_dir), max_depth=3)
+        self.assertEqual(found, [self.temp_dir / "home" / "venv"])
+
+    def test_one_file_system(self):
+        """Test that only mount points on another device are left out."""
+        self.create_fake_venv(self.temp_dir / "local" / "venv")
+        self.create_fake_venv(self.temp_dir / "nfs" / "venv")
+        table = MountTable(
+            [
+                Mount("/", "ext4", "/dev/sda1", "rw"),
+                Mount(str(self.temp_dir / "nfs"), "nfs4", "srv:/", "rw"),
+            ]
+        )
+        # Pretend the scan started on a different device than the tree, so
+        # any directory that gets stat'ed is treated as foreign
+        other_dev = os.stat(self.temp_dir).st_dev + 1
+        context = _ScanContext(set(), mounts=table, start_dev=other_dev)
+
+        found = list(_walk(context, self.temp_dir, 3))
+        self.assertEqual(found, [self.temp_dir / "local" / "venv"])
+
+    def test_btrfs_subvolumes(self):
+        """Test that btrfs subvolumes are stat'ed like mount points."""
+        tree = str(self.temp_dir)
+        table = MountTable(
+            [
+                Mount("/", "ext4", "/dev/sda1", "rw"),
+                Mount(tree, "btrfs", "/dev/sda2", "rw"),
+            ]
+        )
+        self.assertTrue(table.is_device_boundary(tree))
+        self.assertTrue(table.is_device_boundary(tree + "/subvol", 256))
+        self.assertFalse(table.is_device_boundary(tree + "/plain", 257))
+        self.assertTrue(table.is_device_boundary(tree + "/unknown"))
+        self.assertFalse(table.is_device_boundary("/elsewhere", 256))
+
+        # Subvolumes have their own device, so their key is not inherited
+        entries = []
+        for name, inode in (("subvol", 256), ("plain", 257)):
+            entry = mock.Mock(spec=os.DirEntry)
+            entry.name = name
+            entry.inode.return_value = inode
+            entries.append(entry)
+        context = _ScanContext(set(), mounts=table)
+        subdirs = context._keyed_subdirs(tree, entries, False, (7, 300))
+        expected = [
+            (os.path.join(tree, "subvol"), None),
+            (os.path.join(tree, "plain"), (7, 257)),
+        ]
+        self.assertEqual(subdirs, expected)
+
+        # Any other device than the tree's, so a stat'ed directory is foreign
+        other_dev = os.stat(tree).st_dev + 1
+        context = _ScanContext(set(), mounts=table, start_dev=other_dev)
+        (self.temp_dir / "subvol").mkdir()
+        self.assertFalse(context.is_scanned(self.temp_dir / "subvol"))
+        key = (other_dev, 257)
+        self.assertTrue(context.is_scanned(self.temp_dir / "plain", key=key))
+
+
+if __name__ == "__main__":
+    unittest.main()
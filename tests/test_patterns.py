@@ -0,0 +1,94 @@
+"""Tests for the patterns module."""
+
+import tempfile
+import shutil
+from pathlib import Path
+import unittest
+
+from venvkiller.finder import find_venvs
+from venvkiller.patterns import PathMatcher, read_pattern_file
+
+
+class TestPatterns(unittest.TestCase):
+    """Test cases for gitignore-style path patterns."""
+
+    def setUp(self):
+        """Set up a temporary directory for tests."""
+        self.temp_dir = Path(tempfile.mkdtemp()).resolve()
+
+    def tearDown(self):
+        """Clean up temporary directory after tests."""
+        shutil.rmtree(self.temp_dir)
+
+    def assertExcludes(self, matcher, path, expected=True):
+        """Assert whether ``matcher`` excludes the POSIX ``path``."""
+        self.assertEqual(matcher.excludes(Path(path)), expected, path)
+
+    def test_pattern_anchoring(self):
+        """Test absolute, root-relative and bare-name patterns."""
+        matcher = PathMatcher(
+            ["/home/*/mnt/archive/**", "**/build/*/cache", "data", "src/gen"],
+            root=Path("/home/leo"),
+        )
+        self.assertExcludes(matcher, "/home/leo/mnt/archive/2019")
+        self.assertExcludes(matcher, "/home/leo/mnt/archive", False)
+        self.assertExcludes(matcher, "/home/leo/x/mnt/archive/2019", False)
+
+        self.assertExcludes(matcher, "/home/leo/build/x86/cache")
+        self.assertExcludes(matcher, "/home/leo/a/b/build/x86/cache")
+        self.assertExcludes(matcher, "/home/leo/build/x86/y/cache", False)
+
+        self.assertExcludes(matcher, "/home/leo/data")
+        self.assertExcludes(matcher, "/home/leo/p/data")
+        self.assertExcludes(matcher, "/home/leo/p/database", False)
+
+        self.assertExcludes(matcher, "/home/leo/src/gen")
+        self.assertExcludes(matcher, "/home/leo/p/src/gen", False)
+
+    def test_negation_last_match_wins(self):
+        """Test that "!" patterns re-include and later patterns win."""
+        matcher = PathMatcher(["cache*", "!cache-keep"])
+        self.assertExcludes(matcher, "/a/cache-tmp")
+        self.assertExcludes(matcher, "/a/cache-keep", False)
+
+        matcher = PathMatcher(["!cache-keep", "cache*"])
+        self.assertExcludes(matcher, "/a/cache-keep")
+
+    def test_wildcards_and_classes(self):
+        """Test "?", character classes and escapes."""
+        matcher = PathMatcher(["build-?", "v[0-9]", "x[!a]", r"lit\*"])
+        self.assertExcludes(matcher, "/p/build-1")
+        self.assertExcludes(matcher, "/p/build-10", False)
+        self.assertExcludes(matcher, "/p/v7")
+        self.assertExcludes(matcher, "/p/vx", False)
+        self.assertExcludes(matcher, "/p/xb")
+        self.assertExcludes(matcher, "/p/xa", False)
+        self.assertExcludes(matcher, "/p/lit*")
+        self.assertExcludes(matcher, "/p/lite", False)
+
+    def test_read_pattern_file(self):
+        """Test reading patterns with comments and blank lines."""
+        pattern_file = self.temp_dir / "excludes"
+        pattern_file.write_text("# media\n\nPictures/\n!Pictures/keep  \n")
+        patterns = read_pattern_file(pattern_file)
+        self.assertEqual(patterns, ["Pictures/", "!Pictures/keep"])
+
+    def test_find_venvs_with_patterns(self):
+        """Test that the finder prunes directories matching patterns."""
+        for name in ("keep/venv", "archive/old/venv", "x/build/a/cache/venv"):
+            venv = self.temp_dir / name
+            venv.mkdir(parents=True)
+            (venv / "pyvenv.cfg").write_text("home = /usr/bin\n")
+
+        for parallel in (True, False):
+            found = find_venvs(
+                str(self.temp_dir),
+                max_depth=6,
+                parallel=parallel,
+                exclude_patterns=["archive/**", "**/build/*/cache"],
+            )
+            self.assertEqual(found, [self.temp_dir / "keep" / "venv"])
+
+
+if __name__ == "__main__":
+    unittest.main()
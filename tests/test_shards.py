@@ -0,0 +1,106 @@
+"""Tests for the shards module."""
+
+import tempfile
+import shutil
+from pathlib import Path
+import unittest
+
+from venvkiller.finder import ScanReport, find_venvs
+from venvkiller.shards import (
+    ResultsError,
+    ScanResults,
+    merge_results,
+    parse_shard,
+    read_results,
+    write_results,
+)
+
+SHARDS = 3
+
+
+class TestShards(unittest.TestCase):
+    """Test cases for sharded scans and merging their results."""
+
+    def setUp(self):
+        """Set up a temporary tree with a venv in many first-level dirs."""
+        self.temp_dir = Path(tempfile.mkdtemp()).resolve()
+        self.tree = self.temp_dir / "tree"
+        self.venvs = set()
+        for i in range(20):
+            venv = self.tree / f"project{i}" / "src" / ".venv"
+            venv.mkdir(parents=True)
+            (venv / "pyvenv.cfg").write_text("home = /usr/bin\n")
+            self.venvs.add(venv)
+
+    def tearDown(self):
+        """Clean up temporary directory after tests."""
+        shutil.rmtree(self.temp_dir)
+
+    def scan_shards(self, **kwargs):
+        """Scan every shard of the tree and return their results."""
+        results = []
+        for i in range(1, SHARDS + 1):
+            report = ScanReport()
+            venvs = find_venvs(
+                str(self.tree),
+                4,
+                report=report,
+                shard=(i, SHARDS),
+                known_stores=False,
+                **kwargs,
+            )
+            shard = (i, SHARDS)
+            result = ScanResults(self.tree, venvs, report.complete, shard)
+            results.append(result)
+        return results
+
+    def test_parse_shard(self):
+        """Test parsing shards given on the command line."""
+        self.assertEqual(parse_shard("2/8"), (2, 8))
+        self.assertEqual(parse_shard("1/1"), (1, 1))
+        for spec in ("0/4", "5/4", "2", "a/b", "1/4/2"):
+            with self.assertRaises(ValueError):
+                parse_shard(spec)
+
+    def test_shards_partition_the_scan(self):
+        """Test that the shards find each venv of a full scan exactly once."""
+        for kwargs in ({"parallel": True}, {"parallel": False}):
+            results = self.scan_shards(**kwargs)
+            found = [venv for result in results for venv in result.venvs]
+            self.assertEqual(len(found), len(self.venvs))
+            self.assertEqual(set(found), self.venvs)
+            # Every shard got some of the work
+            self.assertTrue(all(result.venvs for result in results))
+            self.assertTrue(all(result.complete for result in results))
+
+    def test_merge_result_files(self):
+        """Test that merging deduplicates and notices missing shards."""
+        paths = []
+        written = self.scan_shards()
+        for result in written:
+            path = self.temp_dir / f"shard{result.shard[0]}.json"
+            write_results(path, result)
+            paths.append(path)
+        results = [read_results(path) for path in paths]
+        self.assertEqual(results, written)
+
+        # A shard that was run twice is counted once
+        merged, missing = merge_results(results + results[:1])
+        self.assertEqual(merged.venvs, sorted(self.venvs))
+        self.assertTrue(merged.complete)
+        self.assertEqual(missing, [])
+
+        merged, missing = merge_results(results[1:])
+        self.assertFalse(merged.complete)
+        self.assertEqual(missing, [1])
+
+        elsewhere = results[0]._replace(start_dir=self.temp_dir)
+        with self.assertRaises(ResultsError):
+            merge_results([elsewhere] + results[1:])
+        (self.temp_dir / "junk.json").write_text("[1, 2]")
+        with self.assertRaises(ResultsError):
+            read_results(self.temp_dir / "junk.json")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,120 @@
+"""Tests for the watch module."""
+
+import time
+import tempfile
+import shutil
+from pathlib import Path
+import unittest
+from unittest import mock
+
+from venvkiller import finder
+from venvkiller.watch import VenvWatcher, inotify_available
+
+
+@unittest.skipUnless(inotify_available(), "inotify is only available on Linux")
+class TestVenvWatcher(unittest.TestCase):
+    """Test cases for the inotify venv watcher."""
+
+    def setUp(self):
+        """Set up a temporary directory and a started watcher."""
+        self.temp_dir = Path(tempfile.mkdtemp()).resolve()
+        self.existing = self.temp_dir / "project1" / "venv"
+        self.create_fake_venv(self.existing)
+
+        self.changes = []
+        self.watcher = VenvWatcher(
+            str(self.temp_dir),
+            max_depth=4,
+            on_change=lambda *change: self.changes.append(change),
+            size_delay=0,
+        )
+        self.watcher.start()
+
+    def tearDown(self):
+        """Stop watching and clean up the temporary directory."""
+        self.watcher.close()
+        shutil.rmtree(self.temp_dir)
+
+    def create_fake_venv(self, path: Path):
+        """Create a fake virtual environment for testing."""
+        path.mkdir(parents=True, exist_ok=True)
+        with open(path / "pyvenv.cfg", "w") as f:
+            f.write("home = /usr/bin\nversion = 3.9.0\n")
+
+    def venvs(self):
+        """Get the venvs the watcher currently knows about."""
+        return self.watcher.venvs()
+
+    def wait_for(self, condition):
+        """Process events until ``condition()`` holds or a timeout expires."""
+        deadline = time.monotonic() + 5
+        while not condition() and time.monotonic() < deadline:
+            self.watcher.process_events(0.05)
+        return condition()
+
+    def test_initial_scan(self):
+        """Test that the initial scan reports existing venvs."""
+        self.assertEqual(list(self.watcher.venvs()), [self.existing])
+        self.assertEqual(self.changes[0][:2], ("added", self.existing))
+
+    def test_created_and_removed_venvs(self):
+        """Test that venvs appear and disappear without a rescan."""
+        # A new project tree created after the watch started
+        new_venv = self.temp_dir / "project2" / "src" / ".venv"
+        self.create_fake_venv(new_venv)
+        self.assertTrue(self.wait_for(lambda: new_venv in self.venvs()))
+
+        # A plain directory that becomes a venv once pyvenv.cfg appears
+        late_venv = self.temp_dir / "project1" / "env"
+        late_venv.mkdir()
+        self.watcher.process_events(0.05)
+        self.create_fake_venv(late_venv)
+        self.assertTrue(self.wait_for(lambda: late_venv in self.venvs()))
+
+        shutil.rmtree(self.existing.parent)
+        existing = self.existing
+        self.assertTrue(self.wait_for(lambda: existing not in self.venvs()))
+        self.assertIn(("removed", existing, 0), self.changes)
+
+    def test_registered_detector_markers(self):
+        """Test that markers of registered detectors turn dirs into venvs."""
+        tool_env = self.temp_dir / "project1" / "tool-env"
+        tool_env.mkdir()
+        self.watcher.process_events(0.05)
+
+        detector = finder.EnvDetector("tool", frozenset({"etc/tool.toml"}))
+        detectors = mock.patch.object(
+            finder, "ENV_DETECTORS", list(finder.ENV_DETECTORS)
+        )
+        table = mock.patch.object(finder, "_DETECTORS", finder._DETECTORS)
+        with detectors, table:
+            finder.register_detector(detector)
+            (tool_env / "etc").mkdir()
+            self.watcher.process_events(0.05)
+            (tool_env / "etc" / "tool.toml").write_text("")
+            self.assertTrue(self.wait_for(lambda: tool_env in self.venvs()))
+
+    def test_size_updates(self):
+        """Test that writes inside a venv update its size."""
+        before = self.watcher.venvs()[self.existing]
+        (self.existing / "big.bin").write_bytes(b"x" * 4096)
+        self.assertTrue(
+            self.wait_for(lambda: self.venvs()[self.existing] == before + 4096)
+        )
+        self.assertEqual(self.changes[-1][0], "resized")
+
+    def test_size_updates_in_new_site_packages(self):
+        """Test that site-packages created after detection is watched."""
+        before = self.watcher.venvs()[self.existing]
+        packages = self.existing / "lib" / "python3.12" / "site-packages"
+        packages.mkdir(parents=True)
+        for _ in range(3):
+            self.watcher.process_events(0.05)
+
+        (packages / "module.bin").write_bytes(b"x" * 100000)
+        venv, expected = self.existing, before + 100000
+        self.assertTrue(self.wait_for(lambda: self.venvs()[venv] == expected))
+
+
+if __name__ == "__main__":
+    unittest.main()
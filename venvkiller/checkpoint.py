@@ -0,0 +1,223 @@
+"""Module for checkpointing scans so an interrupted one can be resumed."""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple, Union
+
+from venvkiller.index import get_cache_dir
+from venvkiller.shards import Shard
+
+CHECKPOINT_VERSION = 1
+
+# Seconds between checkpoints written while a scan runs
+DEFAULT_CHECKPOINT_INTERVAL = 30.0
+
+
+def _scan_key(start_path: Union[Path, Sequence[Path]]) -> str:
+    """Identify a scan by the directory, or directories, it starts from."""
+    if isinstance(start_path, Path):
+        return str(start_path)
+    return "\0".join(str(path) for path in start_path)
+
+
+def get_default_checkpoint_path(
+    start_path: Union[Path, Sequence[Path]], shard: Optional[Shard] = None
+) -> Path:
+    """Get the checkpoint file for scans of ``start_path`` (or a shard)."""
+    key = _scan_key(start_path)
+    if shard is not None:
+        key += f"\0{shard[0]}/{shard[1]}"
+    digest = hashlib.sha1(key.encode("utf-8", "surrogateescape"))
+    return get_cache_dir() / "checkpoints" / f"{digest.hexdigest()}.json"
+
+
+class PendingDir(NamedTuple):
+    """A directory the scan has yet to visit."""
+
+    path: Path
+    depth: int
+    include_hidden: bool
+
+
+class ScanCheckpoint:
+    """Frontier of a running scan, saved to a file every so often.
+
+    The frontier holds the directories that were found but not visited
+    yet; together with the venvs found so far it is everything a scan
+    needs to carry on where it stopped, without walking the subtrees it
+    already finished again.
+
+    The checkpoint is written every ``interval`` seconds while the scan
+    runs and when it stops early, and deleted once a scan completes.
+    """
+
+    def __init__(
+        self,
+        path: Optional[Path] = None,
+        interval: float = DEFAULT_CHECKPOINT_INTERVAL,
+    ):
+        """Create a checkpoint.
+
+        Args:
+            path: File to keep the checkpoint in (defaults to one per start
+                directory in the cache directory)
+            interval: Seconds between checkpoints during a scan
+        """
+        self.path = Path(path) if path else None
+        self.interval = interval
+        self.start_path: Optional[Union[Path, List[Path]]] = None
+        self.max_depth = 0
+        self.shard: Optional[Shard] = None
+        self._pending: Dict[str, Tuple[int, bool]] = {}
+        self._found: Dict[str, None] = {}
+        self._last_save = 0.0
+        self._lock = threading.Lock()
+
+    def _file(self) -> Path:
+        return self.path or get_default_checkpoint_path(self.start_path, self.shard)
+
+    def begin(
+        self,
+        start_path: Union[Path, Sequence[Path]],
+        max_depth: int,
+        resume: bool = False,
+        include_hidden: bool = True,
+        shard: Optional[Shard] = None,
+    ) -> Optional[Tuple[List[Path], List[PendingDir]]]:
+        """Start tracking a scan.
+
+        Args:
+            start_path: Directory the scan starts from, or the directories
+                of a scan of several roots
+            max_depth: Maximum depth of the scan
+            resume: Whether to pick up a saved scan of the same directory
+            include_hidden: Whether a fresh scan descends into the hidden
+                directories right below ``start_path``
+            shard: Shard of the scan, if it is one; shards of a scan keep
+                separate checkpoints
+
+        Returns:
+            Tuple of (venvs_found, directories_left) of the saved scan if
+            resuming one, otherwise None for a fresh scan that starts at
+            ``start_path``
+        """
+        roots = [start_path] if isinstance(start_path, Path) else list(start_path)
+        self.start_path = start_path if isinstance(start_path, Path) else roots
+        self.max_depth = max_depth
+        self.shard = shard
+        self._pending = {}
+        self._found = {}
+        self._last_save = time.monotonic()
+
+        state = self._read() if resume else None
+        if state is None:
+            for root in roots:
+                self._pending[str(root)] = (max_depth, include_hidden)
+            return None
+
+        found, pending = state
+        self._found = dict.fromkeys(str(venv) for venv in found)
+        for item in pending:
+            self._pending[str(item.path)] = (item.depth, item.include_hidden)
+        return found, pending
+
+    def _read(self) -> Optional[Tuple[List[Path], List[PendingDir]]]:
+        try:
+            with open(self._file(), "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if (
+                data.get("version") != CHECKPOINT_VERSION
+                or data.get("start_dir") != _scan_key(self.start_path)
+                or data.get("max_depth") != self.max_depth
+                or data.get("shard") != (list(self.shard) if self.shard else None)
+            ):
+                return None
+            found = [Path(venv) for venv in data["found"]]
+            pending = [
+                PendingDir(Path(path), int(depth), bool(hidden))
+                for path, depth, hidden in data["pending"]
+            ]
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+        return found, pending
+
+    def advance(
+        self,
+        directory: Path,
+        is_venv: bool,
+        subdirs: Iterable[Path],
+        depth: int,
+    ) -> None:
+        """Replace a visited directory with its subdirectories.
+
+        Args:
+            directory: Directory that was just visited
+            is_venv: Whether it is a venv
+            subdirs: Subdirectories the scan will visit next
+            depth: Remaining depth of the subdirectories
+        """
+        with self._lock:
+            self._pending.pop(str(directory), None)
+            if is_venv:
+                self._found[str(directory)] = None
+            for subdir in subdirs:
+                self._pending[str(subdir)] = (depth, False)
+            now = time.monotonic()
+            due = now - self._last_save >= self.interval
+            if due:
+                self._last_save = now
+        if due:
+            self.save()
+
+    def save(self) -> None:
+        """Write the checkpoint now; errors are ignored.
+
+        Does nothing unless a scan is being tracked, so it is safe to call
+        when a program quits whether or not its scan completed.
+        """
+        with self._lock:
+            if self.start_path is None:
+                return
+            self._last_save = time.monotonic()
+            data = {
+                "version": CHECKPOINT_VERSION,
+                "start_dir": _scan_key(self.start_path),
+                "max_depth": self.max_depth,
+                "shard": list(self.shard) if self.shard else None,
+                "found": list(self._found),
+                "pending": [
+                    [path, depth, hidden]
+                    for path, (depth, hidden) in self._pending.items()
+                ],
+            }
+        path = self._file()
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}")
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            # Never leave a half-written checkpoint behind
+            os.replace(tmp, path)
+        except OSError:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+
+    def clear(self) -> None:
+        """Delete the checkpoint after a scan completed."""
+        with self._lock:
+            if self.start_path is None:
+                return
+            path = self._file()
+            self.start_path = None
+            self._pending = {}
+            self._found = {}
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
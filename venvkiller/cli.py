@@ -1,11 +1,13 @@
 """Command-line interface for the venvkiller tool."""
 
+import signal
 import sys
 import time
 import asyncio
 from pathlib import Path
 
 import click
+from click.core import ParameterSource
 from rich.console import Console
 from rich.progress import (
     Progress,
@@ -21,7 +23,19 @@ from textual.binding import Binding
 from textual.containers import Container, Horizontal
 
 from venvkiller import __version__, DEFAULT_RECENT_THRESHOLD, DEFAULT_OLD_THRESHOLD
-from venvkiller.finder import find_venvs
+from venvkiller.checkpoint import ScanCheckpoint
+from venvkiller.finder import LISTING_TIMEOUT, ScanReport, iter_venvs
+from venvkiller.index import ScanIndex
+from venvkiller.patterns import read_pattern_file
+from venvkiller.shards import (
+    ResultsError,
+    ScanResults,
+    merge_results,
+    parse_shard,
+    read_results,
+    write_results,
+)
+from venvkiller.watch import VenvWatcher, inotify_available
 from venvkiller.analyzer import (
     get_venv_info,
     classify_venv_age,
@@ -54,12 +68,20 @@ class VenvDetailsPanel(Static):
         details = []
         details.append(f"[bold]Path:[/bold] {self.venv['path']}")
         details.append(f"[bold]Size:[/bold] [cyan]{self.venv['size_formatted']}[/cyan]")
+        if "allocated_formatted" in self.venv:
+            details.append(
+                f"[bold]On Disk:[/bold] [cyan]{self.venv['allocated_formatted']}[/cyan]"
+                f" ({self.venv.get('file_count', 0)} files,"
+                f" {self.venv.get('dir_count', 0)} directories)"
+            )
         details.append(
             f"[bold]Last Modified:[/bold] [magenta]{self.venv['modified_ago']}[/magenta]"
         )
         details.append(
             f"[bold]Python Version:[/bold] [blue]{self.venv.get('py_version', 'Unknown')}[/blue]"
         )
+        if self.venv.get("env_type"):
+            details.append(f"[bold]Type:[/bold] {self.venv['env_type']}")
 
         # Requirements info
         req_status = (
@@ -195,11 +217,15 @@ class VenvKillerApp(App):
         Binding("up", "cursor_up", "Up"),
         Binding("down", "cursor_down", "Down"),
         Binding("space", "toggle_marked", "Mark/Unmark"),
+        Binding("s", "toggle_size", "Size/On Disk"),
     ]
 
-    def __init__(self, start_dir, recent_threshold, old_threshold):
+    def __init__(self, start_dirs, recent_threshold, old_threshold, scan_options=None):
         super().__init__()
-        self.start_dir = Path(start_dir).expanduser().resolve()
+        # Roots of the scan; nested ones are dropped by iter_venvs
+        self.start_dirs = list(start_dirs)
+        # Extra keyword arguments for iter_venvs
+        self.scan_options = scan_options or {}
         self.recent_threshold = recent_threshold
         self.old_threshold = old_threshold
         self.venvs = []
@@ -208,6 +234,8 @@ class VenvKillerApp(App):
         self.scan_time = 0
         self.marked_venvs = set()
         self.deleted_venvs = set()
+        # Whether sizes are shown as allocated on disk rather than apparent
+        self.show_allocated = False
 
     def compose(self) -> ComposeResult:
         """Compose the UI layout."""
@@ -278,8 +306,12 @@ class VenvKillerApp(App):
             venv_paths = []
             count = 0
 
-            # We'll count environments as we find them
-            for venv_path in find_venvs(self.start_dir, parallel=True):
+            report = ScanReport()
+
+            # Venvs stream in as the scan workers discover them
+            for venv_path in iter_venvs(
+                self.start_dirs, parallel=True, report=report, **self.scan_options
+            ):
                 venv_paths.append(venv_path)
                 count += 1
                 loading.update_progress(count)
@@ -292,9 +324,13 @@ class VenvKillerApp(App):
             loading.update()
 
             for i, venv_path in enumerate(venv_paths):
-                info = get_venv_info(venv_path)
+                info = get_venv_info(
+                    venv_path,
+                    self.scan_options.get("inode_order", False),
+                    report.env_types.get(venv_path),
+                )
                 self.venvs.append(info)
-                self.total_size += info.get("size_bytes", 0)
+                self.total_size += info.get(self.size_key(), 0)
                 loading.update_progress(i + 1, len(venv_paths))
 
                 # Add small delay to make UI updates visible
@@ -303,10 +339,20 @@ class VenvKillerApp(App):
             self.scan_time = time.time() - start_time
 
             # Sort by size (largest first)
-            self.venvs.sort(key=lambda x: x.get("size_bytes", 0), reverse=True)
+            self.venvs.sort(key=lambda x: x.get(self.size_key(), 0), reverse=True)
 
             # Update stats and title
             self.sub_title = f"venvkiller v{__version__}"
+            if report.timed_out:
+                self.sub_title += (
+                    f" (time budget reached, {len(report.unexplored)} "
+                    "directories not scanned)"
+                )
+            elif report.hung:
+                self.sub_title += (
+                    f" ({len(report.hung)} directories did not respond, "
+                    f"{len(report.unexplored)} not scanned)"
+                )
             self.query_one(StatsPanel).update_stats(
                 self.total_size, len(self.venvs), self.saved_size, self.scan_time
             )
@@ -363,7 +409,7 @@ class VenvKillerApp(App):
             mark_cell = Text(mark, style="bold green" if is_marked else "")
 
             # Create right-aligned text for size and age
-            size_text = Text(venv["size_formatted"], justify="right")
+            size_text = Text(format_size(venv.get(self.size_key(), 0)), justify="right")
             age_text = Text(venv["modified_ago"], justify="right")
             # Create centered text for Python version and requirements status
             py_version = Text(venv.get("py_version", "Unknown"), justify="center")
@@ -386,6 +432,38 @@ class VenvKillerApp(App):
             self.key_to_row[i] = row_index
             row_index += 1
 
+    def size_key(self):
+        """Get the key of the venv info holding the size shown."""
+        return "allocated_bytes" if self.show_allocated else "size_bytes"
+
+    def action_toggle_size(self) -> None:
+        """Switch between apparent sizes and sizes allocated on disk.
+
+        The venvs are sorted again by the size shown, largest first.
+        """
+        self.show_allocated = not self.show_allocated
+        key = self.size_key()
+        order = sorted(
+            range(len(self.venvs)),
+            key=lambda i: self.venvs[i].get(key, 0),
+            reverse=True,
+        )
+        # Marks and deletions are kept by index, which the sort changes
+        new_index = {old: new for new, old in enumerate(order)}
+        self.venvs = [self.venvs[i] for i in order]
+        self.marked_venvs = {new_index[i] for i in self.marked_venvs}
+        self.deleted_venvs = {new_index[i] for i in self.deleted_venvs}
+        self.total_size = sum(venv.get(key, 0) for venv in self.venvs)
+        self.populate_table()
+        self.query_one(StatsPanel).update_stats(
+            self.total_size, len(self.venvs) - len(self.deleted_venvs)
+        )
+        self.notify(
+            "Showing size allocated on disk"
+            if self.show_allocated
+            else "Showing apparent size"
+        )
+
     def _find_key_for_row(self, row_index):
         """Helper method to find the key for a given row index."""
         for k, v in self.key_to_row.items():
@@ -600,6 +678,10 @@ class VenvKillerApp(App):
 
     def action_quit(self) -> None:
         """Quit the application."""
+        checkpoint = self.scan_options.get("checkpoint")
+        if checkpoint is not None:
+            # Lets --resume pick up a scan that was still running
+            checkpoint.save()
         self.exit()
 
         # Final stats after exit
@@ -611,13 +693,126 @@ class VenvKillerApp(App):
         console.print(f"- Disk space saved: {format_size(self.saved_size)}")
 
 
-@click.command()
-@click.option(
-    "--start-dir",
-    "-d",
-    default="~",
-    help="Directory to start searching from (default: home directory)",
-)
+def read_exclude_files(paths):
+    """Read the patterns of every --exclude-from file, in order."""
+    patterns = []
+    for path in paths:
+        patterns.extend(read_pattern_file(path))
+    return patterns
+
+
+def parse_shard_option(ctx, param, value):
+    """Turn a --shard value like 2/8 into a (2, 8) tuple."""
+    if value is None:
+        return None
+    try:
+        return parse_shard(value)
+    except ValueError as e:
+        raise click.BadParameter(str(e))
+
+
+# Shared by the TUI and `scan`; given before a subcommand they are passed on
+# to `scan` like its own options
+SCAN_OPTIONS = [
+    click.option(
+        "--start-dir",
+        "-d",
+        multiple=True,
+        default=["~"],
+        help="Directory to start searching from (default: home directory); "
+        "repeat to scan several at once",
+    ),
+    click.option(
+        "--no-index",
+        is_flag=True,
+        help="Rescan every directory instead of reusing the scan index from previous runs",
+    ),
+    click.option(
+        "--revalidate",
+        is_flag=True,
+        help="Also walk the subtrees that previous scans kept finding empty",
+    ),
+    click.option(
+        "--exclude-from",
+        multiple=True,
+        type=click.Path(exists=True, dir_okay=False),
+        help="File of gitignore-style patterns of directories to skip (repeatable)",
+    ),
+    click.option(
+        "--one-file-system",
+        "-x",
+        is_flag=True,
+        help="Stay on the filesystem of the start directory",
+    ),
+    click.option(
+        "--time-budget",
+        type=float,
+        help="Seconds the scan may take; stop then and report what was left out",
+    ),
+    click.option(
+        "--resume",
+        is_flag=True,
+        help="Continue the interrupted previous scan of the start directory",
+    ),
+    click.option(
+        "--best-first",
+        is_flag=True,
+        help="Look where environments are likely to be first (projects, past finds)",
+    ),
+    click.option(
+        "--listing-timeout",
+        type=float,
+        default=LISTING_TIMEOUT,
+        show_default=True,
+        help="Seconds to wait for a directory (e.g. on a stale network mount)",
+    ),
+    click.option(
+        "--inode-order",
+        is_flag=True,
+        help="Read directories in inode order; speeds up cold-cache scans on ext4/XFS",
+    ),
+    click.option(
+        "--from-list",
+        type=click.Path(exists=True, dir_okay=False, allow_dash=True),
+        help="Take environments from an mlocate database or a (NUL-separated) "
+        "file list instead of walking the disk; - reads standard input",
+    ),
+]
+
+
+def with_scan_options(func):
+    """Add the options that control the scan to a command."""
+    for option in reversed(SCAN_OPTIONS):
+        func = option(func)
+    return func
+
+
+def forward_scan_options(ctx):
+    """Pass the options given before a subcommand on to it.
+
+    `venvkiller --time-budget 60 scan` scans like `venvkiller scan
+    --time-budget 60`, with the options after the subcommand taking
+    precedence. Options the subcommand does not take are an error rather
+    than being dropped.
+    """
+    subcommand = ctx.command.get_command(ctx, ctx.invoked_subcommand)
+    takes = {param.name: param for param in subcommand.params}
+    given = {}
+    for param in ctx.command.params:
+        source = ctx.get_parameter_source(param.name)
+        if source in (None, ParameterSource.DEFAULT, ParameterSource.DEFAULT_MAP):
+            continue
+        if param.name not in takes or takes[param.name].multiple != param.multiple:
+            raise click.UsageError(
+                f"{param.opts[0]} does not apply to `{ctx.invoked_subcommand}`",
+                ctx,
+            )
+        given[param.name] = ctx.params[param.name]
+    ctx.default_map = {ctx.invoked_subcommand: given}
+
+
+@click.group(invoke_without_command=True)
+@with_scan_options
 @click.option(
     "--recent",
     "-r",
@@ -631,15 +826,246 @@ class VenvKillerApp(App):
     help=f"Days threshold for considering an environment old (red) (default: {DEFAULT_OLD_THRESHOLD})",
 )
 @click.version_option(version=__version__)
-def main(start_dir, recent, old):
+@click.pass_context
+def main(
+    ctx,
+    start_dir,
+    recent,
+    old,
+    no_index,
+    revalidate,
+    exclude_from,
+    one_file_system,
+    time_budget,
+    resume,
+    best_first,
+    listing_timeout,
+    inode_order,
+    from_list,
+):
     """Find and delete Python virtual environments to free up disk space."""
+    if ctx.invoked_subcommand is not None:
+        forward_scan_options(ctx)
+        return
+
     try:
-        app = VenvKillerApp(start_dir, recent, old)
+        scan_options = {
+            "exclude_patterns": read_exclude_files(exclude_from),
+            "one_file_system": one_file_system,
+            "time_budget": time_budget,
+            "checkpoint": ScanCheckpoint(),
+            "resume": resume,
+            "best_first": best_first,
+            "listing_timeout": listing_timeout,
+            "path_list": from_list,
+            "inode_order": inode_order,
+        }
+        if not no_index:
+            scan_options["index"] = ScanIndex(skip_empty=not revalidate)
+
+        app = VenvKillerApp(start_dir, recent, old, scan_options)
         app.run()
     except Exception as e:
         console.print(f"[bold red]Error:[/bold red] {str(e)}")
         sys.exit(1)
 
 
+@main.command()
+@with_scan_options
+@click.option(
+    "--stats",
+    is_flag=True,
+    help="Print directories scanned, concurrency and listing latency to stderr",
+)
+@click.option(
+    "--shard",
+    metavar="I/N",
+    callback=parse_shard_option,
+    help="Only scan the I-th of N parts of the start directory, split by "
+    "first-level directory (combine the parts with `venvkiller merge`)",
+)
+@click.option(
+    "--output",
+    type=click.Path(dir_okay=False, writable=True),
+    help="Also write the environments found to this result file",
+)
+def scan(
+    start_dir,
+    no_index,
+    revalidate,
+    exclude_from,
+    one_file_system,
+    time_budget,
+    resume,
+    best_first,
+    listing_timeout,
+    inode_order,
+    from_list,
+    stats,
+    shard,
+    output,
+):
+    """Print the paths of the environments found, one per line."""
+    if output and len(start_dir) > 1:
+        raise click.UsageError("--output takes a single --start-dir")
+    # Unwind on SIGTERM too, so the scan saves its checkpoint
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(128 + signum))
+    report = ScanReport()
+    found = []
+    try:
+        for venv_path in iter_venvs(
+            start_dir,
+            index=None if no_index else ScanIndex(skip_empty=not revalidate),
+            exclude_patterns=read_exclude_files(exclude_from),
+            one_file_system=one_file_system,
+            time_budget=time_budget,
+            report=report,
+            checkpoint=ScanCheckpoint(),
+            resume=resume,
+            best_first=best_first,
+            listing_timeout=listing_timeout,
+            path_list=from_list,
+            shard=shard,
+            inode_order=inode_order,
+        ):
+            found.append(venv_path)
+            click.echo(venv_path)
+    except Exception as e:
+        console.print(f"[bold red]Error:[/bold red] {str(e)}")
+        sys.exit(1)
+    finally:
+        if output:
+            # Written even for a scan cut short, marked as incomplete
+            start_path = Path(start_dir[0]).expanduser().resolve()
+            results = ScanResults(start_path, found, report.complete, shard)
+            write_results(output, results)
+
+    if report.timed_out:
+        click.echo(
+            f"Time budget reached after {report.elapsed:.1f}s, not scanned:",
+            err=True,
+        )
+        for directory in report.unexplored:
+            click.echo(f"  {directory}", err=True)
+    elif report.hung:
+        click.echo(
+            f"Gave up on {len(report.hung)} directories that did not respond "
+            f"within {listing_timeout:g}s, not scanned:",
+            err=True,
+        )
+        for directory in report.unexplored:
+            click.echo(f"  {directory}", err=True)
+    if stats:
+        click.echo(
+            f"Scanned {report.dirs_scanned} directories in {report.elapsed:.1f}s, "
+            f"{report.concurrency} in flight, "
+            f"{report.latency * 1000:.2f} ms per listing",
+            err=True,
+        )
+        if report.skipped:
+            click.echo(
+                f"Skipped {len(report.skipped)} subtrees that previous scans "
+                "found empty (--revalidate to walk them)",
+                err=True,
+            )
+
+
+@main.command()
+@click.argument("result_files", nargs=-1, required=True, type=click.Path(exists=True))
+@click.option(
+    "--output",
+    type=click.Path(dir_okay=False, writable=True),
+    help="Write the merged result file here instead of printing the paths",
+)
+def merge(result_files, output):
+    """Combine the result files of the shards of a scan."""
+    try:
+        merged, missing = merge_results(read_results(path) for path in result_files)
+    except (OSError, ResultsError) as e:
+        console.print(f"[bold red]Error:[/bold red] {str(e)}")
+        sys.exit(1)
+
+    if output:
+        write_results(output, merged)
+    else:
+        for venv_path in merged.venvs:
+            click.echo(venv_path)
+    if missing:
+        click.echo(
+            "Missing the results of shards " + ", ".join(str(i) for i in missing),
+            err=True,
+        )
+    elif not merged.complete:
+        click.echo("Some shards did not finish their scan", err=True)
+
+
+@main.command()
+@click.option(
+    "--start-dir",
+    "-d",
+    default="~",
+    help="Directory to watch (default: home directory)",
+)
+@click.option(
+    "--no-index",
+    is_flag=True,
+    help="Rescan every directory instead of reusing the scan index from previous runs",
+)
+@click.option(
+    "--exclude-from",
+    multiple=True,
+    type=click.Path(exists=True, dir_okay=False),
+    help="File of gitignore-style patterns of directories to skip (repeatable)",
+)
+@click.option(
+    "--one-file-system",
+    "-x",
+    is_flag=True,
+    help="Stay on the filesystem of the start directory",
+)
+def watch(start_dir, no_index, exclude_from, one_file_system):
+    """Keep watching for environments being created and removed (Linux only)."""
+    if not inotify_available():
+        console.print("[bold red]Error:[/bold red] watch mode requires Linux inotify")
+        sys.exit(1)
+
+    styles = {"added": "green", "removed": "red", "resized": "yellow"}
+
+    def print_change(event, venv_path, size_bytes):
+        style = styles[event]
+        size = f" ({format_size(size_bytes)})" if event != "removed" else ""
+        console.print(f"[{style}]{event:>7}[/{style}] {venv_path}{size}")
+
+    watcher = VenvWatcher(
+        start_dir,
+        index=None if no_index else ScanIndex(),
+        on_change=print_change,
+        exclude_patterns=read_exclude_files(exclude_from),
+        one_file_system=one_file_system,
+    )
+    try:
+        with console.status("Scanning for environments..."):
+            watcher.start()
+        console.print(
+            f"[bold]Watching {watcher.watch_count} directories:[/bold] "
+            f"{len(watcher.venvs())} venvs, {format_size(watcher.total_size())}. "
+            "Press Ctrl-C to stop."
+        )
+        watcher.run()
+    except KeyboardInterrupt:
+        pass
+    except Exception as e:
+        console.print(f"[bold red]Error:[/bold red] {str(e)}")
+        sys.exit(1)
+    finally:
+        watcher.close()
+
+    if watcher.watch_errors:
+        console.print(
+            f"[yellow]{watcher.watch_errors} directories could not be watched "
+            "(see /proc/sys/fs/inotify/max_user_watches)[/yellow]"
+        )
+
+
 if __name__ == "__main__":
     main()
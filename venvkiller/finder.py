@@ -2,128 +2,1799 @@
 
 import os
 import sys
+import queue
+import heapq
+import itertools
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
 from pathlib import Path
-from concurrent.futures import ThreadPoolExecutor
-from typing import List, Iterator, Optional, Set, Tuple
+from typing import (Any, Callable, Dict, FrozenSet, Iterable, List, Iterator,
+                    NamedTuple, Optional, Sequence, Set, Tuple, Union)
+
+from venvkiller.checkpoint import PendingDir, ScanCheckpoint
+from venvkiller.index import DirRecord, ScanIndex
+from venvkiller.locate import read_path_list
+from venvkiller.shards import Shard, shard_of
+from venvkiller.mounts import MountTable
+from venvkiller.patterns import PathMatcher
 
 # Common venv directory names and identifiers
 VENV_NAMES = {'venv', 'env', '.venv', '.env', 'virtualenv', '.virtualenv', 'pyenv'}
-VENV_IDENTIFIERS = {
-    'pyvenv.cfg',  # Standard venv
-    'bin/activate',  # Unix-like
-    'Scripts/activate',  # Windows
-    'bin/python',  # Unix-like
-    'Scripts/python.exe',  # Windows
+if sys.platform == 'win32':
+    VENV_IDENTIFIERS = {
+        'pyvenv.cfg',  # Standard venv
+        'Scripts/activate',
+        'Scripts/python.exe',
+    }
+else:
+    VENV_IDENTIFIERS = {
+        'pyvenv.cfg',  # Standard venv
+        'bin/activate',
+        'bin/python',
+    }
+# Directory names never worth descending into
+DEFAULT_EXCLUDE_DIRS = {'node_modules', 'site-packages', '__pycache__'}
+# Hidden directories that tools create next to a project to hold its envs
+VENV_STORE_NAMES = {'.tox', '.nox', '.pixi', '.hatch'}
+# Files marking a directory as a Python project, whose envs are often nearby
+PROJECT_MARKERS = {
+    'pyproject.toml', 'setup.py', 'setup.cfg', 'requirements.txt', 'Pipfile',
+    'poetry.lock', 'tox.ini', 'noxfile.py', 'environment.yml',
 }
+# Folders of user media, where a best-first walk looks last (lowercase)
+MEDIA_DIR_NAMES = {'music', 'pictures', 'photos', 'videos', 'movies'}
+# Central directories (relative to home) where tools keep all their envs
+KNOWN_VENV_STORES = [
+    '.local/share/virtualenvs',  # pipenv
+    '.virtualenvs',  # virtualenvwrapper, pipenv on Windows
+    '.cache/pypoetry/virtualenvs',  # poetry on Linux
+    'Library/Caches/pypoetry/virtualenvs',  # poetry on macOS
+    '.pyenv/versions',  # pyenv
+    '.pyenv/pyenv-win/versions',  # pyenv-win
+    '.conda/envs',  # conda
+    'miniconda3/envs',
+    'anaconda3/envs',
+    'miniforge3/envs',
+    'mambaforge/envs',
+    'micromamba/envs',
+]
+
+# (st_dev, st_ino) of a directory, identifying it whatever path reaches it
+DirKey = Tuple[int, int]
+# A directory still to visit, with its key if the listing already told it
+_Pending = Tuple[Path, Optional[DirKey]]
+
+# Whether directories can be opened, listed and probed relative to the file
+# descriptor of their parent (openat and friends), for _walk_fd
+FD_WALK_SUPPORTED = (os.scandir in os.supports_fd
+                     and os.open in os.supports_dir_fd
+                     and os.stat in os.supports_dir_fd)
+_DIR_OPEN_FLAGS = (os.O_RDONLY | getattr(os, 'O_DIRECTORY', 0)
+                   | getattr(os, 'O_NOFOLLOW', 0) | getattr(os, 'O_CLOEXEC', 0))
+
+def _exists_in(directory: Union[Path, int], relative: str) -> bool:
+    """Check if a path exists below a directory given by path or open fd."""
+    if isinstance(directory, int):
+        try:
+            os.stat(relative, dir_fd=directory)
+        except (OSError, ValueError):
+            return False
+        return True
+    return os.path.exists(os.path.join(directory, relative))
+
+class EnvDetector(NamedTuple):
+    """How to recognise one type of Python environment from its directory.
+
+    A directory is an environment of the type if its listing has one of
+    ``markers``, paths relative to it like ``pyvenv.cfg`` or
+    ``bin/python`` (nested ones cost one probe, and only when their first
+    component is listed). A detector may also, or instead, require the
+    directory to be named one of ``names``, and to lie somewhere below one
+    of ``within``, directories given by their trailing path components
+    like ``.pixi/envs``. Neither of those costs a system call.
+    """
+
+    env_type: str
+    markers: FrozenSet[str] = frozenset()
+    names: FrozenSet[str] = frozenset()
+    within: Tuple[str, ...] = ()
+
+# Environment types, most specific first: the first detector matching a
+# directory decides its type. Add to it with register_detector().
+ENV_DETECTORS: List[EnvDetector] = [
+    EnvDetector('pixi', frozenset({'conda-meta'}), within=('.pixi/envs',)),
+    EnvDetector('conda', frozenset({'conda-meta'})),
+    EnvDetector('hatch', frozenset(VENV_IDENTIFIERS),
+                within=('.hatch', 'hatch/env/virtual')),
+    EnvDetector('venv', frozenset(VENV_IDENTIFIERS)),
+    # PEP 582 package directories, as created by PDM
+    EnvDetector('pdm', names=frozenset({'__pypackages__'})),
+]
+
+class _DetectorTable(NamedTuple):
+    """The detectors compiled for matching against one directory listing."""
+
+    detectors: Tuple[EnvDetector, ...]
+    # Listing entry -> (rank of detector, marker path, or None if the entry
+    # itself is the marker) for every marker starting with that entry
+    heads: Dict[str, List[Tuple[int, Optional[str]]]]
+    # Directory name -> ranks of the detectors matching it without markers
+    names: Dict[str, List[int]]
+    # Rank -> path fragments one of which the environment must lie below
+    within: Dict[int, Tuple[str, ...]]
+    # Last components of all markers and names, to pick them out of a
+    # file list
+    last_names: FrozenSet[str]
+
+def _compile_detectors(detectors: Sequence[EnvDetector]) -> _DetectorTable:
+    """Build the lookup table of :func:`_detect_env_type` from detectors."""
+    heads: Dict[str, List[Tuple[int, Optional[str]]]] = {}
+    names: Dict[str, List[int]] = {}
+    within: Dict[int, Tuple[str, ...]] = {}
+    last_names = set()
+    for rank, detector in enumerate(detectors):
+        for marker in detector.markers:
+            head, _, rest = marker.partition('/')
+            heads.setdefault(head, []).append((rank, marker if rest else None))
+            last_names.add(marker.rpartition('/')[2])
+        if not detector.markers:
+            for name in detector.names:
+                names.setdefault(name, []).append(rank)
+        last_names.update(detector.names)
+        if detector.within:
+            within[rank] = tuple(
+                os.sep + fragment.replace('/', os.sep) + os.sep
+                for fragment in detector.within)
+    return _DetectorTable(tuple(detectors), heads, names, within,
+                          frozenset(last_names))
+
+_DETECTORS = _compile_detectors(ENV_DETECTORS)
+
+def register_detector(detector: EnvDetector,
+                      before: Optional[str] = None) -> None:
+    """Teach every scan to recognise another type of environment.
+
+    The detector goes after the existing ones, or right before the first
+    detector of type ``before``, which then only sees directories it did
+    not match. The markers of all detectors are matched against the one
+    listing a scan makes of each directory anyway, so a new type costs no
+    system calls, except a probe for a nested marker whose first component
+    is listed.
+
+    Raises:
+        ValueError: If the detector has neither markers nor names, or there
+            is no detector of type ``before``
+    """
+    global _DETECTORS
+    if not detector.markers and not detector.names:
+        raise ValueError(f"detector {detector.env_type!r} matches everything")
+    position = len(ENV_DETECTORS)
+    if before is not None:
+        types = [existing.env_type for existing in ENV_DETECTORS]
+        if before not in types:
+            raise ValueError(f"no detector of type {before!r}")
+        position = types.index(before)
+    ENV_DETECTORS.insert(position, detector)
+    _DETECTORS = _compile_detectors(ENV_DETECTORS)
+
+def _marker_parts() -> Tuple[FrozenSet[str], int]:
+    """Find the entries whose creation can turn a directory into an environment.
+
+    Returns every path component of the markers of the registered
+    detectors, and the number of components of the longest marker.
+    """
+    parts = set()
+    depth = 0
+    for detector in _DETECTORS.detectors:
+        for marker in detector.markers:
+            components = marker.split('/')
+            parts.update(components)
+            depth = max(depth, len(components))
+    return frozenset(parts), depth
+
+def _detect_env_type(directory: Union[Path, int], path: Union[Path, str],
+                     heads: Iterable[str]) -> Optional[str]:
+    """Decide what type of environment a directory is from its listing.
+
+    Args:
+        directory: Directory that was listed, or a file descriptor open on it
+        path: Path of the directory
+        heads: Entries of the listing that start a marker path
+
+    Returns:
+        Type of the first detector that matches, or None if none does
+    """
+    table = _DETECTORS
+    candidates: Dict[int, List[Optional[str]]] = {}
+    for head in heads:
+        for rank, marker in table.heads[head]:
+            candidates.setdefault(rank, []).append(marker)
+    path = os.fspath(path)
+    name = os.path.basename(path)
+    for rank in table.names.get(name, ()):
+        candidates[rank] = []
+    if not candidates:
+        return None
+
+    parent = os.path.dirname(path) + os.sep
+    for rank in sorted(candidates):
+        detector = table.detectors[rank]
+        if detector.names and name not in detector.names:
+            continue
+        fragments = table.within.get(rank)
+        if fragments and not any(fragment in parent
+                                 for fragment in fragments):
+            continue
+        markers = candidates[rank]
+        # A listed top-level marker settles it without probing nested ones
+        if (not markers or None in markers
+                or any(_exists_in(directory, marker) for marker in markers)):
+            return detector.env_type
+    return None
+
+def detect_env_type(path: Path) -> Optional[str]:
+    """Get the type of Python environment a directory is, or None if none.
+
+    Types are those of :data:`ENV_DETECTORS`, like ``"venv"`` or
+    ``"conda"``.
+    """
+    heads = _DETECTORS.heads
+    try:
+        with os.scandir(path) as it:
+            found = [entry.name for entry in it if entry.name in heads]
+    except OSError:
+        # Not a directory, or one we can't access
+        return None
+
+    return _detect_env_type(path, path, found)
 
 def is_virtual_env(path: Path) -> bool:
-    """Check if a directory is a Python virtual environment."""
-    if not path.is_dir():
-        return False
+    """Check if a directory is a Python virtual environment of any type."""
+    return detect_env_type(path) is not None
 
-    # Check for venv identifiers
-    for identifier in VENV_IDENTIFIERS:
-        if (path / identifier).exists():
+def _is_skipped_hidden(name: str) -> bool:
+    """Check if a hidden directory name should be left out of the scan."""
+    # Include hidden directories that start with "." (like .venv or .tox)
+    return (name.startswith('.') and name not in VENV_NAMES
+            and name not in VENV_STORE_NAMES)
+
+def _inode_of(entry: os.DirEntry) -> int:
+    """Get the inode number of a listed entry, or 0 if it can't be had."""
+    try:
+        return entry.inode()
+    except OSError:
+        return 0
+
+def _read_dir(directory: Union[Path, int], inode_order: bool = False,
+              path: Optional[str] = None
+              ) -> Tuple[Optional[str], List[os.DirEntry], bool]:
+    """List a directory once, for both venv detection and traversal.
+
+    ``directory`` may also be a file descriptor open on the directory, with
+    its ``path`` given for the detectors. With ``inode_order``, the
+    subdirectories are sorted by inode number (which the listing reports
+    for free) instead of left in listing order.
+
+    Uses ``os.scandir`` so the entry type comes from the ``d_type`` cached by
+    the directory listing: plain files and symlinks are filtered out without
+    a single ``stat`` call, and the markers of every environment type are
+    matched against the entry names instead of being probed one by one.
+
+    Returns:
+        Tuple of (env_type or None, entries_of_subdirectories, is_project)
+    """
+    marker_heads = _DETECTORS.heads
+    heads = []
+    subdirs = []
+    is_project = False
+    # The listing is finished before returning, so the directory handle is
+    # closed before the caller descends
+    with os.scandir(directory) as it:
+        for entry in it:
+            name = entry.name
+            if name in marker_heads:
+                heads.append(name)
+            elif name in PROJECT_MARKERS:
+                is_project = True
+            try:
+                # Symlinks report False here, so they are never followed
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append(entry)
+            except OSError:
+                pass
+    if inode_order:
+        subdirs.sort(key=_inode_of)
+    env_type = _detect_env_type(directory,
+                                directory if path is None else path, heads)
+    return env_type, subdirs, is_project
+
+def _subdirs_to_scan(directory: Path, names: Iterable[str],
+                     include_hidden: bool) -> List[_Pending]:
+    """Get the paths of the listed subdirectories the scan descends into."""
+    return [(directory / name, None) for name in names
+            if include_hidden or not _is_skipped_hidden(name)]
+
+def _stat_key(directory: Path) -> Optional[DirKey]:
+    """Get the key of a directory with a ``stat`` call, or None if it's gone."""
+    try:
+        st = os.stat(directory)
+    except OSError:
+        return None
+    return st.st_dev, st.st_ino
+
+@dataclass
+class ScanReport:
+    """How much of the tree a scan covered.
+
+    Pass one to :func:`iter_venvs` or :func:`find_venvs` to have it filled
+    in as the scan runs.
+    """
+
+    # Whether every directory within reach was visited
+    complete: bool = False
+    # Whether the time budget ran out before the scan was done
+    timed_out: bool = False
+    # Roots of the subtrees left unexplored when the time budget ran out,
+    # a listing hung or a filesystem was given up on
+    unexplored: List[Path] = field(default_factory=list)
+    # Directories whose listing took longer than the listing timeout
+    hung: List[Path] = field(default_factory=list)
+    # Subtrees skipped because the index learned they hold no venvs
+    skipped: List[Path] = field(default_factory=list)
+    # Seconds the scan took
+    elapsed: float = 0.0
+    # Directories visited
+    dirs_scanned: int = 0
+    # Listings in flight that a parallel scan settled on (1 if sequential)
+    concurrency: int = 0
+    # Mean seconds a directory listing took
+    latency: float = 0.0
+    # Type of each environment found (see ENV_DETECTORS), by its path
+    env_types: Dict[Path, str] = field(default_factory=dict)
+
+# Seconds a parallel scan waits for one directory listing before giving up
+LISTING_TIMEOUT = 30.0
+
+# Hung listings after which the rest of a filesystem is left out of a scan
+MAX_FILESYSTEM_TIMEOUTS = 2
+
+def _call_with_timeout(func: Callable[..., Any], timeout: Optional[float],
+                       *args: Any) -> Any:
+    """Make filesystem calls, giving up on them after ``timeout`` seconds.
+
+    The calls run on a daemon thread, which is left behind if they hang
+    (like a ``stat`` on a stale network mount): it cannot be interrupted.
+
+    Raises:
+        TimeoutError: If ``func`` did not return in time
+    """
+    if timeout is None:
+        return func(*args)
+    outcome: List[Tuple[bool, Any]] = []
+
+    def call():
+        try:
+            outcome.append((True, func(*args)))
+        except BaseException as e:
+            outcome.append((False, e))
+
+    thread = threading.Thread(target=call, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    if not outcome:
+        raise TimeoutError(f"no answer within {timeout:g}s")
+    returned, value = outcome[0]
+    if not returned:
+        raise value
+    return value
+
+class _ScanContext:
+    """Settings and shared state of a single scan."""
+
+    def __init__(self, exclude_dirs: Set[str],
+                 index: Optional[ScanIndex] = None,
+                 matcher: Optional[PathMatcher] = None,
+                 mounts: Optional[MountTable] = None,
+                 start_dev: Optional[Union[int, Set[int]]] = None,
+                 visited: Optional[Set[DirKey]] = None,
+                 deadline: Optional[float] = None,
+                 report: Optional[ScanReport] = None):
+        self.exclude_dirs = exclude_dirs
+        self.index = index
+        self.matcher = matcher if matcher else None
+        self.mounts = mounts
+        # Devices the scan must stay on (those of its roots), if it must
+        self.start_devs: Optional[Set[int]] = (
+            {start_dev} if isinstance(start_dev, int) else start_dev)
+        # Keys of the directories visited so far; None disables the check.
+        # Scans of several roots can share one set.
+        self.visited = visited
+        self._visited_lock = threading.Lock()
+        # time.monotonic() value after which no directory is visited
+        self.deadline = deadline
+        self.report = report if report is not None else ScanReport()
+        # Checkpoint kept up to date with every directory visited
+        self.checkpoint: Optional[ScanCheckpoint] = None
+        # Whether the walk expands the most promising directories first
+        self.best_first = False
+        # Whether subdirectories are visited in inode order
+        self.inode_order = False
+        # Venvs found by earlier scans and the directories leading to them
+        self.venv_ancestors: Set[str] = set()
+        # Directories seen to hold project files, recorded for best_first
+        self._project_dirs: Set[str] = set()
+        # Media folders and everything below them, ranked last by best_first
+        self._media_dirs: Set[str] = set()
+        # Counts visits; next() is atomic, so workers need no lock for it
+        self.visit_counter = itertools.count()
+        # Hung listings per filesystem, and the filesystems given up on
+        self._timeouts: Dict[object, int] = {}
+        self.failed_filesystems: Set[object] = set()
+        self._timeouts_lock = threading.Lock()
+        # Shard of the scan, if it is one, and the directories it started from
+        self.shard: Optional[Shard] = None
+        self.shard_roots: Set[str] = set()
+
+    def in_shard(self, name: str) -> bool:
+        """Check if a first-level directory is part of this scan's shard."""
+        return (self.shard is None
+                or shard_of(name, self.shard[1]) == self.shard[0])
+
+    def _split_shard(self, directory: Union[Path, str],
+                     env_type: Optional[str], subdirs: list
+                     ) -> Tuple[Optional[str], list]:
+        """Keep only this shard's part of what a directory visit found.
+
+        Only the first level is split: below each directory the scan started
+        from, each shard keeps the subdirectories it hashes to, and only
+        the first shard reports the directory itself as a venv.
+        """
+        if self.shard is None or str(directory) not in self.shard_roots:
+            return env_type, subdirs
+        return (env_type if self.shard[0] == 1 else None,
+                [subdir for subdir in subdirs
+                 if self.in_shard(os.path.basename(subdir[0]))])
+
+    def _on_scanned_filesystem(self, directory: Union[Path, str],
+                               dir_fd: Optional[int] = None,
+                               dir_key: Optional[DirKey] = None) -> bool:
+        """Check that a directory is not a pseudo filesystem or another device."""
+        key = str(directory)
+        if self.mounts is not None and self.mounts.is_skipped(key):
+            return False
+        if self.start_devs is None:
             return True
-    
-    return False
+        if dir_key is not None:
+            return dir_key[0] in self.start_devs
+        if (self.mounts is not None and self.mounts.available
+                and not self.mounts.is_device_boundary(key)):
+            # Only a mount point or subvolume can be on a different device
+            return True
+        try:
+            if dir_fd is not None:
+                return (os.stat(os.path.basename(key), dir_fd=dir_fd).st_dev
+                        in self.start_devs)
+            return os.stat(directory).st_dev in self.start_devs
+        except OSError:
+            return False
+
+    def _filesystem_of(self, directory: Union[Path, str],
+                       key: Optional[DirKey]) -> Optional[object]:
+        """Identify the filesystem of a directory without touching it.
+
+        That is its mount point if there is a mount table, otherwise the
+        device from its key if the key is known (a ``stat`` could hang).
+        """
+        if self.mounts is not None and self.mounts.available:
+            return self.mounts.mount_of(str(directory))
+        return key[0] if key is not None else None
+
+    def abandon(self, directory: Path, key: Optional[DirKey]) -> None:
+        """Give up on a directory whose listing hung.
+
+        The directory is reported as hung and unexplored. Once
+        ``MAX_FILESYSTEM_TIMEOUTS`` listings on one filesystem hung, the
+        filesystem is presumed dead (like a stale NFS mount) and the rest
+        of it is skipped.
+        """
+        filesystem = self._filesystem_of(directory, key)
+        with self._timeouts_lock:
+            if directory in self.report.hung:
+                # Given up on by the probe of the known stores already
+                return
+            self.report.hung.append(directory)
+            self.report.unexplored.append(directory)
+            if filesystem is not None:
+                count = self._timeouts.get(filesystem, 0) + 1
+                self._timeouts[filesystem] = count
+                if count >= MAX_FILESYSTEM_TIMEOUTS:
+                    self.failed_filesystems.add(filesystem)
+
+    def is_scanned(self, directory: Union[Path, str],
+                   dir_fd: Optional[int] = None,
+                   key: Optional[DirKey] = None) -> bool:
+        """Check that a directory is not excluded from the scan.
+
+        ``directory`` may be a path string. With ``dir_fd`` (the parent's
+        open file descriptor), the ``stat`` that ``one_file_system`` may
+        need is made relative to it, and with its ``key`` it needs none.
+        """
+        name = os.path.basename(directory)
+        if name in self.exclude_dirs:
+            # Every scan leaves out the default ones
+            if name not in DEFAULT_EXCLUDE_DIRS:
+                self._cut_short(directory)
+            return False
+        if self.matcher is not None and self.matcher.excludes(Path(directory)):
+            self._cut_short(directory)
+            return False
+        if not self._on_scanned_filesystem(directory, dir_fd, key):
+            self._cut_short(directory)
+            return False
+        return True
+
+    def _cut_short(self, directory: Union[Path, str]) -> None:
+        """Tell the index that the parent of an excluded directory was cut short."""
+        if self.index is not None:
+            self.index.cut_short(os.path.dirname(str(directory)))
+
+    def _claim(self, key: DirKey) -> bool:
+        """Mark a directory as visited, or return False if it already was."""
+        with self._visited_lock:
+            if key in self.visited:
+                return False
+            self.visited.add(key)
+            return True
+
+    def priority(self, directory: Path) -> int:
+        """Score how likely a directory is to be or to lead to a venv.
+
+        A directory earlier scans found a venv in or below scores highest,
+        then one named like a venv (``.venv``, ``.tox``), then one next to
+        project files like ``pyproject.toml``; anything inside a media
+        folder (``Music``, ``Pictures``) scores below the rest. Checks only
+        the names and what the scan already saw, never the filesystem, and
+        must be called for a directory before its subdirectories.
+        """
+        score = 0
+        path = str(directory)
+        if path in self.venv_ancestors:
+            score += 8
+        name = directory.name
+        if name in VENV_NAMES or name in VENV_STORE_NAMES:
+            score += 4
+        parent = os.path.dirname(path)
+        if parent in self._project_dirs:
+            score += 2
+        if parent in self._media_dirs or name.lower() in MEDIA_DIR_NAMES:
+            self._media_dirs.add(path)
+            score -= 4
+        return score
+
+    def _keyed_subdirs(self, directory: Union[Path, str],
+                       entries: List[os.DirEntry], include_hidden: bool,
+                       key: Optional[DirKey]) -> List[_Pending]:
+        """Get the subdirectories to scan, with keys taken from the listing.
+
+        A subdirectory is on the same device as its parent unless something
+        is mounted on it or it is a btrfs subvolume, and its inode number is
+        part of the listing, so only those need a ``stat`` to learn their
+        key. (The listing even reports the inode of the directory *under* a
+        mount point.) Without a mount table there's no telling where those
+        are, and every subdirectory is left to ``stat`` itself.
+
+        Subdirectories of a path string are path strings too.
+        """
+        inherit = (key is not None and self.mounts is not None
+                   and self.mounts.available)
+        subdirs = []
+        for entry in entries:
+            if not include_hidden and _is_skipped_hidden(entry.name):
+                continue
+            if isinstance(directory, str):
+                path = os.path.join(directory, entry.name)
+            else:
+                path = directory / entry.name
+            if inherit and not self.mounts.is_device_boundary(str(path),
+                                                              entry.inode()):
+                subdirs.append((path, (key[0], entry.inode())))
+            else:
+                subdirs.append((path, None))
+        return subdirs
+
+    def visit(self, directory: Path, max_depth: int,
+              include_hidden: bool = False,
+              key: Optional[DirKey] = None) -> Tuple[bool, List[_Pending]]:
+        """Visit a single directory of the scan.
+
+        When the context tracks visited directories, a directory reached
+        again (through a bind mount or an overlapping root) is neither
+        reported nor walked a second time.
+
+        Args:
+            directory: Directory to visit
+            max_depth: Remaining depth below it
+            include_hidden: Whether to descend into hidden subdirectories
+            key: Key of the directory, if known from its parent's listing
+
+        Returns:
+            Tuple of (is_venv, subdirectories_still_to_scan)
+        """
+        if not self._may_visit(directory, key):
+            return False, []
+
+        next(self.visit_counter)
+        env_type, subdirs = self._visit(directory, max_depth, include_hidden,
+                                        key)
+        env_type, subdirs = self._split_shard(directory, env_type, subdirs)
+        is_venv = env_type is not None
+        if is_venv:
+            self.report.env_types[directory] = env_type
+        if self.checkpoint is not None:
+            self.checkpoint.advance(directory, is_venv,
+                                    (subdir for subdir, _ in subdirs),
+                                    max_depth - 1)
+        return is_venv, subdirs
+
+    def _may_visit(self, directory: Union[Path, str],
+                   key: Optional[DirKey]) -> bool:
+        """Check that the scan has time for a directory and can reach it.
+
+        If not, the directory is reported unexplored.
+        """
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            # Out of time: note what is left instead of visiting it
+            self.report.timed_out = True
+            self.report.unexplored.append(Path(directory))
+            return False
+        if (self.failed_filesystems and self._filesystem_of(directory, key)
+                in self.failed_filesystems):
+            self.report.unexplored.append(Path(directory))
+            return False
+        return True
+
+    def visit_at(self, dir_fd: Optional[int], path: str, max_depth: int,
+                 include_hidden: bool = False, key: Optional[DirKey] = None
+                 ) -> Tuple[bool, List[Tuple[str, Optional[DirKey]]],
+                            Optional[int]]:
+        """Visit a directory by its name relative to its parent's open fd.
+
+        Does what :meth:`visit` does (except for consulting the index), but
+        opens the directory with ``openat`` and lists and probes it through
+        the resulting file descriptor, so no call resolves more than one
+        path component. Paths stay plain strings.
+
+        Args:
+            dir_fd: File descriptor of the parent, or None for a root
+            path: Path of the directory
+            max_depth: Remaining depth below it
+            include_hidden: Whether to descend into hidden subdirectories
+            key: Key of the directory, if known from its parent's listing
+
+        Returns:
+            Tuple of (is_venv, subdirectories_still_to_scan, fd), where fd
+            is open on the directory if there are subdirectories to visit
+            (the caller closes it) and None otherwise
+        """
+        if not self._may_visit(path, key):
+            return False, [], None
+        next(self.visit_counter)
+        env_type, subdirs, fd = self._visit_at(dir_fd, path, max_depth,
+                                               include_hidden, key)
+        is_venv = env_type is not None
+        if is_venv:
+            self.report.env_types[Path(path)] = env_type
+        if self.checkpoint is not None:
+            # Also for directories left out, so a resumed scan doesn't
+            # try them again
+            self.checkpoint.advance(Path(path), is_venv,
+                                    (Path(subdir) for subdir, _ in subdirs),
+                                    max_depth - 1)
+        return is_venv, subdirs, fd
+
+    def _visit_at(self, dir_fd: Optional[int], path: str, max_depth: int,
+                  include_hidden: bool, key: Optional[DirKey]
+                  ) -> Tuple[Optional[str], List[Tuple[str, Optional[DirKey]]],
+                             Optional[int]]:
+        """Visit a directory for :meth:`visit_at`, returning its env type."""
+        if not self.is_scanned(path, dir_fd, key):
+            return None, [], None
+
+        try:
+            fd = os.open(path if dir_fd is None else os.path.basename(path),
+                         _DIR_OPEN_FLAGS, dir_fd=dir_fd)
+        except OSError:
+            return None, [], None
+        env_type = None
+        subdirs: List[Tuple[str, Optional[DirKey]]] = []
+        try:
+            if self.visited is not None:
+                if key is None:
+                    st = os.fstat(fd)
+                    key = st.st_dev, st.st_ino
+                if not self._claim(key):
+                    return None, [], None
+            env_type, entries, is_project = _read_dir(fd, self.inode_order,
+                                                      path)
+            if is_project and self.best_first:
+                self._project_dirs.add(path)
+            if env_type is None and max_depth > 0:
+                subdirs = self._keyed_subdirs(path, entries, include_hidden,
+                                              key)
+            env_type, subdirs = self._split_shard(path, env_type, subdirs)
+        except OSError:
+            # Skip directories we can't access
+            pass
+        finally:
+            if not subdirs:
+                os.close(fd)
+        return env_type, subdirs, fd if subdirs else None
+
+    def _visit(self, directory: Path, max_depth: int, include_hidden: bool,
+               key: Optional[DirKey]
+               ) -> Tuple[Optional[str], List[_Pending]]:
+        """Visit a directory for :meth:`visit`, returning its env type."""
+        if not self.is_scanned(directory, key=key):
+            return None, []
+
+        if self.index is not None:
+            return self._visit_indexed(directory, max_depth, include_hidden)
+
+        if self.visited is not None:
+            if key is None:
+                key = _stat_key(directory)
+            if key is None or not self._claim(key):
+                return None, []
+
+        try:
+            env_type, entries, is_project = _read_dir(directory,
+                                                      self.inode_order)
+        except (PermissionError, OSError):
+            # Skip directories we can't access
+            return None, []
+        if is_project and self.best_first:
+            self._project_dirs.add(str(directory))
+
+        if env_type is not None:
+            return env_type, []  # Don't recurse into venvs
+
+        # Depth limit reached
+        if max_depth <= 0:
+            return None, []
+
+        return None, self._keyed_subdirs(directory, entries, include_hidden,
+                                         key)
+
+    def _visit_indexed(self, directory: Path, max_depth: int,
+                       include_hidden: bool
+                       ) -> Tuple[Optional[str], List[_Pending]]:
+        """Visit a directory, reusing its index record if its mtime is unchanged.
+
+        An unchanged directory costs a single ``stat`` instead of a listing,
+        and that ``stat`` also gives the key of the directory.
+        """
+        key = str(directory)
+        if self.index.skips(key):
+            self.report.skipped.append(directory)
+            return None, []
+        try:
+            st = os.stat(directory)
+        except OSError:
+            return None, []
+        if (self.visited is not None
+                and not self._claim((st.st_dev, st.st_ino))):
+            return None, []
+        mtime_ns = st.st_mtime_ns
+
+        record = self.index.lookup(key, mtime_ns)
+        if record is None or (not record.is_venv and record.children is None):
+            try:
+                # In inode order, rescans stat the children in that order too
+                env_type, entries, is_project = _read_dir(directory,
+                                                          self.inode_order)
+            except (PermissionError, OSError):
+                return None, []
+            is_venv = env_type is not None
+            names = tuple(entry.name for entry in entries)
+            record = DirRecord(mtime_ns, is_venv, None if is_venv else names,
+                               is_project, env_type)
+            self.index.record(key, record)
+        if record.is_project and self.best_first:
+            self._project_dirs.add(key)
+
+        if record.is_venv:
+            return record.env_type, []  # Don't recurse into venvs
+        subdirs = _subdirs_to_scan(directory, record.children, include_hidden)
+        if max_depth <= 0:
+            if subdirs:
+                self.index.cut_short(key)
+            return None, []
+        return None, subdirs
+
+def _build_context(start_path: Union[Path, Sequence[Path]],
+                   exclude_dirs: Optional[List[str]] = None,
+                   index: Optional[ScanIndex] = None,
+                   exclude_patterns: Optional[List[str]] = None,
+                   one_file_system: bool = False,
+                   visited: Optional[Set[DirKey]] = None) -> _ScanContext:
+    """Set up the context for a scan starting at ``start_path``.
+
+    ``start_path`` may also be several roots, none inside another, to
+    scan in one go: relative patterns are anchored at each of them and
+    ``one_file_system`` keeps to the filesystems of all of them. Pass the
+    same ``visited`` set to the contexts of separate scans to walk each
+    physical directory only once across all of them.
+    """
+    roots = [start_path] if isinstance(start_path, Path) else list(start_path)
+    exclude_set = set(exclude_dirs or [])
+    exclude_set.update(DEFAULT_EXCLUDE_DIRS)
+    matcher = PathMatcher(exclude_patterns or [], roots)
+
+    # Read the mount table once per scan
+    mounts = MountTable()
+    start_devs = None
+    if one_file_system:
+        start_devs = set()
+        for root in roots:
+            try:
+                start_devs.add(os.stat(root).st_dev)
+            except OSError:
+                pass
+    if visited is None:
+        visited = set()
+    return _ScanContext(exclude_set, index, matcher, mounts, start_devs,
+                        visited)
+
+def _walk(context: _ScanContext, directory: Path, max_depth: int,
+          include_hidden: bool = False, key: Optional[DirKey] = None,
+          breadth_first: bool = False) -> Iterator[Path]:
+    """Yield the venvs at or below a directory.
+
+    The directories still to visit are kept in a deque rather than on the
+    call stack, so each venv is yielded straight to the caller instead of
+    through one generator per level, and no depth gets near the recursion
+    limit. Depth-first (the default) visits directories in the order a
+    recursive walk would; breadth-first finishes each level before the
+    next, so shallow venvs come first.
+    """
+    pending = deque([(directory, key, max_depth, include_hidden)])
+    take = pending.popleft if breadth_first else pending.pop
+    while pending:
+        directory, key, depth, include_hidden = take()
+        is_venv, subdirs = context.visit(directory, depth, include_hidden,
+                                         key)
+        if is_venv:
+            yield directory
+        children = [(subdir, subdir_key, depth - 1, False)
+                    for subdir, subdir_key in subdirs]
+        if not breadth_first:
+            # The first subdirectory goes on top of the stack
+            children.reverse()
+        pending.extend(children)
+
+def _walk_fd(context: _ScanContext, path: str, max_depth: int,
+             include_hidden: bool = False,
+             key: Optional[DirKey] = None) -> Iterator[Path]:
+    """Yield the venvs at or below a directory, depth-first like :func:`_walk`.
+
+    Each directory is visited through :meth:`_ScanContext.visit_at`, which
+    opens it relative to the file descriptor of its parent. The kernel
+    never resolves a long path again, and only the venvs reported become
+    ``Path`` objects. The stack holds the descriptor of each directory on
+    the way down along with its subdirectories left to visit, so there are
+    at most ``max_depth`` descriptors open.
+    """
+    stack: List[Tuple[int, Iterator[Tuple[str, Optional[DirKey]]], int]] = []
+    is_venv, subdirs, fd = context.visit_at(None, path, max_depth,
+                                            include_hidden, key)
+    if is_venv:
+        yield Path(path)
+    if fd is not None:
+        stack.append((fd, iter(subdirs), max_depth - 1))
+    try:
+        while stack:
+            dir_fd, remaining, depth = stack[-1]
+            subdir = next(remaining, None)
+            if subdir is None:
+                stack.pop()
+                os.close(dir_fd)
+                continue
+            path, key = subdir
+            is_venv, subdirs, fd = context.visit_at(dir_fd, path, depth,
+                                                    key=key)
+            if is_venv:
+                yield Path(path)
+            if fd is not None:
+                stack.append((fd, iter(subdirs), depth - 1))
+    finally:
+        for dir_fd, _, _ in stack:
+            os.close(dir_fd)
+
+def _rank(context: _ScanContext, item: Tuple[Path, Optional[DirKey], int, bool]
+          ) -> Tuple[int, int]:
+    """Sort key of a directory to visit, best first.
+
+    Directories are ranked by :meth:`_ScanContext.priority`; among equals
+    the shallower one (with more depth remaining) comes first.
+    """
+    return -context.priority(item[0]), -item[2]
+
+class _BestFirstQueue(queue.Queue):
+    """Work queue that hands out the most promising directory first.
+
+    Items are ``(directory, key, depth, include_hidden)`` tuples ordered by
+    :func:`_rank`, and by the order they were queued among equals. ``None``
+    (the stop signal for workers) ranks after everything else.
+    """
+
+    def __init__(self, context: _ScanContext):
+        self.context = context
+        super().__init__()
+
+    def _init(self, maxsize):
+        self.heap = []
+        self.counter = itertools.count()
+
+    def _qsize(self):
+        return len(self.heap)
+
+    def _put(self, item):
+        rank = (float('inf'), 0) if item is None else _rank(self.context, item)
+        heapq.heappush(self.heap, (rank, next(self.counter), item))
+
+    def _get(self):
+        return heapq.heappop(self.heap)[-1]
+
+def _walk_best_first(context: _ScanContext,
+                     roots: Iterable[PendingDir]) -> Iterator[Path]:
+    """Yield the venvs below ``roots``, expanding best-scoring dirs first."""
+    heap = []
+    counter = itertools.count()
+
+    def push(item):
+        heapq.heappush(heap, (_rank(context, item), next(counter), item))
+
+    for root in roots:
+        push((root.path, None, root.depth, root.include_hidden))
+    while heap:
+        directory, key, depth, include_hidden = heapq.heappop(heap)[-1]
+        is_venv, subdirs = context.visit(directory, depth, include_hidden, key)
+        if is_venv:
+            yield directory
+        for subdir, subdir_key in subdirs:
+            push((subdir, subdir_key, depth - 1, False))
 
 def find_venvs_in_dir(directory: Path, max_depth: int = 5, 
-                     exclude_dirs: Optional[Set[str]] = None) -> Iterator[Path]:
-    """Find all virtual environments in a directory with depth limit."""
-    if exclude_dirs is None:
-        exclude_dirs = set()
+                     exclude_dirs: Optional[Set[str]] = None,
+                     index: Optional[ScanIndex] = None,
+                     exclude_patterns: Optional[List[str]] = None,
+                     breadth_first: bool = False) -> Iterator[Path]:
+    """Find all virtual environments in a directory with depth limit.
+
+    ``exclude_patterns`` are gitignore-style patterns (see
+    :class:`venvkiller.patterns.PathMatcher`) anchored at ``directory``.
+    With ``breadth_first``, each level is searched before the next one.
+    """
+    matcher = PathMatcher(exclude_patterns or [], directory)
+    context = _ScanContext(exclude_dirs or set(), index, matcher)
+    yield from _walk(context, directory, max_depth,
+                     breadth_first=breadth_first)
+
+def known_venv_stores(home: Optional[Path] = None,
+                      within: Optional[Path] = None,
+                      timeout: Optional[float] = None) -> List[Path]:
+    """Get the central venv directories of common tools that exist.
+
+    Covers :data:`KNOWN_VENV_STORES` plus the locations tools take from
+    the environment (``WORKON_HOME``, ``POETRY_VIRTUALENVS_PATH``,
+    ``PYENV_ROOT``, ``CONDA_ENVS_PATH``) and pyenv-virtualenv's
+    ``versions/*/envs`` directories.
+
+    Args:
+        home: Home directory the default locations are relative to
+        within: Resolved directory to limit the stores to; locations
+            outside it are dropped before touching the filesystem
+        timeout: Seconds to wait for each location to be checked; ones
+            that don't answer in time (a stale mount) are left out
+
+    Returns:
+        Resolved paths of the store directories, without duplicates
+    """
+    if home is None:
+        home = Path(os.path.expanduser("~"))
+    env = os.environ
+
+    candidates = [home / store for store in KNOWN_VENV_STORES]
+    for var in ('WORKON_HOME', 'POETRY_VIRTUALENVS_PATH'):
+        if env.get(var):
+            candidates.append(Path(os.path.expanduser(env[var])))
+    if env.get('LOCALAPPDATA'):
+        candidates.append(Path(env['LOCALAPPDATA']) / 'pypoetry' / 'Cache'
+                          / 'virtualenvs')
+    pyenv_roots = [home / '.pyenv']
+    if env.get('PYENV_ROOT'):
+        pyenv_roots.append(Path(os.path.expanduser(env['PYENV_ROOT'])))
+        candidates.append(pyenv_roots[-1] / 'versions')
+    for path in env.get('CONDA_ENVS_PATH', '').split(os.pathsep):
+        if path:
+            candidates.append(Path(os.path.expanduser(path)))
+
+    def wanted(path: Path) -> bool:
+        return within is None or path == within or within in path.parents
+
+    def pyenv_envs(root: Path) -> List[Path]:
+        versions = root.resolve() / 'versions'
+        if wanted(versions) and versions.is_dir():
+            return list(versions.glob('*/envs'))
+        return []
+
+    def existing_store(candidate: Path) -> Optional[Path]:
+        store = candidate.resolve()
+        return store if wanted(store) and store.is_dir() else None
+
+    for root in pyenv_roots:
+        try:
+            candidates.extend(_call_with_timeout(pyenv_envs, timeout, root))
+        except TimeoutError:
+            continue
+
+    stores = []
+    for candidate in candidates:
+        try:
+            store = _call_with_timeout(existing_store, timeout, candidate)
+        except TimeoutError:
+            continue
+        if store is not None and store not in stores:
+            stores.append(store)
+    return stores
+
+def _probe_known_stores(context: _ScanContext, start_path: Path,
+                        timeout: Optional[float] = None) -> Iterator[Path]:
+    """Yield the venvs kept in the known stores below ``start_path``.
+
+    Costs one listing per store plus one per entry (two for a venv), no
+    matter how deep the stores are. The venvs found are marked as visited
+    in ``context`` so the walk that follows doesn't report them again.
+
+    A store that takes longer than ``timeout`` seconds to list, or an
+    entry of it to probe, is given up on like a hung listing of the walk
+    (see :meth:`_ScanContext.abandon`).
+    """
+    def list_store(store: Path, ancestors: List[Path]) -> List[str]:
+        # The walk would only reach the store if all of its parents are
+        # scanned too
+        if not all(context.is_scanned(path) for path in ancestors):
+            return []
+        with os.scandir(store) as it:
+            return [entry.name for entry in it
+                    if entry.is_dir(follow_symlinks=False)]
+
+    def probe(path: Path) -> bool:
+        return is_virtual_env(path) and context.visit(path, 0)[0]
+
+    for store in known_venv_stores(within=start_path, timeout=timeout):
+        parts = store.relative_to(start_path).parts
+        if parts and not context.in_shard(parts[0]):
+            continue
+        ancestors = [start_path.joinpath(*parts[:i])
+                     for i in range(1, len(parts) + 1)]
+        try:
+            names = _call_with_timeout(list_store, timeout, store, ancestors)
+        except TimeoutError:
+            context.abandon(store, None)
+            continue
+        except OSError:
+            continue
+        for name in names:
+            if _is_skipped_hidden(name):
+                continue
+            path = store / name
+            try:
+                is_venv = _call_with_timeout(probe, timeout, path)
+            except TimeoutError:
+                # The rest of the store is likely just as stuck
+                context.abandon(path, None)
+                break
+            if is_venv:
+                yield path
+
+# Most listings an adaptive parallel scan keeps in flight
+ADAPTIVE_MAX_WORKERS = 128
+
+class _ConcurrencyLimit:
+    """Limit on the directory listings in flight, tuned AIMD-style.
+
+    Listings are timed in windows of ``window`` seconds. When the mean
+    latency of a window climbs above ``LATENCY_TOLERANCE`` times the
+    lowest one seen, listings are queueing behind each other (on the
+    disk, the server or the GIL) and the limit is halved. Otherwise, if
+    listings had to wait for a slot, the limit grows by one. Local disks
+    settle at a few listings in flight while high-latency network
+    filesystems, where each listing mostly waits, grow to many.
+
+    The lowest latency drifts up a little every window, so one lucky
+    window of cached directories doesn't pin the limit down forever.
+    """
+
+    LATENCY_TOLERANCE = 2.0
+    BASELINE_DRIFT = 1.05
+    MIN_SAMPLES = 8
+
+    def __init__(self, initial: int, maximum: int, adaptive: bool = True,
+                 window: float = 0.1,
+                 clock: Callable[[], float] = time.perf_counter):
+        self.limit = initial
+        self.maximum = maximum
+        self.adaptive = adaptive
+        self.window = window
+        self.clock = clock
+        self.baseline: Optional[float] = None
+        self.count = 0
+        self.total_latency = 0.0
+        self._active = 0
+        self._waited = False
+        self._window_start = self.clock()
+        self._window_count = 0
+        self._window_latency = 0.0
+        self._cond = threading.Condition()
+
+    def acquire(self) -> None:
+        """Wait for a free slot and take it."""
+        with self._cond:
+            while self._active >= self.limit:
+                self._waited = True
+                self._cond.wait()
+            self._active += 1
+
+    def release(self, latency: float) -> None:
+        """Give a slot back after a listing that took ``latency`` seconds."""
+        with self._cond:
+            self._active -= 1
+            self.count += 1
+            self.total_latency += latency
+            self._window_count += 1
+            self._window_latency += latency
+            if self.adaptive:
+                now = self.clock()
+                if (now - self._window_start >= self.window
+                        and self._window_count >= self.MIN_SAMPLES):
+                    self._adjust(self._window_latency / self._window_count)
+                    self._window_start = now
+                    self._window_count = 0
+                    self._window_latency = 0.0
+                    self._waited = False
+            free = self.limit - self._active
+            if free > 0:
+                self._cond.notify(free)
+
+    def _adjust(self, latency: float) -> None:
+        if self.baseline is None:
+            self.baseline = latency
+        else:
+            self.baseline = min(latency, self.baseline * self.BASELINE_DRIFT)
+        if latency > self.baseline * self.LATENCY_TOLERANCE:
+            self.limit = max(1, self.limit // 2)
+        elif self._waited:
+            self.limit = min(self.maximum, self.limit + 1)
+
+def _find_venvs_parallel(roots: Iterable[PendingDir],
+                         context: _ScanContext,
+                         on_found: Callable[[Path], None],
+                         stop: threading.Event,
+                         max_workers: Optional[int] = None,
+                         listing_timeout: Optional[float] = None) -> None:
+    """Scan trees with worker threads that share one queue of directories.
+
+    The queue starts out with ``roots`` and is a priority queue if
+    ``context.best_first`` is set. Every subdirectory a worker
+    discovers goes back into the shared queue instead of being walked by
+    the worker that found it, so idle workers always pick up pending
+    directories from whichever subtree still has them, no matter how
+    unevenly the tree is shaped.
+
+    ``on_found`` is called from the worker threads as soon as a venv is
+    found. Setting ``stop`` makes the workers drain the queue without
+    visiting anything else.
+
+    Without ``max_workers`` the number of listings in flight adapts to the
+    latency observed (see :class:`_ConcurrencyLimit`), starting from the
+    ``ThreadPoolExecutor`` default; worker threads are started as the
+    limit grows. One worker more than the limit is kept, so while
+    directories are queued up it waits for a slot and the limit can tell
+    that more listings would help. The chosen concurrency and the mean listing latency are
+    stored in ``context.report``.
+
+    A visit still running after ``listing_timeout`` seconds (a listing
+    of a stale network mount can block forever) is abandoned: the scan
+    carries on without it on a fresh thread, the stuck one is left to
+    finish on its own, and ``context.abandon`` records the directory.
+    """
+    if max_workers is None:
+        limit = _ConcurrencyLimit(min(32, (os.cpu_count() or 1) + 4),
+                                  ADAPTIVE_MAX_WORKERS)
+    else:
+        limit = _ConcurrencyLimit(max_workers, max_workers, adaptive=False)
+
+    work: "queue.Queue[Optional[Tuple[Path, Optional[DirKey], int, bool]]]" \
+        = _BestFirstQueue(context) if context.best_first else queue.Queue()
+    for root in roots:
+        work.put((root.path, None, root.depth, root.include_hidden))
+
+    # Visits in progress: worker thread -> (start time, directory, key)
+    in_flight: Dict[threading.Thread, Tuple[float, Path, Optional[DirKey]]] = {}
+    flight_lock = threading.Lock()
+
+    def worker():
+        me = threading.current_thread()
+        while True:
+            item = work.get()
+            if item is None:
+                return
+            abandoned = False
+            try:
+                if stop.is_set():
+                    continue
+                directory, key, depth, include_hidden = item
+                limit.acquire()
+                started = time.perf_counter()
+                with flight_lock:
+                    in_flight[me] = (started, directory, key)
+                try:
+                    is_venv, subdirs = context.visit(directory, depth,
+                                                     include_hidden, key)
+                finally:
+                    with flight_lock:
+                        abandoned = in_flight.pop(me, None) is None
+                    if not abandoned:
+                        limit.release(time.perf_counter() - started)
+                if abandoned:
+                    # The scan gave up on this visit and moved on without
+                    # this thread
+                    return
+                if is_venv:
+                    on_found(directory)
+                for subdir, subdir_key in subdirs:
+                    work.put((subdir, subdir_key, depth - 1, False))
+                if len(threads) < limit.limit + spare:
+                    spawn_workers()
+            except Exception:
+                # Never let one directory kill a worker and stall the queue
+                pass
+            finally:
+                if not abandoned:
+                    work.task_done()
+
+    threads: List[threading.Thread] = []
+    threads_lock = threading.Lock()
+    spare = 1 if limit.adaptive else 0
+
+    def spawn_workers():
+        with threads_lock:
+            while len(threads) < limit.limit + spare:
+                thread = threading.Thread(target=worker, daemon=True)
+                thread.start()
+                threads.append(thread)
+
+    def abandon_stalled():
+        now = time.perf_counter()
+        with flight_lock:
+            stalled = [(thread, visit) for thread, visit in in_flight.items()
+                       if now - visit[0] >= listing_timeout]
+            for thread, _ in stalled:
+                del in_flight[thread]
+        for thread, (started, directory, key) in stalled:
+            context.abandon(directory, key)
+            limit.release(now - started)
+            with threads_lock:
+                threads.remove(thread)
+        if stalled:
+            spawn_workers()
+            for _ in stalled:
+                work.task_done()
+
+    spawn_workers()
+
+    # Wait until every queued directory (including ones queued by workers)
+    # has been visited, then tell the workers to stop
+    if listing_timeout is None:
+        work.join()
+    else:
+        poll = min(1.0, listing_timeout / 4)
+        while True:
+            with work.all_tasks_done:
+                if work.unfinished_tasks:
+                    work.all_tasks_done.wait(poll)
+                if not work.unfinished_tasks:
+                    break
+            abandon_stalled()
+    for _ in threads:
+        work.put(None)
+    for thread in threads:
+        thread.join()
+
+    context.report.concurrency = limit.limit
+    if limit.count:
+        context.report.latency = limit.total_latency / limit.count
+
+def _iter_listed_venvs(context: _ScanContext, start_path: Path,
+                       path_list: str) -> Iterator[Path]:
+    """Yield the venvs below ``start_path`` that a prebuilt file list names.
+
+    The list (see :func:`read_path_list`) is searched for the markers of
+    the detectors, like ``pyvenv.cfg``, ``bin/activate`` and
+    ``conda-meta``, and for directories they match by name, like
+    ``__pypackages__``. Each directory found is checked against the scan's
+    exclusions and then validated with :func:`detect_env_type`, since the
+    list may be hours old. Nothing else is read from disk. Unlike a walk,
+    this ignores the depth limit and hidden directories, and it finds
+    venvs nested in other venvs.
+
+    When the time budget runs out, ``start_path`` is reported unexplored.
+    """
+    table = _DETECTORS
+    markers = {marker for detector in table.detectors
+               for marker in detector.markers}
+    candidates: Set[str] = set()
+    for path in read_path_list(path_list, table.last_names, str(start_path)):
+        if (context.deadline is not None
+                and time.monotonic() >= context.deadline):
+            context.report.timed_out = True
+            context.report.unexplored.append(start_path)
+            return
+        if os.path.basename(path) in table.names:
+            candidate = path
+        else:
+            for marker in markers:
+                if path.endswith('/' + marker):
+                    candidate = path[:-len(marker) - 1]
+                    break
+            else:
+                continue
+        if candidate in candidates:
+            continue
+        candidates.add(candidate)
+
+        next(context.visit_counter)
+        venv = Path(candidate)
+        parts = venv.relative_to(start_path).parts
+        if parts and not context.in_shard(parts[0]):
+            continue
+        if not parts and context.shard is not None and context.shard[0] != 1:
+            continue
+        directory = start_path
+        for part in parts:
+            directory = directory / part
+            if not context.is_scanned(directory):
+                break
+        else:
+            env_type = detect_env_type(venv)
+            if env_type is not None:
+                context.report.env_types[venv] = env_type
+                yield venv
+
+def _resolve_start_dir(start_dir: Optional[str],
+                       timeout: Optional[float] = None) -> Optional[Path]:
+    """Resolve the directory a scan starts from, or None if it is not one.
+
+    Raises:
+        TimeoutError: If resolving it took longer than ``timeout`` seconds
+    """
+    if start_dir is None:
+        start_dir = os.path.expanduser("~")
+
+    def resolve(path: Path) -> Optional[Path]:
+        path = path.resolve()
+        if not path.exists() or not path.is_dir():
+            return None
+        return path
+
+    return _call_with_timeout(resolve, timeout,
+                              Path(os.path.expanduser(start_dir)))
+
+def collapse_roots(roots: Iterable[Path]) -> List[Path]:
+    """Drop the roots that repeat another root or lie inside one.
+
+    The roots go into a trie of their path components. A root whose path
+    runs through the end of another root is covered by it and dropped,
+    and a root ending above others covers them instead, so each root costs
+    time proportional to its depth, no matter how many there are.
+
+    Args:
+        roots: Resolved absolute directories
+
+    Returns:
+        The roots that remain, in the order they were first given
+    """
+    end = ''  # Key of the root ending at a node; never a path component
+    trie: Dict[str, dict] = {}
+    kept: Dict[Path, None] = {}
+    for root in roots:
+        node = trie
+        for part in root.parts:
+            if end in node:
+                break  # Inside a root seen before
+            node = node.setdefault(part, {})
+        else:
+            if end in node:
+                continue  # Seen before
+            # The roots below this one are covered by it
+            below = [node]
+            while below:
+                for part, child in below.pop().items():
+                    if part == end:
+                        del kept[child]
+                    else:
+                        below.append(child)
+            node.clear()
+            node[end] = root
+            kept[root] = None
+    return list(kept)
+
+def _resolve_start_dirs(start_dir: Union[None, str, Sequence[str]],
+                        timeout: Optional[float] = None,
+                        hung: Optional[List[Path]] = None) -> List[Path]:
+    """Resolve the directories of a scan, leaving out nested ones.
+
+    Directories that take longer than ``timeout`` seconds to resolve are
+    dropped too, and added to ``hung``.
+
+    Returns:
+        The resolved roots to scan; ones that are not directories are
+        dropped, and so are ones inside another root
+    """
+    if start_dir is None or isinstance(start_dir, (str, os.PathLike)):
+        start_dir = [start_dir]
+    resolved = []
+    for directory in start_dir:
+        try:
+            resolved.append(_resolve_start_dir(directory, timeout))
+        except TimeoutError:
+            if hung is not None:
+                hung.append(Path(os.path.expanduser(directory or '~')))
+    return collapse_roots(path for path in resolved if path is not None)
+
+def iter_venvs(start_dir: Union[None, str, Sequence[str]] = None,
+               max_depth: int = 5,
+               exclude_dirs: Optional[List[str]] = None,
+               parallel: bool = True,
+               max_workers: Optional[int] = None,
+               index: Optional[ScanIndex] = None,
+               exclude_patterns: Optional[List[str]] = None,
+               one_file_system: bool = False,
+               known_stores: bool = True,
+               time_budget: Optional[float] = None,
+               report: Optional[ScanReport] = None,
+               checkpoint: Optional[ScanCheckpoint] = None,
+               resume: bool = False,
+               best_first: bool = False,
+               listing_timeout: Optional[float] = LISTING_TIMEOUT,
+               fd_relative: bool = False,
+               path_list: Optional[str] = None,
+               shard: Optional[Shard] = None,
+               breadth_first: bool = False,
+               inode_order: bool = False) -> Iterator[Path]:
+    """Yield Python virtual environments as soon as the scan finds them.
+
+    Takes the same arguments as :func:`find_venvs`. In parallel mode the
+    walk runs on background threads and each venv is yielded the moment a
+    worker discovers it; closing the generator early stops the scan.
     
-    # Skip if excluded
-    if directory.name in exclude_dirs:
+    Yields:
+        Paths to virtual environments, in discovery order
+    """
+    hung: List[Path] = []
+    start_paths = _resolve_start_dirs(start_dir, listing_timeout, hung)
+    if report is not None:
+        # Left out like the directories of the walk that hang
+        report.hung.extend(hung)
+        report.unexplored.extend(hung)
+    if not start_paths:
         return
     
-    # Check if this directory is a venv
-    if is_virtual_env(directory):
-        yield directory
-        return  # Don't recurse into venvs
-    
-    # Depth limit reached
-    if max_depth <= 0:
+    started = time.monotonic()
+    context = _build_context(start_paths, exclude_dirs, index,
+                             exclude_patterns, one_file_system)
+    if time_budget is not None:
+        context.deadline = started + time_budget
+    if report is not None:
+        context.report = report
+    context.inode_order = inode_order
+    if shard is not None:
+        context.shard = shard
+        context.shard_roots = {str(path) for path in start_paths}
+    if path_list is not None:
+        # The list replaces the walk, and with it the index and checkpoint
+        try:
+            for start_path in start_paths:
+                yield from _iter_listed_venvs(context, start_path, path_list)
+            context.report.complete = not context.report.unexplored
+        finally:
+            context.report.elapsed = time.monotonic() - started
+            context.report.dirs_scanned = next(context.visit_counter)
         return
-    
+    if best_first:
+        context.best_first = True
+        if index is not None:
+            ancestors = context.venv_ancestors
+            for start_path in start_paths:
+                for venv in index.venvs_under(start_path):
+                    # Each prior venv and every directory on the way to it
+                    for path in (venv, *venv.parents):
+                        if path == start_path or str(path) in ancestors:
+                            break
+                        ancestors.add(str(path))
+
+    # The fd-relative walk needs no index: it always lists, but cheaply
+    fd_relative = fd_relative and FD_WALK_SUPPORTED and index is None
+    parallel = parallel and max_depth > 1 and not fd_relative
+    # A parallel scan also scans hidden first-level dirs (like ~/.local).
+    # All roots share one walk (and, in parallel, one pool of workers).
+    roots = [PendingDir(path, max_depth, parallel) for path in start_paths]
+    state = None
+    if checkpoint is not None:
+        state = checkpoint.begin(start_paths, max_depth, resume, parallel,
+                                 shard)
+        context.checkpoint = checkpoint
+
+    clear_requirement_cache()
+    if index is not None:
+        index.load(start_paths)
+    complete = False
+
     try:
-        # Iterate through subdirectories
-        for item in directory.iterdir():
-            # Include hidden directories that start with "." (like .venv)
-            if item.is_dir() and not item.is_symlink():
-                if item.name.startswith('.') and item.name not in VENV_NAMES:
-                    continue
-                    
-                yield from find_venvs_in_dir(
-                    item, 
-                    max_depth - 1, 
-                    exclude_dirs
-                )
-    except (PermissionError, OSError):
-        # Skip directories we can't access
-        pass
-
-def find_venvs(start_dir: Optional[str] = None, 
+        if state is not None:
+            # Carry on from the checkpoint; the venvs the interrupted scan
+            # found are still there unless they were deleted since
+            resumed, roots = state
+            for venv in resumed:
+                env_type = detect_env_type(venv)
+                if env_type is not None:
+                    context.report.env_types[venv] = env_type
+                    yield venv
+        elif known_stores:
+            # The biggest collections of envs show up before the walk starts
+            for start_path in start_paths:
+                yield from _probe_known_stores(context, start_path,
+                                               listing_timeout)
+
+        if fd_relative:
+            for root in roots:
+                yield from _walk_fd(context, str(root.path), root.depth,
+                                    root.include_hidden)
+            complete = True
+            return
+        if not parallel and best_first:
+            yield from _walk_best_first(context, roots)
+            complete = True
+            return
+        if not parallel:
+            # Sequential search
+            for root in roots:
+                yield from _walk(context, root.path, root.depth,
+                                 root.include_hidden,
+                                 breadth_first=breadth_first)
+            complete = True
+            return
+
+        found: "queue.Queue[Optional[Path]]" = queue.Queue()
+        stop = threading.Event()
+
+        def scan():
+            try:
+                _find_venvs_parallel(roots, context, found.put, stop,
+                                     max_workers, listing_timeout)
+            finally:
+                found.put(None)  # End of scan
+
+        threading.Thread(target=scan, daemon=True).start()
+        try:
+            while True:
+                venv = found.get()
+                if venv is None:
+                    complete = True
+                    return
+                yield venv
+        finally:
+            stop.set()
+    finally:
+        report = context.report
+        report.complete = complete and not report.unexplored
+        report.elapsed = time.monotonic() - started
+        report.dirs_scanned = next(context.visit_counter)
+        if not parallel and report.dirs_scanned:
+            report.concurrency = 1
+            report.latency = report.elapsed / report.dirs_scanned
+        if index is not None:
+            # A shard sees only part of the tree, and a resumed scan only
+            # what the interrupted one left, so neither may prune the
+            # records of the rest
+            index.save(start_paths,
+                       report.complete and shard is None and state is None)
+        if checkpoint is not None:
+            if report.complete:
+                checkpoint.clear()
+            else:
+                checkpoint.save()
+
+def find_venvs(start_dir: Union[None, str, Sequence[str]] = None,
               max_depth: int = 5,
               exclude_dirs: Optional[List[str]] = None,
-              parallel: bool = True) -> List[Path]:
+              parallel: bool = True,
+              max_workers: Optional[int] = None,
+              on_found: Optional[Callable[[Path], None]] = None,
+              index: Optional[ScanIndex] = None,
+              exclude_patterns: Optional[List[str]] = None,
+              one_file_system: bool = False,
+              known_stores: bool = True,
+              time_budget: Optional[float] = None,
+              report: Optional[ScanReport] = None,
+              checkpoint: Optional[ScanCheckpoint] = None,
+              resume: bool = False,
+              best_first: bool = False,
+              listing_timeout: Optional[float] = LISTING_TIMEOUT,
+              fd_relative: bool = False,
+              path_list: Optional[str] = None,
+              shard: Optional[Shard] = None,
+              breadth_first: bool = False,
+              inode_order: bool = False) -> List[Path]:
     """Find all Python virtual environments starting from a directory.
     
     Args:
-        start_dir: Directory to start searching from (defaults to home directory)
+        start_dir: Directory to start searching from (defaults to home
+            directory), or a list of them. Several roots are scanned in
+            one walk, sharing one pool of workers; a root inside another
+            (or given twice) is dropped, see :func:`collapse_roots`
         max_depth: Maximum directory depth to search
         exclude_dirs: Directory names to exclude from search
         parallel: Whether to use parallel processing for search
+        max_workers: Fixed number of worker threads for a parallel search;
+            by default the number of listings in flight adapts to the
+            latency observed, between 1 and ``ADAPTIVE_MAX_WORKERS``
+        on_found: Optional callback invoked with each venv as it is found
+        index: Optional scan index; directories whose mtime has not changed
+            since it recorded them are not listed again, and subtrees it
+            learned hold no venvs are skipped (see :class:`ScanIndex`)
+        exclude_patterns: Gitignore-style patterns of directories to prune;
+            patterns containing a "/" are relative to start_dir unless they
+            start with one
+        one_file_system: Whether to stay on the filesystem of start_dir,
+            like ``find -xdev``; pseudo filesystems such as /proc and
+            overlay layers are always skipped
+        known_stores: Whether to list the central env directories of tools
+            like pipenv, poetry, pyenv and conda (see
+            :func:`known_venv_stores`) before walking the tree, so the envs
+            kept there are found first even if the walk wouldn't reach them
+        time_budget: Seconds the scan may take; when they run out, the venvs
+            found so far are returned and the directories not visited yet
+            are listed in ``report.unexplored``
+        report: Optional :class:`ScanReport` to fill in about the scan
+        checkpoint: Optional :class:`ScanCheckpoint` that keeps the
+            directories still to visit and the venvs found so far on disk
+            while the scan runs, and is deleted when it completes
+        resume: Whether to carry on from the saved checkpoint of an earlier
+            scan of start_dir with the same max_depth (if there is one)
+            instead of starting over
+        best_first: Whether to walk the most promising directories first
+            instead of in listing order: ones where the index saw venvs
+            before, ones named like venvs, and ones next to project files
+            such as pyproject.toml, so most venvs turn up early even if the
+            whole walk takes as long
+        listing_timeout: Seconds a parallel scan waits for a directory
+            before it gives up on it and lists it in ``report.hung``; after
+            ``MAX_FILESYSTEM_TIMEOUTS`` of those on one filesystem the
+            rest of it is skipped too. None waits forever. Sequential scans
+            always wait for the walk, but give up on start directories and
+            known stores that don't answer in time like parallel ones.
+        fd_relative: Whether to walk depth-first on one thread with
+            directory file descriptors, opening, listing and probing each
+            directory relative to its parent's (``openat``). This saves
+            the kernel resolving long paths in deep trees. It is only
+            available where ``FD_WALK_SUPPORTED`` (POSIX) and without an
+            index, and overrides ``parallel`` and ``best_first``.
+        path_list: File to take the venvs from instead of walking the
+            tree: an mlocate database or a list of paths (``find
+            -print0``, ``plocate -0``), or ``-`` for standard input. The
+            venvs it names are checked against the exclusions and
+            validated on disk; max_depth does not apply
+        shard: Only scan the i-th of n shards, given as (i, n) counting
+            from 1: the first-level directories of start_dir are split
+            between the shards by a hash of their names (see
+            :func:`shard_of`), and start_dir itself is reported by the
+            first. Scanning every shard, on as many machines or processes,
+            finds what one full scan finds, and
+            :func:`venvkiller.shards.merge_results` combines
+            their results.
+        breadth_first: Whether a sequential walk visits every directory of
+            one level before going deeper, so shallow venvs turn up first;
+            by default it goes depth-first. Parallel, best-first and
+            fd-relative walks keep their own order.
+        inode_order: Whether to visit the subdirectories of each directory
+            in the order of their inode numbers instead of listing order.
+            On ext4 and XFS inodes live in tables on disk ordered by
+            number, so with a cold cache this turns the scattered reads
+            of opening each subdirectory into mostly sequential ones.
         
     Returns:
         List of paths to virtual environments
     """
-    if start_dir is None:
-        start_dir = os.path.expanduser("~")
-    
-    start_path = Path(os.path.expanduser(start_dir)).resolve()
-    
-    if not start_path.exists() or not start_path.is_dir():
-        return []
-    
-    exclude_set = set(exclude_dirs or [])
-    exclude_set.update({'node_modules', 'site-packages', '__pycache__'})
-    
-    if parallel and max_depth > 1:
-        # Get first level directories for parallel processing
+    results = []
+    for venv in iter_venvs(start_dir, max_depth, exclude_dirs, parallel,
+                           max_workers, index, exclude_patterns,
+                           one_file_system, known_stores, time_budget,
+                           report, checkpoint, resume, best_first,
+                           listing_timeout, fd_relative, path_list, shard,
+                           breadth_first, inode_order):
+        results.append(venv)
+        if on_found:
+            on_found(venv)
+    return results
+
+def _group_by_head(identifiers: Iterable[str]) -> Dict[str, List[Optional[str]]]:
+    """Group identifier paths by their first component.
+
+    Top-level identifiers map to None, nested ones to their full path.
+    """
+    groups: Dict[str, List[Optional[str]]] = {}
+    for identifier in identifiers:
+        head, _, rest = identifier.partition('/')
+        groups.setdefault(head, []).append(identifier if rest else None)
+    return groups
+
+# Files that tie a venv to a project, relative to the project directory
+REQUIREMENT_FILES = [
+    'requirements.txt',
+    'requirements-dev.txt',
+    'requirements_dev.txt',
+    'requirements/dev.txt',
+    'requirements/prod.txt',
+    'Pipfile',
+    'Pipfile.lock',
+    'pyproject.toml',
+    'poetry.lock'
+]
+_REQUIREMENT_GROUPS = _group_by_head(REQUIREMENT_FILES)
+
+# Project directory -> requirement files found in it, for the current scan
+_requirement_cache: Dict[str, Tuple[str, ...]] = {}
+
+def clear_requirement_cache() -> None:
+    """Forget the requirement files seen so far; every scan starts with this."""
+    _requirement_cache.clear()
+
+def _list_requirement_files(parent_dir: Path) -> List[str]:
+    """List a project directory once and pick out its requirement files."""
+    found = []
+    try:
+        with os.scandir(parent_dir) as it:
+            entries = [entry for entry in it
+                       if entry.name in _REQUIREMENT_GROUPS]
+    except OSError:
+        return found
+
+    for entry in entries:
+        nested = [f for f in _REQUIREMENT_GROUPS[entry.name] if f is not None]
         try:
-            first_level = [d for d in start_path.iterdir() 
-                       if d.is_dir() and not d.is_symlink() and d.name not in exclude_set]
-        except (PermissionError, OSError):
-            return []
-        
-        # First check if start path itself is a venv
-        results = list(find_venvs_in_dir(start_path, 0, exclude_set))
-        
-        # Then process first level directories in parallel
-        with ThreadPoolExecutor() as executor:
-            futures = [
-                executor.submit(
-                    list, 
-                    find_venvs_in_dir(d, max_depth - 1, exclude_set)
-                ) 
-                for d in first_level
-            ]
-            
-            for future in futures:
-                try:
-                    results.extend(future.result())
-                except Exception:
-                    pass
-                    
-        return results
-    else:
-        # Sequential search
-        return list(find_venvs_in_dir(start_path, max_depth, exclude_set))
+            if not nested and entry.is_file():
+                found.append(entry.name)
+            elif nested and entry.is_dir():
+                # One listing covers every file inside requirements/
+                with os.scandir(entry.path) as it:
+                    files = {e.name for e in it if e.is_file()}
+                found.extend(f for f in nested
+                             if f.partition('/')[2] in files)
+        except OSError:
+            pass
+    return found
 
 def has_requirement_files(parent_dir: Path) -> Tuple[bool, List[str]]:
     """Check if a directory has Python requirements files.
+
+    Costs one listing of the directory (plus one of ``requirements/`` if
+    it exists), and nothing for later calls about the same directory, like
+    those for sibling venvs of one project, until
+    :func:`clear_requirement_cache` starts a new scan session.
     
     Args:
         parent_dir: Directory to check for requirements files
@@ -131,23 +1802,11 @@ def has_requirement_files(parent_dir: Path) -> Tuple[bool, List[str]]:
     Returns:
         Tuple of (has_requirements, list_of_found_files)
     """
-    requirement_files = [
-        'requirements.txt',
-        'requirements-dev.txt',
-        'requirements_dev.txt',
-        'requirements/dev.txt',
-        'requirements/prod.txt',
-        'Pipfile',
-        'Pipfile.lock',
-        'pyproject.toml',
-        'poetry.lock'
-    ]
-    
-    found_files = []
-    
-    for req_file in requirement_files:
-        req_path = parent_dir / req_file
-        if req_path.exists() and req_path.is_file():
-            found_files.append(req_file)
-    
-    return bool(found_files), found_files
+    key = str(parent_dir)
+    found = _requirement_cache.get(key)
+    if found is None:
+        listed = set(_list_requirement_files(parent_dir))
+        found = tuple(f for f in REQUIREMENT_FILES if f in listed)
+        _requirement_cache[key] = found
+
+    return bool(found), list(found)
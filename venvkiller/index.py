@@ -0,0 +1,386 @@
+"""Module for the persistent on-disk index of previous scans."""
+
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Sequence, Set, Tuple, Union
+
+# Directories modified this close to the start of a scan are not trusted,
+# since a change in the same timestamp tick would not move their mtime
+RACY_MTIME_WINDOW_NS = 2 * 10**9
+
+# Consecutive scans that must find no venv in a subtree before it is skipped
+EMPTY_SCANS_BEFORE_SKIP = 3
+
+# Seconds after which a skipped subtree is walked again to check it
+EMPTY_SUBTREE_REVALIDATE_INTERVAL = 7 * 24 * 3600
+
+# Directories a venv-free subtree must have for skipping it to be worthwhile
+MIN_EMPTY_SUBTREE_DIRS = 50
+
+SCHEMA_VERSION = 4
+
+
+def get_cache_dir() -> Path:
+    """Get the directory venvkiller keeps its caches in."""
+    if os.name == "nt":
+        base = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~")
+    else:
+        base = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    return Path(base) / "venvkiller"
+
+
+def get_default_index_path() -> Path:
+    """Get the path of the default scan index database."""
+    return get_cache_dir() / "index.sqlite"
+
+
+def _join_names(names: Optional[Tuple[str, ...]]) -> Optional[str]:
+    """Pack directory names into one NUL-separated column value."""
+    return None if names is None else "\0".join(names)
+
+
+def _as_roots(root: Union[Path, Sequence[Path]]) -> List[str]:
+    """Get the directories a scan starts from, as strings."""
+    return [str(root)] if isinstance(root, Path) else [str(path) for path in root]
+
+
+def _split_names(value: Optional[str]) -> Optional[Tuple[str, ...]]:
+    """Unpack a column value written by :func:`_join_names`."""
+    if value is None:
+        return None
+    return tuple(value.split("\0")) if value else ()
+
+
+class DirRecord(NamedTuple):
+    """What a scan saw in one directory."""
+
+    mtime_ns: int
+    is_venv: bool
+    # Names of the subdirectories, or None if the directory was not listed
+    children: Optional[Tuple[str, ...]]
+    # Whether it holds project files like pyproject.toml
+    is_project: bool = False
+    # Type of environment it is, like "venv" or "conda", if it is one
+    env_type: Optional[str] = None
+
+
+class ScanIndex:
+    """Index of the directories visited by previous scans.
+
+    Each visited directory is stored with its mtime, whether it is a venv
+    and the names of its subdirectories. A directory's mtime changes
+    whenever an entry is added to, removed from or renamed inside it, so
+    as long as the mtime is unchanged a rescan can reuse the recorded
+    listing and venv check instead of reading the directory again.
+
+    The index also learns which big subtrees (photo libraries, ``~/go/pkg``,
+    datasets) never hold a venv. It keeps each maximal venv-free subtree of
+    at least ``MIN_EMPTY_SUBTREE_DIRS`` directories, with the number of
+    consecutive complete scans that found it empty (below a directory a
+    scan cut short with its depth limit or exclusions, nothing counts as
+    empty). After
+    ``EMPTY_SCANS_BEFORE_SKIP`` of them, scans skip the subtree, until
+    ``EMPTY_SUBTREE_REVALIDATE_INTERVAL`` seconds after it was last walked;
+    then it is walked again, and skipped again only if it is still empty.
+
+    Records are loaded into memory for the subtree being scanned, so
+    lookups from scan worker threads never touch the database. Any error
+    reading or writing the database turns the index into a no-op rather
+    than failing the scan.
+    """
+
+    def __init__(self, path: Optional[Path] = None, skip_empty: bool = True):
+        """Create an index.
+
+        Args:
+            path: Database file (defaults to one in the cache directory)
+            skip_empty: Whether scans skip subtrees learned to be venv-free;
+                if not, they are walked (and checked) like any other
+        """
+        self.path = Path(path) if path else get_default_index_path()
+        self.skip_empty = skip_empty
+        self._records: Dict[str, DirRecord] = {}
+        self._updates: Dict[str, DirRecord] = {}
+        self._visited: Set[str] = set()
+        # Venv-free subtrees -> (consecutive empty scans, time last walked)
+        self._empty: Dict[str, Tuple[int, int]] = {}
+        self._skip: Set[str] = set()
+        self._skipped: Set[str] = set()
+        # Directories whose subtree the scan did not walk in full
+        self._cut: Set[str] = set()
+        self._roots: List[str] = []
+        self._racy_cutoff_ns = 0
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(self.path))
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        if version != SCHEMA_VERSION:
+            conn.execute("DROP TABLE IF EXISTS dirs")
+            conn.execute("DROP TABLE IF EXISTS empty_subtrees")
+            conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS dirs ("
+            " path TEXT PRIMARY KEY,"
+            " mtime_ns INTEGER NOT NULL,"
+            " is_venv INTEGER NOT NULL,"
+            " children TEXT,"
+            " is_project INTEGER NOT NULL DEFAULT 0,"
+            " env_type TEXT"
+            ") WITHOUT ROWID"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS empty_subtrees ("
+            " path TEXT PRIMARY KEY,"
+            " empty_scans INTEGER NOT NULL,"
+            " walked_at INTEGER NOT NULL"
+            ") WITHOUT ROWID"
+        )
+        return conn
+
+    @staticmethod
+    def _subtree_range(root: Path) -> Tuple[str, str, str]:
+        """Get the bounds that select ``root`` and every path below it."""
+        prefix = str(root).rstrip(os.sep) + os.sep
+        return str(root), prefix, prefix[:-1] + chr(ord(os.sep) + 1)
+
+    def load(self, root: Union[Path, Sequence[Path]], skip_empty: bool = True) -> None:
+        """Load the records of ``root`` and its subtree for a new scan.
+
+        Args:
+            root: Directory the scan starts from, or the directories of a
+                scan of several roots (none inside another)
+            skip_empty: Whether this scan may skip venv-free subtrees (a
+                scan that must see every directory passes False)
+        """
+        self._records = {}
+        self._updates = {}
+        self._visited = set()
+        self._empty = {}
+        self._skip = set()
+        self._skipped = set()
+        self._cut = set()
+        self._roots = _as_roots(root)
+        self._racy_cutoff_ns = time.time_ns() - RACY_MTIME_WINDOW_NS
+
+        rows = []
+        empty_rows = []
+        try:
+            conn = self._connect()
+            try:
+                for path in self._roots:
+                    bounds = self._subtree_range(Path(path))
+                    rows += conn.execute(
+                        "SELECT path, mtime_ns, is_venv, children, is_project,"
+                        " env_type FROM dirs"
+                        " WHERE path = ? OR (path >= ? AND path < ?)",
+                        bounds,
+                    ).fetchall()
+                    empty_rows += conn.execute(
+                        "SELECT path, empty_scans, walked_at FROM empty_subtrees"
+                        " WHERE path >= ? AND path < ?",
+                        bounds[1:],
+                    ).fetchall()
+            finally:
+                conn.close()
+        except (sqlite3.Error, OSError):
+            return
+
+        for path, mtime_ns, is_venv, children, is_project, env_type in rows:
+            self._records[path] = DirRecord(
+                mtime_ns,
+                bool(is_venv),
+                _split_names(children),
+                bool(is_project),
+                env_type,
+            )
+
+        now = int(time.time())
+        for path, empty_scans, walked_at in empty_rows:
+            self._empty[path] = (empty_scans, walked_at)
+            if (
+                skip_empty
+                and self.skip_empty
+                and empty_scans >= EMPTY_SCANS_BEFORE_SKIP
+                and now - walked_at < EMPTY_SUBTREE_REVALIDATE_INTERVAL
+            ):
+                self._skip.add(path)
+
+    def skips(self, directory: str) -> bool:
+        """Check if a scan should skip a directory as a venv-free subtree."""
+        if directory not in self._skip:
+            return False
+        with self._lock:
+            self._skipped.add(directory)
+        return True
+
+    def lookup(self, directory: str, mtime_ns: int) -> Optional[DirRecord]:
+        """Get the record of a directory if its mtime is still ``mtime_ns``."""
+        record = self._records.get(directory)
+        if record is None or record.mtime_ns != mtime_ns:
+            return None
+        with self._lock:
+            self._visited.add(directory)
+        return record
+
+    def record(self, directory: str, record: DirRecord) -> None:
+        """Store what the current scan saw in a directory."""
+        if record.mtime_ns >= self._racy_cutoff_ns:
+            # Force a fresh listing next time
+            record = record._replace(mtime_ns=-1)
+        with self._lock:
+            self._visited.add(directory)
+            self._updates[directory] = record
+
+    def cut_short(self, directory: str) -> None:
+        """Note that the current scan left out part of a directory's subtree.
+
+        That is, it left out subdirectories for its depth limit or
+        exclusions. No subtree on the way to the directory counts as empty,
+        and the records below it are kept.
+        """
+        with self._lock:
+            self._cut.add(directory)
+
+    def save(self, root: Union[Path, Sequence[Path]], complete: bool = True) -> None:
+        """Write the records of the current scan of ``root`` to disk.
+
+        Args:
+            root: Directory the scan started from, or directories
+            complete: Whether the scan visited the whole subtree; only then
+                are records of directories it did not reach removed, and
+                venv-free subtrees counted
+        """
+        with self._lock:
+            rows = [
+                (
+                    path,
+                    rec.mtime_ns,
+                    int(rec.is_venv),
+                    _join_names(rec.children),
+                    int(rec.is_project),
+                    rec.env_type,
+                )
+                for path, rec in self._updates.items()
+            ]
+            stale = set(self._records) - self._visited if complete else set()
+            # Skipped subtrees keep their records for when they are checked,
+            # and so do the parts of the tree the scan left out
+            kept = self._skipped | self._cut
+            stale = {path for path in stale if not self._under(path, kept)}
+            empty_rows, not_empty = self._count_empty_subtrees(
+                _as_roots(root), complete
+            )
+
+        try:
+            conn = self._connect()
+            try:
+                with conn:
+                    conn.executemany(
+                        "DELETE FROM dirs WHERE path = ?", ((p,) for p in stale)
+                    )
+                    conn.executemany(
+                        "INSERT OR REPLACE INTO dirs VALUES (?, ?, ?, ?, ?, ?)", rows
+                    )
+                    conn.executemany(
+                        "DELETE FROM empty_subtrees WHERE path = ?",
+                        ((p,) for p in not_empty),
+                    )
+                    conn.executemany(
+                        "INSERT OR REPLACE INTO empty_subtrees VALUES (?, ?, ?)",
+                        empty_rows,
+                    )
+            finally:
+                conn.close()
+        except (sqlite3.Error, OSError):
+            pass
+
+    def _under(self, path: str, roots: Set[str]) -> bool:
+        """Check if a path is one of ``roots`` or below one of them."""
+        shortest = min(map(len, self._roots), default=0)
+        while path not in roots:
+            parent = os.path.dirname(path)
+            if parent == path or len(parent) < shortest:
+                return False
+            path = parent
+        return True
+
+    def _count_empty_subtrees(
+        self, roots: List[str], complete: bool
+    ) -> Tuple[List[Tuple[str, int, int]], Set[str]]:
+        """Find the venv-free subtrees of the current scan.
+
+        A directory is in a venv-free subtree unless it is a venv or on the
+        way to one, or to a directory the scan cut short. Each directory
+        visited there is counted towards the top of its subtree, the
+        highest directory below one of ``roots`` that still has no venv in
+        it.
+
+        Returns:
+            Tuple of (rows to store for subtrees found empty, subtrees to
+            forget); only a complete scan can tell that a subtree is empty
+        """
+        records = self._records
+        updates = self._updates
+        dirty = set(roots)
+        for path in self._visited:
+            record = updates.get(path) or records.get(path)
+            if path in self._cut or (record is not None and record.is_venv):
+                while path not in dirty:
+                    dirty.add(path)
+                    path = os.path.dirname(path)
+
+        if not complete:
+            return [], {path for path in self._empty if path in dirty}
+
+        tops: Dict[str, str] = {}
+        sizes: Dict[str, int] = {}
+        for path in self._visited:
+            if path in dirty:
+                continue
+            chain = []
+            while path not in tops:
+                parent = os.path.dirname(path)
+                if parent in dirty or parent == path:
+                    tops[path] = path
+                    break
+                chain.append(path)
+                path = parent
+            top = tops[path]
+            for below in chain:
+                tops[below] = top
+            sizes[top] = sizes.get(top, 0) + 1
+
+        now = int(time.time())
+        empty_rows = [
+            (top, self._empty.get(top, (0, 0))[0] + 1, now)
+            for top, size in sizes.items()
+            if size >= MIN_EMPTY_SUBTREE_DIRS
+        ]
+        stored = {top for top, _, _ in empty_rows}
+        not_empty = {
+            path
+            for path in self._empty
+            if path not in stored and path not in self._skipped
+        }
+        return empty_rows, not_empty
+
+    def venvs_under(self, root: Path) -> List[Path]:
+        """Get the venvs recorded at or below ``root`` by previous scans."""
+        try:
+            conn = self._connect()
+            try:
+                rows = conn.execute(
+                    "SELECT path FROM dirs WHERE is_venv = 1"
+                    " AND (path = ? OR (path >= ? AND path < ?))",
+                    self._subtree_range(root),
+                ).fetchall()
+            finally:
+                conn.close()
+        except (sqlite3.Error, OSError):
+            return []
+        return [Path(path) for (path,) in rows]
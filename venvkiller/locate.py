@@ -0,0 +1,191 @@
+"""Module for reading prebuilt file lists, like locate databases."""
+
+import mmap
+import os
+import struct
+import sys
+from contextlib import contextmanager
+from typing import Collection, Iterator, Optional, Union
+
+MLOCATE_MAGIC = b"\0mlocate"
+PLOCATE_MAGIC = b"\0plocate"
+_MAGIC_SIZE = len(MLOCATE_MAGIC)
+
+# Header after the magic: configuration block size, format version,
+# visibility flag and padding, followed by the database root path
+_MLOCATE_HEADER = struct.Struct(">IBBxx")
+# Header of each directory: modification time (64-bit seconds, 32-bit
+# nanoseconds) and padding, followed by the directory path
+_MLOCATE_DIR_HEADER_SIZE = 16
+_MLOCATE_FILE, _MLOCATE_SUBDIR, _MLOCATE_END = 0, 1, 2
+
+
+class PathListError(ValueError):
+    """A file list is in a format that cannot be read."""
+
+
+@contextmanager
+def _open_bytes(source: str) -> Iterator[Union[bytes, mmap.mmap]]:
+    """Map a file into memory, or read all of standard input for ``-``."""
+    if source == "-":
+        yield sys.stdin.buffer.read()
+        return
+    with open(source, "rb") as f:
+        try:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # An empty file cannot be mapped
+            yield b""
+            return
+        try:
+            yield data
+        finally:
+            data.close()
+
+
+def _mlocate_paths(
+    data: Union[bytes, mmap.mmap],
+    names: Optional[Collection[bytes]],
+    prefix: bytes,
+) -> Iterator[bytes]:
+    """Yield the paths in an mlocate database.
+
+    Args:
+        data: Contents of the database
+        names: Only yield entries, files or directories, with one of these
+            names (all entries if None)
+        prefix: Only yield entries of directories starting with this path
+    """
+    conf_size, version, _ = _MLOCATE_HEADER.unpack_from(data, _MAGIC_SIZE)
+    if version != 0:
+        raise PathListError(f"unsupported mlocate database version {version}")
+    find = data.find
+    pos = find(b"\0", _MAGIC_SIZE + _MLOCATE_HEADER.size) + 1
+    if pos == 0:
+        raise IndexError(pos)
+    pos += conf_size
+    end = len(data)
+
+    while pos < end:
+        path_start = pos + _MLOCATE_DIR_HEADER_SIZE
+        path_end = find(b"\0", path_start)
+        if path_end < 0:
+            raise IndexError(path_start)
+        directory = data[path_start:path_end]
+        wanted = directory.startswith(prefix) or prefix.startswith(directory)
+        if names is not None:
+            # Every NUL in a directory's entries is followed by a type byte,
+            # so the first NUL followed by the end marker ends them, and an
+            # entry called ``name`` appears as NUL, type, name, NUL, with a
+            # type of 0 for a file and 1 for a subdirectory (like the
+            # ``conda-meta`` that marks an env)
+            block_end = find(b"\0\2", path_end)
+            if block_end < 0:
+                raise IndexError(path_end)
+            if wanted:
+                for name in names:
+                    entry = name + b"\0"
+                    if (
+                        find(b"\0\0" + entry, path_end, block_end + 2) >= 0
+                        or find(b"\0\1" + entry, path_end, block_end + 2) >= 0
+                    ):
+                        yield directory.rstrip(b"/") + b"/" + name
+            pos = block_end + 2
+            continue
+        pos = path_end + 1
+        # Entries: a type byte, then (except for the end marker) a name
+        while True:
+            kind = data[pos]
+            if kind == _MLOCATE_END:
+                pos += 1
+                break
+            if kind not in (_MLOCATE_FILE, _MLOCATE_SUBDIR):
+                raise PathListError("corrupt mlocate database")
+            pos += 1
+            name_end = find(b"\0", pos)
+            if name_end < 0:
+                raise IndexError(pos)
+            if wanted:
+                yield directory.rstrip(b"/") + b"/" + data[pos:name_end]
+            pos = name_end + 1
+
+
+def _listed_paths(
+    data: Union[bytes, mmap.mmap],
+    separator: bytes,
+    names: Optional[Collection[bytes]],
+) -> Iterator[bytes]:
+    """Yield the paths in a list of paths.
+
+    With ``names``, the list is searched for paths ending in each name in
+    turn, jumping from match to match instead of splitting the whole list.
+    """
+    end = len(data)
+    if names is None:
+        pos = 0
+        while pos < end:
+            path_end = data.find(separator, pos)
+            if path_end < 0:
+                path_end = end
+            if path_end > pos:
+                yield data[pos:path_end]
+            pos = path_end + 1
+        return
+
+    for name in names:
+        needle = b"/" + name
+        pos = data.find(needle)
+        while pos >= 0:
+            path_end = pos + len(needle)
+            if path_end == end or data[path_end] == separator[0]:
+                path_start = data.rfind(separator, 0, pos) + 1
+                yield data[path_start:path_end]
+            pos = data.find(needle, path_end)
+
+
+def read_path_list(
+    source: str,
+    names: Optional[Collection[str]] = None,
+    within: Optional[str] = None,
+) -> Iterator[str]:
+    """Yield the paths of a prebuilt file list.
+
+    Reads mlocate databases (``/var/lib/mlocate/mlocate.db``) and lists of
+    paths separated by NUL bytes (``find -print0``, ``plocate -0``) or,
+    if the list has no NUL byte at all, by newlines. plocate databases are
+    compressed and can't be read directly; feed the output of
+    ``plocate -0`` instead.
+
+    Args:
+        source: File to read, or ``-`` for standard input
+        names: Only yield paths whose last component is one of these
+        within: Only yield paths at or below this directory (with mlocate,
+            other directories are skipped without looking at their entries)
+
+    Raises:
+        OSError: If the file can't be read
+        PathListError: If it is a database in a format that can't be read
+    """
+    name_set = None if names is None else {os.fsencode(name) for name in names}
+    prefix = b"" if within is None else os.fsencode(within).rstrip(b"/") + b"/"
+
+    with _open_bytes(source) as data:
+        magic = data[:_MAGIC_SIZE]
+        if magic == PLOCATE_MAGIC:
+            raise PathListError(
+                "plocate databases are compressed and can't be read; "
+                "pass the output of `plocate -0 pyvenv.cfg` instead"
+            )
+        if magic == MLOCATE_MAGIC:
+            try:
+                for path in _mlocate_paths(data, name_set, prefix):
+                    if path.startswith(prefix):
+                        yield os.fsdecode(path)
+            except (IndexError, struct.error) as e:
+                raise PathListError("truncated mlocate database") from e
+            return
+
+        separator = b"\0" if data.find(b"\0") >= 0 else b"\n"
+        for path in _listed_paths(data, separator, name_set):
+            if path.startswith(prefix):
+                yield os.fsdecode(path)
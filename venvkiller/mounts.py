@@ -0,0 +1,168 @@
+"""Module for reading the mount table to keep scans on sensible filesystems."""
+
+import os
+import re
+from typing import Dict, List, NamedTuple, Optional, Set
+
+MOUNTINFO_PATH = "/proc/self/mountinfo"
+
+# Kernel and virtual filesystems that never contain virtual environments.
+# Not autofs: with an indirect map its mount point (like /home) is also the
+# directory the real filesystems get mounted in
+PSEUDO_FILESYSTEMS = {
+    "binfmt_misc",
+    "bpf",
+    "cgroup",
+    "cgroup2",
+    "configfs",
+    "debugfs",
+    "devpts",
+    "devtmpfs",
+    "efivarfs",
+    "fuse.gvfsd-fuse",
+    "fuse.portal",
+    "fusectl",
+    "hugetlbfs",
+    "mqueue",
+    "nsfs",
+    "proc",
+    "pstore",
+    "rpc_pipefs",
+    "securityfs",
+    "selinuxfs",
+    "sysfs",
+    "tracefs",
+}
+
+# Overlay mount options naming the directories an overlay is built from
+OVERLAY_DIR_OPTIONS = ("lowerdir", "upperdir", "workdir")
+
+# Inode number of the root directory of every btrfs subvolume. Btrfs gives
+# each subvolume a device number of its own, mounted or not
+BTRFS_SUBVOLUME_INODE = 256
+
+_OCTAL_ESCAPE = re.compile(r"\\([0-7]{3})")
+
+
+class Mount(NamedTuple):
+    """One entry of the mount table."""
+
+    mount_point: str
+    fstype: str
+    source: str
+    super_options: str
+
+
+def _unescape(field: str) -> str:
+    """Decode the octal escapes (like ``\\040`` for a space) used by mountinfo."""
+    return _OCTAL_ESCAPE.sub(lambda m: chr(int(m.group(1), 8)), field)
+
+
+def read_mountinfo(path: str = MOUNTINFO_PATH) -> List[Mount]:
+    """Read the mount table of the current process.
+
+    Args:
+        path: mountinfo file to read
+
+    Returns:
+        List of mounts, empty if the file is missing (non-Linux systems)
+    """
+    mounts = []
+    try:
+        with open(path, "r") as f:
+            for line in f:
+                fields = line.split()
+                try:
+                    # Optional fields end with a lone "-" separator
+                    sep = fields.index("-", 6)
+                    mounts.append(
+                        Mount(
+                            _unescape(fields[4]),
+                            fields[sep + 1],
+                            _unescape(fields[sep + 2]),
+                            fields[sep + 3] if len(fields) > sep + 3 else "",
+                        )
+                    )
+                except (ValueError, IndexError):
+                    continue
+    except OSError:
+        return []
+    return mounts
+
+
+class MountTable:
+    """Mount points the scanner must treat specially.
+
+    Knowing every mount point up front means that crossing onto another
+    filesystem can only happen at one of them (or at a btrfs subvolume),
+    so the scanner needs no ``stat`` call for ordinary directories to
+    notice it. Where no mount table is available, callers fall back to
+    comparing ``st_dev``.
+    """
+
+    def __init__(self, mounts: Optional[List[Mount]] = None):
+        """Build the table.
+
+        Args:
+            mounts: Mounts to use (defaults to reading /proc/self/mountinfo)
+        """
+        if mounts is None:
+            mounts = read_mountinfo()
+        self.available = bool(mounts)
+        self.mounts: Dict[str, Mount] = {}
+        self.skip_paths: Set[str] = set()
+
+        for mount in mounts:
+            # Later entries are mounted on top of earlier ones
+            self.mounts[mount.mount_point] = mount
+            if mount.fstype == "overlay":
+                self.skip_paths.update(self._overlay_dirs(mount.super_options))
+        for mount in self.mounts.values():
+            if mount.fstype in PSEUDO_FILESYSTEMS:
+                self.skip_paths.add(mount.mount_point)
+
+    @staticmethod
+    def _overlay_dirs(super_options: str) -> List[str]:
+        """Get the lower, upper and work directories of an overlay mount.
+
+        The directories are resolved, since Docker names the lower ones by
+        short symlinks (``overlay2/l/<id>``) to the layers, and the scan
+        never follows a symlink.
+        """
+        dirs = []
+        for option in super_options.split(","):
+            key, _, value = option.partition("=")
+            if key in OVERLAY_DIR_OPTIONS and value:
+                dirs.extend(_unescape(d) for d in value.split(":") if d)
+        return [os.path.realpath(d) for d in dirs]
+
+    def is_mount_point(self, path: str) -> bool:
+        """Check if a directory is the mount point of a filesystem."""
+        return path in self.mounts
+
+    def is_device_boundary(self, path: str, inode: Optional[int] = None) -> bool:
+        """Check if a directory may be on another device than its parent.
+
+        Those are mount points and, on btrfs, the roots of subvolumes. Only
+        those have inode number ``BTRFS_SUBVOLUME_INODE``, so without
+        ``inode`` any directory on btrfs may be one.
+        """
+        if path in self.mounts:
+            return True
+        if inode is not None and inode != BTRFS_SUBVOLUME_INODE:
+            return False
+        mount_point = self.mount_of(path)
+        return mount_point is not None and self.mounts[mount_point].fstype == "btrfs"
+
+    def mount_of(self, path: str) -> Optional[str]:
+        """Get the mount point of the filesystem a directory is on."""
+        while path not in self.mounts:
+            parent = os.path.dirname(path)
+            if parent == path:
+                return None
+            path = parent
+        return path
+
+    def is_skipped(self, path: str) -> bool:
+        """Check if a directory is a pseudo filesystem or overlay layer."""
+        return path in self.skip_paths
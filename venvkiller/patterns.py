@@ -0,0 +1,157 @@
+"""Module for gitignore-style path patterns used to prune scans."""
+
+import re
+from pathlib import Path
+from typing import Iterable, List, Optional, Sequence, Union
+
+
+def read_pattern_file(path: Path) -> List[str]:
+    """Read patterns from a file in ``.gitignore`` syntax.
+
+    Blank lines and lines starting with ``#`` are skipped, and trailing
+    spaces are removed unless escaped with a backslash.
+
+    Args:
+        path: File to read
+
+    Returns:
+        List of patterns in file order
+    """
+    patterns = []
+    with open(path, "r") as f:
+        for line in f:
+            line = line.rstrip("\n\r")
+            if not line or line.startswith("#"):
+                continue
+            stripped = line.rstrip(" ")
+            if stripped.endswith("\\") and len(stripped) < len(line):
+                stripped += " "
+            if stripped:
+                patterns.append(stripped)
+    return patterns
+
+
+def _translate_segment(segment: str) -> str:
+    """Translate one path segment of a glob into a regex."""
+    out = []
+    i = 0
+    while i < len(segment):
+        char = segment[i]
+        i += 1
+        if char == "*":
+            out.append("[^/]*")
+        elif char == "?":
+            out.append("[^/]")
+        elif char == "\\" and i < len(segment):
+            out.append(re.escape(segment[i]))
+            i += 1
+        elif char == "[":
+            # A "]" right after the opening bracket (or its negation) is literal
+            start = i + 1 if segment.startswith(("!", "^"), i) else i
+            end = segment.find("]", start + 1)
+            if end == -1:
+                out.append(re.escape(char))
+                continue
+            body = segment[i:end]
+            i = end + 1
+            if body[:1] in ("!", "^"):
+                body = "^" + body[1:]
+            out.append("[" + body.replace("\\", "\\\\") + "]")
+        else:
+            out.append(re.escape(char))
+    return "".join(out)
+
+
+def _translate(pattern: str, roots: List[str]) -> str:
+    """Translate a directory pattern into a regex matching absolute paths.
+
+    Args:
+        pattern: Pattern without its ``!`` prefix or trailing slash
+        roots: POSIX forms of the directories relative patterns are
+            anchored to
+    """
+    if pattern.startswith("/"):
+        # Absolute path pattern
+        prefix = ""
+        segments = pattern[1:].split("/")
+    elif "/" in pattern:
+        # Anchored to the scan root, like a pattern in a top-level .gitignore
+        prefix = "|".join(re.escape(root.rstrip("/")) for root in roots)
+        if len(roots) > 1:
+            prefix = f"(?:{prefix})"
+        segments = pattern.split("/")
+    else:
+        # A bare name matches at any depth
+        prefix = ""
+        segments = ["**", pattern]
+
+    out = [prefix]
+    for i, segment in enumerate(segments):
+        if segment == "**":
+            # Trailing "/**" matches everything inside, but not the dir itself
+            out.append("(?:/.+)" if i == len(segments) - 1 else "(?:/[^/]+)*")
+        elif segment:
+            out.append("/" + _translate_segment(segment))
+    return "".join(out)
+
+
+class PathMatcher:
+    """Compiled set of gitignore-style include/exclude directory patterns.
+
+    Patterns follow ``.gitignore`` rules: ``*`` and ``?`` never match a
+    ``/``, ``**`` matches any number of directories, a leading ``!``
+    re-includes what an earlier pattern excluded, and the last matching
+    pattern wins. A pattern starting with ``/`` is an absolute path, one
+    with another ``/`` in it is relative to the scan root (to each of them,
+    for a scan of several roots), and a bare name matches a directory with
+    that name anywhere.
+
+    All patterns are compiled into a single regular expression, with the
+    patterns in reverse order so the first alternative that matches is the
+    last matching pattern; checking a directory is one regex match no
+    matter how many patterns there are.
+    """
+
+    def __init__(
+        self,
+        patterns: Iterable[str],
+        root: Optional[Union[Path, Sequence[Path]]] = None,
+    ):
+        """Compile patterns.
+
+        Args:
+            patterns: Patterns in priority order (later ones win)
+            root: Directory relative patterns are anchored to, or several
+        """
+        self.patterns = list(patterns)
+        if root is None:
+            roots = ["/"]
+        elif isinstance(root, Path):
+            roots = [root.as_posix()]
+        else:
+            roots = [path.as_posix() for path in root] or ["/"]
+
+        alternatives = []
+        self._negated = set()
+        for i, pattern in reversed(list(enumerate(self.patterns))):
+            group = f"p{i}"
+            if pattern.startswith("!"):
+                self._negated.add(group)
+                pattern = pattern[1:]
+            elif pattern.startswith("\\!") or pattern.startswith("\\#"):
+                pattern = pattern[1:]
+            pattern = pattern.rstrip("/") or "/"
+            regex = _translate(pattern, roots)
+            alternatives.append(f"(?P<{group}>{regex})")
+
+        self._regex = re.compile("|".join(alternatives)) if alternatives else None
+
+    def __bool__(self) -> bool:
+        return self._regex is not None
+
+    def excludes(self, path: Path) -> bool:
+        """Check if a directory is excluded by the patterns."""
+        if self._regex is None:
+            return False
+        match = self._regex.fullmatch(path.as_posix())
+        return match is not None and match.lastgroup not in self._negated
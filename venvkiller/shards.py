@@ -0,0 +1,130 @@
+"""Module for splitting scans into shards and merging their results."""
+
+import json
+import os
+import zlib
+from pathlib import Path
+from typing import Iterable, List, NamedTuple, Optional, Tuple
+
+RESULTS_VERSION = 1
+
+# (i, n): the i-th of n shards, counting from 1
+Shard = Tuple[int, int]
+
+
+class ResultsError(ValueError):
+    """Result files that can't be read or don't belong together."""
+
+
+def parse_shard(spec: str) -> Shard:
+    """Parse a shard given as ``i/n``, like ``3/8``.
+
+    Raises:
+        ValueError: If it is not of that form with 1 <= i <= n
+    """
+    index, sep, count = spec.partition("/")
+    try:
+        shard = int(index), int(count)
+    except ValueError:
+        shard = None
+    if not sep or shard is None or not 1 <= shard[0] <= shard[1]:
+        raise ValueError(f"expected a shard like 1/4, got {spec!r}")
+    return shard
+
+
+def shard_of(name: str, count: int) -> int:
+    """Get the shard (1 to ``count``) a first-level directory belongs to.
+
+    Uses CRC-32 of the name, which, unlike ``hash()``, is the same in
+    every process and on every host.
+    """
+    return zlib.crc32(os.fsencode(name)) % count + 1
+
+
+class ScanResults(NamedTuple):
+    """The venvs a scan, or one shard of it, found."""
+
+    start_dir: Path
+    venvs: List[Path]
+    # Whether the scan visited everything in reach
+    complete: bool
+    shard: Optional[Shard] = None
+
+
+def write_results(path: Path, results: ScanResults) -> None:
+    """Write scan results to a file, replacing it in one go."""
+    data = {
+        "version": RESULTS_VERSION,
+        "start_dir": str(results.start_dir),
+        "shard": list(results.shard) if results.shard else None,
+        "complete": results.complete,
+        "venvs": [str(venv) for venv in results.venvs],
+    }
+    path = Path(path)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    try:
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, separators=(",", ":"))
+        os.replace(tmp, path)
+    except OSError:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+
+def read_results(path: Path) -> ScanResults:
+    """Read a file written by :func:`write_results`.
+
+    Raises:
+        OSError: If the file can't be read
+        ResultsError: If it is not a result file
+    """
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") != RESULTS_VERSION:
+            raise ResultsError(f"{path}: unsupported result file version")
+        shard = data["shard"]
+        return ScanResults(
+            Path(data["start_dir"]),
+            [Path(venv) for venv in data["venvs"]],
+            bool(data["complete"]),
+            parse_shard(f"{shard[0]}/{shard[1]}") if shard else None,
+        )
+    except (ValueError, KeyError, TypeError, AttributeError) as e:
+        if isinstance(e, ResultsError):
+            raise
+        raise ResultsError(f"{path}: not a venvkiller result file") from e
+
+
+def merge_results(results: Iterable[ScanResults]) -> Tuple[ScanResults, List[int]]:
+    """Combine the results of the shards of one scan.
+
+    Venvs are deduplicated and sorted. The merged results are complete
+    only if every shard is there and complete.
+
+    Returns:
+        Tuple of (merged results, numbers of the shards missing)
+
+    Raises:
+        ResultsError: If the results are of scans of different directories
+            or split into different numbers of shards
+    """
+    results = list(results)
+    if not results:
+        raise ResultsError("no results to merge")
+    start_dir = results[0].start_dir
+    counts = {result.shard[1] if result.shard else 1 for result in results}
+    if any(result.start_dir != start_dir for result in results):
+        raise ResultsError("results are of scans of different directories")
+    if len(counts) > 1:
+        raise ResultsError("results are split into different numbers of shards")
+
+    count = counts.pop()
+    present = {result.shard[0] if result.shard else 1 for result in results}
+    missing = [i for i in range(1, count + 1) if i not in present]
+    venvs = sorted({venv for result in results for venv in result.venvs})
+    complete = not missing and all(result.complete for result in results)
+    return ScanResults(start_dir, venvs, complete), missing
@@ -0,0 +1,429 @@
+"""Module for keeping the set of known venvs live with inotify (Linux only)."""
+
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from venvkiller.analyzer import get_size
+from venvkiller.finder import (
+    is_virtual_env,
+    _is_skipped_hidden,
+    _marker_parts,
+    _build_context,
+    _resolve_start_dir,
+)
+from venvkiller.index import ScanIndex
+
+# inotify event masks, from <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_UNMOUNT = 0x00002000
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_DONT_FOLLOW = 0x02000000
+IN_ISDIR = 0x40000000
+
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+# Directories the finder walked: watch for entries coming and going
+DIR_MASK = (
+    IN_CREATE
+    | IN_DELETE
+    | IN_MOVED_FROM
+    | IN_MOVED_TO
+    | IN_DELETE_SELF
+    | IN_MOVE_SELF
+    | IN_ONLYDIR
+    | IN_DONT_FOLLOW
+)
+# Venv roots and their site-packages: any change may change the size
+VENV_MASK = DIR_MASK | IN_MODIFY | IN_ATTRIB
+
+_EVENT_HEADER = struct.Struct("iIII")
+
+# Directories of a venv, below its root, that lead to where packages get
+# installed: site-packages, or PEP 582's X.Y/lib in __pypackages__
+_PACKAGE_DIR_GLOBS = ("*", "lib/python*", "lib/python*/site-packages", "*/lib")
+
+
+class InotifyEvent(NamedTuple):
+    """A single event read from an inotify file descriptor."""
+
+    wd: int
+    mask: int
+    cookie: int
+    name: str
+
+
+def _load_libc():
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or None, use_errno=True)
+    except OSError:
+        return None
+    if not hasattr(libc, "inotify_init1"):
+        return None
+    libc.inotify_init1.argtypes = [ctypes.c_int]
+    libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+    libc.inotify_rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+    return libc
+
+
+_libc = _load_libc()
+
+
+def inotify_available() -> bool:
+    """Check if inotify can be used on this system."""
+    return _libc is not None
+
+
+class Inotify:
+    """Minimal ctypes binding to the Linux inotify API."""
+
+    def __init__(self):
+        if _libc is None:
+            raise OSError(errno.ENOSYS, "inotify is only available on Linux")
+        self.fd = _libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+
+    def add_watch(self, path: Path, mask: int) -> int:
+        """Watch ``path`` for the events in ``mask`` and return the watch id."""
+        wd = _libc.inotify_add_watch(self.fd, os.fsencode(path), mask)
+        if wd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err), str(path))
+        return wd
+
+    def rm_watch(self, wd: int) -> None:
+        """Stop a watch; errors for watches the kernel already dropped are ignored."""
+        _libc.inotify_rm_watch(self.fd, wd)
+
+    def read_events(self, timeout: Optional[float] = None) -> List[InotifyEvent]:
+        """Read the pending events, waiting up to ``timeout`` seconds for one."""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+
+        events = []
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(data):
+            wd, mask, cookie, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            end = offset + length
+            name = data[offset:end].rstrip(b"\0")
+            offset = end
+            events.append(InotifyEvent(wd, mask, cookie, os.fsdecode(name)))
+        return events
+
+    def close(self) -> None:
+        """Close the inotify file descriptor, dropping every watch."""
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+class VenvWatcher:
+    """Live set of the venvs under a directory and their sizes.
+
+    Does one scan of the tree like :func:`venvkiller.finder.find_venvs`,
+    then puts an inotify watch on every directory it walked and on each
+    venv it found. Directories created, moved or deleted afterwards are
+    applied to the set as the events arrive, so :meth:`venvs` answers
+    immediately and no periodic rescan is needed.
+
+    Sizes are measured when a venv is found and measured again
+    ``size_delay`` seconds after the last change to the venv root or the
+    directories packages are installed into, so a running ``pip install``
+    is only measured once.
+    """
+
+    def __init__(
+        self,
+        start_dir: Optional[str] = None,
+        max_depth: int = 5,
+        exclude_dirs: Optional[List[str]] = None,
+        index: Optional[ScanIndex] = None,
+        on_change: Optional[Callable[[str, Path, int], None]] = None,
+        size_delay: float = 1.0,
+        exclude_patterns: Optional[List[str]] = None,
+        one_file_system: bool = False,
+    ):
+        """Create a watcher; call :meth:`start` to scan and begin watching.
+
+        Args:
+            start_dir: Directory to watch (defaults to home directory)
+            max_depth: Maximum directory depth to search
+            exclude_dirs: Directory names to exclude from search
+            index: Optional scan index used for the initial scan
+            on_change: Optional callback (event, venv_path, size_bytes) where
+                event is "added", "removed" or "resized"
+            size_delay: Seconds to wait after a change before re-measuring
+            exclude_patterns: Gitignore-style patterns of directories to prune
+            one_file_system: Whether to stay on the filesystem of start_dir
+        """
+        self.start_path = _resolve_start_dir(start_dir)
+        self.max_depth = max_depth
+        self.index = index
+        self.context = None
+        if self.start_path is not None:
+            self.context = _build_context(
+                self.start_path,
+                exclude_dirs,
+                exclude_patterns=exclude_patterns,
+                one_file_system=one_file_system,
+            )
+        self.on_change = on_change
+        self.size_delay = size_delay
+
+        self.inotify: Optional[Inotify] = None
+        self.watch_errors = 0
+        self._sizes: Dict[Path, int] = {}
+        self._dirty: Dict[Path, float] = {}
+        # Watch id -> (path, remaining depth); depth is None for venv watches
+        self._watches: Dict[int, Tuple[Path, Optional[int]]] = {}
+        self._watch_ids: Dict[Path, int] = {}
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        """Scan the tree and start watching it."""
+        self.inotify = Inotify()
+        if self.start_path is None:
+            return
+        if self.index is not None:
+            # Every directory must be watched, even in venv-free subtrees
+            self.index.load(self.start_path, skip_empty=False)
+        # Only the initial scan goes through the index
+        self.context.index = self.index
+        try:
+            self._walk(self.start_path, self.max_depth, include_hidden=True)
+        finally:
+            self.context.index = None
+        if self.index is not None:
+            self.index.save(self.start_path)
+
+    def close(self) -> None:
+        """Stop watching."""
+        if self.inotify is not None:
+            self.inotify.close()
+
+    def venvs(self) -> Dict[Path, int]:
+        """Get the known venvs mapped to their sizes in bytes."""
+        with self._lock:
+            return dict(self._sizes)
+
+    def total_size(self) -> int:
+        """Get the combined size of the known venvs in bytes."""
+        with self._lock:
+            return sum(self._sizes.values())
+
+    @property
+    def watch_count(self) -> int:
+        """Number of directories being watched."""
+        return len(self._watches)
+
+    def run(self, poll_interval: float = 0.5) -> None:
+        """Process events until interrupted."""
+        while True:
+            self.process_events(poll_interval)
+
+    def process_events(self, timeout: Optional[float] = 0) -> int:
+        """Apply pending filesystem events to the set of venvs.
+
+        Args:
+            timeout: Seconds to wait for the first event (None blocks)
+
+        Returns:
+            Number of events processed
+        """
+        if self._dirty:
+            # Wake up in time to re-measure pending venvs
+            wait = max(0.0, min(self._dirty.values()) - time.monotonic())
+            timeout = wait if timeout is None else min(timeout, wait)
+        events = self.inotify.read_events(timeout)
+        for event in events:
+            self._handle(event)
+        self._measure_dirty()
+        return len(events)
+
+    def _emit(self, kind: str, venv: Path, size: int) -> None:
+        if self.on_change:
+            self.on_change(kind, venv, size)
+
+    def _add_watch(self, path: Path, depth: Optional[int]) -> bool:
+        mask = DIR_MASK if depth is not None else VENV_MASK
+        try:
+            wd = self.inotify.add_watch(path, mask)
+        except OSError:
+            # Gone already, unreadable, or out of watches (ENOSPC)
+            self.watch_errors += 1
+            return False
+        self._watches[wd] = (path, depth)
+        self._watch_ids[path] = wd
+        return True
+
+    def _walk(
+        self,
+        directory: Path,
+        depth: int,
+        include_hidden: bool = False,
+    ) -> None:
+        """Scan a subtree, watching its directories and recording its venvs."""
+        # Inode numbers of deleted directories get reused, so only one walk
+        # at a time can rule out directories it already visited
+        self.context.visited = set()
+        stack = [(directory, None, depth, include_hidden)]
+        while stack:
+            path, key, depth, hidden = stack.pop()
+            if not self.context.is_scanned(path):
+                continue
+            is_venv, subdirs = self.context.visit(path, depth, hidden, key)
+            if is_venv:
+                self._add_venv(path)
+            elif self._add_watch(path, depth):
+                stack.extend((sub, k, depth - 1, False) for sub, k in subdirs)
+
+    def _add_venv(self, venv: Path) -> None:
+        if venv in self._sizes:
+            return
+        self._add_watch(venv, None)
+        self._watch_package_dirs(venv)
+        size = get_size(venv)
+        with self._lock:
+            self._sizes[venv] = size
+        self._emit("added", venv, size)
+
+    def _watch_package_dirs(self, venv: Path) -> None:
+        """Watch the directories of a venv that packages are installed into.
+
+        These may not exist yet when the venv is found, since ``python -m
+        venv`` and conda write their markers first. So the directories on
+        the way to them are watched too, and this runs again whenever a
+        directory appears in one of them and whenever the venv is measured.
+        """
+        for pattern in _PACKAGE_DIR_GLOBS:
+            for path in venv.glob(pattern):
+                if (
+                    path not in self._watch_ids
+                    and not path.is_symlink()
+                    and path.is_dir()
+                ):
+                    self._add_watch(path, None)
+
+    def _forget(self, root: Path) -> None:
+        """Drop the watches and venvs at or below ``root``."""
+        for path in [p for p in self._watch_ids if p == root or root in p.parents]:
+            wd = self._watch_ids.pop(path)
+            self._watches.pop(wd, None)
+            self.inotify.rm_watch(wd)
+        with self._lock:
+            gone = [v for v in self._sizes if v == root or root in v.parents]
+            for venv in gone:
+                del self._sizes[venv]
+                self._dirty.pop(venv, None)
+        for venv in gone:
+            self._emit("removed", venv, 0)
+
+    def _venv_containing(self, path: Path) -> Optional[Path]:
+        for candidate in (path, *path.parents):
+            if candidate in self._sizes:
+                return candidate
+        return None
+
+    def _handle(self, event: InotifyEvent) -> None:
+        if event.mask & IN_Q_OVERFLOW:
+            # Events were lost: rebuild everything from a fresh walk
+            self._forget(self.start_path)
+            self._walk(self.start_path, self.max_depth, include_hidden=True)
+            return
+
+        watched = self._watches.get(event.wd)
+        if watched is None:
+            return
+        path, depth = watched
+
+        if event.mask & IN_IGNORED:
+            # The kernel dropped the watch (directory deleted or unmounted)
+            if self._watch_ids.get(path) == event.wd:
+                self._forget(path)
+            return
+        if event.mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+            self._forget(path)
+            return
+
+        venv = self._venv_containing(path)
+        if depth is None:
+            # Inside a venv: only its size can change
+            if venv is not None:
+                self._dirty[venv] = time.monotonic() + self.size_delay
+                if event.mask & IN_ISDIR and event.mask & (IN_CREATE | IN_MOVED_TO):
+                    self._watch_package_dirs(venv)
+            return
+
+        child = path / event.name
+        if event.mask & (IN_DELETE | IN_MOVED_FROM):
+            if event.mask & IN_ISDIR:
+                self._forget(child)
+        elif event.mask & (IN_CREATE | IN_MOVED_TO):
+            walk_child = (
+                event.mask & IN_ISDIR
+                and depth > 0
+                and child not in self._watch_ids
+                and (path == self.start_path or not _is_skipped_hidden(event.name))
+            )
+            if walk_child:
+                self._walk(child, depth - 1)
+            # Markers of registered detectors too, so computed per event
+            parts, marker_depth = _marker_parts()
+            if event.name in parts:
+                self._recheck(path, marker_depth)
+
+    def _recheck(self, directory: Path, marker_depth: int) -> None:
+        """Re-check a watched directory that may have just become a venv."""
+        # bin/activate and bin/python make the parent of bin the venv, so
+        # look as many levels up as the longest marker reaches
+        candidates = [directory, *directory.parents][:marker_depth]
+        for candidate in candidates:
+            wd = self._watch_ids.get(candidate)
+            if wd is None or self._watches[wd][1] is None:
+                continue
+            if is_virtual_env(candidate):
+                self._forget(candidate)
+                self._add_venv(candidate)
+                return
+
+    def _measure_dirty(self) -> None:
+        now = time.monotonic()
+        for venv in [v for v, due in self._dirty.items() if due <= now]:
+            del self._dirty[venv]
+            if venv in self._sizes:
+                # Catches directories created while the last ones were added
+                self._watch_package_dirs(venv)
+            size = get_size(venv)
+            with self._lock:
+                if venv not in self._sizes or self._sizes[venv] == size:
+                    continue
+                self._sizes[venv] = size
+            self._emit("resized", venv, size)